@@ -0,0 +1,6 @@
+"""
+Offline benchmarks, run against the local mock exchange in benchmarks/mock_binance.py
+
+example:
+    python -m benchmarks.api_bench --market swap --iterations 200 --concurrency 10
+"""
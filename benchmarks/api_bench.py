@@ -0,0 +1,208 @@
+"""
+Throughput and p50 / p99 latency of every API method and of whole bot flows, against the mock exchange
+
+example:
+    python -m benchmarks.api_bench --market swap --iterations 500 --concurrency 20 --latency 1,5
+    python -m benchmarks.api_bench --market spot --only fetch_order,common_order_operations --output spot.json
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from decimal import Decimal
+
+import simplejson
+
+from benchmarks.mock_binance import MockBinance
+from exchanges import load_exchange_class
+from utils.instrumentation import Histogram
+
+SYMBOL = 'BTC/USDT'
+
+
+def credentials(tenant):
+    return {'apiKey': f'bench-key-{tenant}', 'secret': f'bench-secret-{tenant}'}
+
+
+class Bench:
+    """
+    One API instance against one mock exchange, with the cases of the market type
+
+    A case is an async callable taking (iteration, tenant), tenants are spread over the workers so
+    concurrent flows do not see each other's orders.
+    """
+
+    def __init__(self, api, market_type):
+        self.api = api
+        self.market_type = market_type
+        self.ids = itertools.count()
+        self.prepared = {}
+
+    def params(self, tenant, **params):
+        return dict(params, **credentials(tenant))
+
+    async def prices(self):
+        book = await self.api.fetch_order_book(SYMBOL)
+        return Decimal(str(book['bids'][0][0])), Decimal(str(book['asks'][0][0]))
+
+    async def create_untraded_order(self, tenant):
+        bid, _ = await self.prices()
+        price = self.api.price_to_precision(SYMBOL, bid / Decimal('1.5'))
+        client_order_id = f'bench{next(self.ids)}'
+        return await self.api.create_order(SYMBOL, 'limit', 'buy', '0.002', price, client_order_id,
+                                           params=self.params(tenant))
+
+    async def prepare(self, iterations, tenants):
+        """
+        Orders to fetch and cancel, created before the timed runs
+        """
+        await self.api.load_markets()
+        self.prepared['orders'] = [await self.create_untraded_order(i % tenants) for i in range(max(tenants, 1))]
+        self.prepared['cancel'] = [(i % tenants, await self.create_untraded_order(i % tenants)) for i in range(iterations)]
+
+    # cases --------------------------------------------------------------------------------------------------------
+
+    def cases(self):
+        common = {
+            'fetch_markets': lambda i, tenant: self.api.fetch_markets(),
+            'fetch_order_book': lambda i, tenant: self.api.fetch_order_book(SYMBOL),
+            'create_order': lambda i, tenant: self.create_untraded_order(tenant),
+            'fetch_order': self.fetch_order,
+            'cancel_order': self.cancel_order,
+            'fetch_orders': lambda i, tenant: self.api.fetch_orders(SYMBOL, limit=10, params=self.params(tenant)),
+            'fetch_open_orders': lambda i, tenant: self.api.fetch_open_orders(SYMBOL, limit=10, params=self.params(tenant)),
+            'fetch_closed_orders': lambda i, tenant: self.api.fetch_closed_orders(SYMBOL, limit=10, params=self.params(tenant)),
+            'fetch_my_trades': lambda i, tenant: self.api.fetch_my_trades(SYMBOL, limit=10, params=self.params(tenant)),
+            'fetch_balance': lambda i, tenant: self.api.fetch_balance(params=self.params(tenant)),
+            'common_order_operations': self.common_order_operations,
+        }
+        if self.market_type == 'spot':
+            common['fetch_trading_fees'] = lambda i, tenant: self.api.fetch_trading_fees(params=self.params(tenant))
+            return common
+        common.update({
+            'fetch_trading_fee_rates': lambda i, tenant: self.api.fetch_trading_fee_rates(SYMBOL, params=self.params(tenant)),
+            'fetch_positions': lambda i, tenant: self.api.fetch_positions(SYMBOL, params=self.params(tenant)),
+            # alternate so the change is not skipped as a no-op
+            'change_leverage': lambda i, tenant: self.api.change_leverage(SYMBOL, 10 + i % 2, params=self.params(tenant)),
+            'fetch_position_side': lambda i, tenant: self.api.fetch_position_side(params=self.params(tenant)),
+            'fetch_funding_records': lambda i, tenant: self.api.fetch_funding_records(SYMBOL, limit=10, params=self.params(tenant)),
+            'fetch_incomes': lambda i, tenant: self.api.fetch_incomes(SYMBOL, limit=100, params=self.params(tenant)),
+            'fetch_premium_index': lambda i, tenant: self.api.fetch_premium_index(SYMBOL),
+            'fetch_leverage_brackets': lambda i, tenant: self.api.fetch_leverage_brackets(SYMBOL, params=self.params(tenant)),
+            'position_operations': self.position_operations,
+        })
+        return common
+
+    async def fetch_order(self, i, tenant):
+        # the prepared order of index n belongs to tenant n
+        order = self.prepared['orders'][tenant]
+        return await self.api.fetch_order(order['id'], SYMBOL, params=self.params(tenant))
+
+    async def cancel_order(self, i, tenant):
+        owner, order = self.prepared['cancel'][i]
+        return await self.api.cancel_order(order['id'], SYMBOL, params=self.params(owner))
+
+    async def common_order_operations(self, i, tenant):
+        """
+        The flow of test_common_order_operations in tests/swap_tests.py
+        """
+        order = await self.create_untraded_order(tenant)
+        await self.api.fetch_order(order['id'], SYMBOL, params=self.params(tenant))
+        await self.api.fetch_open_orders(SYMBOL, limit=10, params=self.params(tenant))
+        await self.api.fetch_closed_orders(SYMBOL, limit=10, params=self.params(tenant))
+        await self.api.cancel_order(order['id'], SYMBOL, params=self.params(tenant))
+        await self.api.fetch_open_orders(SYMBOL, limit=10, params=self.params(tenant))
+        await self.api.fetch_closed_orders(SYMBOL, limit=10, params=self.params(tenant))
+
+    async def position_operations(self, i, tenant):
+        """
+        The flow of test_position in tests/swap_tests.py, then closing the position
+        """
+        await self.api.fetch_positions(SYMBOL, params=self.params(tenant))
+        order = await self.api.create_order(SYMBOL, 'market', 'buy', '0.001', params=self.params(tenant))
+        await self.api.fetch_order(order['id'], SYMBOL, params=self.params(tenant))
+        await self.api.fetch_closed_orders(SYMBOL, limit=10, params=self.params(tenant))
+        await self.api.fetch_positions(SYMBOL, params=self.params(tenant))
+        await self.api.create_order(SYMBOL, 'market', 'sell', '0.001', params=self.params(tenant))
+
+
+async def measure(case, iterations, concurrency, tenants):
+    """
+    :return:    {'calls', 'errors', 'elapsed', 'throughput', 'p50', 'p99', 'max'}, latencies in ms
+    """
+    histogram = Histogram()
+    errors = {}
+    iteration = itertools.count()
+
+    async def worker(index):
+        tenant = index % tenants
+        for i in iteration:
+            if i >= iterations:
+                return
+            started = time.perf_counter_ns()
+            try:
+                await case(i, tenant)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            histogram.record((time.perf_counter_ns() - started) // 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(index) for index in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        'calls': histogram.count,
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': histogram.count / elapsed if elapsed else 0.0,
+        'p50': histogram.percentile(50) / 1000,
+        'p99': histogram.percentile(99) / 1000,
+        'max': histogram.max / 1000,
+    }
+
+
+def parse_latency(value):
+    """
+    '2' -> 0.002, '1,5' -> (0.001, 0.005)
+    """
+    parts = [float(part) / 1000 for part in value.split(',')]
+    return parts[0] if len(parts) == 1 else tuple(parts)
+
+
+async def main(args):
+    results = {}
+    market_types = ['swap', 'spot'] if args.market == 'all' else [args.market]
+    only = set(args.only.split(',')) if args.only else None
+    for market_type in market_types:
+        async with MockBinance(latency=parse_latency(args.latency), error_rate=args.error_rate,
+                               enforce_limits=False, seed=0) as mock:
+            api = load_exchange_class(args.exchange, market_type)(mock.config({'enableRateLimit': False}))
+            try:
+                bench = Bench(api, market_type)
+                await bench.prepare(args.iterations, args.tenants)
+                for name, case in bench.cases().items():
+                    if only and name not in only:
+                        continue
+                    iterations = max(args.iterations // 10, 1) if name.endswith('_operations') else args.iterations
+                    result = results[f'{market_type}.{name}'] = await measure(case, iterations, args.concurrency, args.tenants)
+                    print(f'{market_type:5} {name:28} {result["throughput"]:9.1f}/s  p50 {result["p50"]:8.2f}ms  '
+                          f'p99 {result["p99"]:8.2f}ms  max {result["max"]:8.2f}ms  errors {sum(result["errors"].values())}')
+            finally:
+                await api.close()
+    if args.output:
+        with open(args.output, 'w') as f:
+            simplejson.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--market', choices=['swap', 'spot', 'all'], default='all')
+    parser.add_argument('--iterations', type=int, default=200, help='calls per method, a tenth of it for flows')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--tenants', type=int, default=10)
+    parser.add_argument('--latency', default='0', help='ms added by the mock exchange, fixed or "low,high"')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--only', help='comma separated case names')
+    parser.add_argument('--output', help='write the results as json')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,234 @@
+"""
+How many grid bots one process can drive: event loop lag, throughput, latency percentiles and memory as
+the number of bots grows
+
+Each bot is a tenant trading one symbol through a shared BinanceSwap instance, the way the bots of a
+process share an ApiPool. It picks its next call from MIX and waits `interval` seconds on average between
+calls. The mock exchange runs in a child process by default, so its work does not show as lag of the
+measured event loop.
+
+example:
+    python -m benchmarks.load_test --bots 10,100,1000,3000 --duration 30
+    python -m benchmarks.load_test --bots 500 --interval 0.5 --latency 5,20 --output load.json
+"""
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+import random
+import resource
+import time
+from decimal import Decimal
+
+import simplejson
+
+from benchmarks.api_bench import credentials, parse_latency
+from benchmarks.mock_binance import DEFAULT_SYMBOLS, MockBinance
+from exchanges import load_exchange_class
+from utils.instrumentation import Histogram
+
+# relative frequency of the calls of a grid bot
+MIX = {
+    'fetch_order_book': 4,
+    'fetch_order': 3,
+    'fetch_positions': 2,
+    'create_order': 1,
+    'cancel_order': 1,
+}
+# orders a bot keeps open at most, it cancels instead of creating above it
+MAX_OPEN_ORDERS = 5
+
+
+def rss():
+    """
+    :return:    resident memory of the process in bytes, the peak where the current one is unknown
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def ms(value):
+    return None if value is None else value / 1000
+
+
+class Stats:
+    """
+    Latencies and errors of the calls of all bots, and the event loop lag
+    """
+
+    def __init__(self):
+        self.latencies = Histogram()
+        self.calls = {}
+        self.errors = {}
+        self.lag = Histogram()
+
+
+class Bot:
+    """
+    A grid bot of one tenant on one symbol, keeping a few untraded limit orders open
+    """
+
+    def __init__(self, api, tenant, symbol, stats, rng, step=0):
+        self.api = api
+        self.params = credentials(tenant)
+        self.symbol = symbol
+        self.stats = stats
+        self.random = rng
+        self.orders = []
+        self.bid = None
+        # client order ids, the exchange rejects a second open order with the same one. The orders of
+        # earlier steps stay open on the mock, so the step is part of the id
+        self.client_order_ids = (f'grid{step}-{tenant}-{n}' for n in itertools.count())
+
+    def next_call(self):
+        name = self.random.choices(list(MIX), weights=list(MIX.values()))[0]
+        if name == 'create_order' and len(self.orders) >= MAX_OPEN_ORDERS:
+            name = 'cancel_order'
+        if name in ('fetch_order', 'cancel_order') and not self.orders:
+            name = 'create_order'
+        if name == 'create_order' and self.bid is None:
+            name = 'fetch_order_book'
+        return name
+
+    async def call(self, name):
+        if name == 'fetch_order_book':
+            book = await self.api.fetch_order_book(self.symbol, limit=5)
+            self.bid = Decimal(str(book['bids'][0][0]))
+        elif name == 'create_order':
+            price = self.api.price_to_precision(self.symbol, self.bid / Decimal('1.5'))
+            amount = self.api.markets[self.symbol]['limits']['amount']['min'] or Decimal('0.001')
+            order = await self.api.create_order(self.symbol, 'limit', 'buy', amount, price, next(self.client_order_ids),
+                                               params=dict(self.params))
+            self.orders.append(order['id'])
+        elif name == 'fetch_order':
+            await self.api.fetch_order(self.random.choice(self.orders), self.symbol, params=dict(self.params))
+        elif name == 'cancel_order':
+            await self.api.cancel_order(self.orders.pop(0), self.symbol, params=dict(self.params))
+        else:
+            await self.api.fetch_positions(self.symbol, params=dict(self.params))
+
+    async def run(self, interval, deadline):
+        # spread the first calls of the bots over one interval
+        await asyncio.sleep(self.random.uniform(0, interval))
+        while time.monotonic() < deadline:
+            name = self.next_call()
+            started = time.perf_counter_ns()
+            try:
+                await self.call(name)
+            except Exception as e:
+                self.stats.errors[type(e).__name__] = self.stats.errors.get(type(e).__name__, 0) + 1
+            else:
+                latency = (time.perf_counter_ns() - started) // 1000
+                self.stats.latencies.record(latency)
+                self.stats.calls.setdefault(name, Histogram()).record(latency)
+            await asyncio.sleep(self.random.expovariate(1 / interval))
+
+
+async def monitor_lag(histogram, resolution, deadline):
+    """
+    Record how late the event loop wakes up a task sleeping `resolution` seconds, in microseconds
+    """
+    while time.monotonic() < deadline:
+        expected = time.perf_counter() + resolution
+        await asyncio.sleep(resolution)
+        histogram.record((time.perf_counter() - expected) * 1e6)
+
+
+async def run_step(exchange, config, bots, args, step=0):
+    """
+    :return:    results of `bots` bots running for `args.duration` seconds
+    """
+    api = load_exchange_class(exchange, 'swap')(dict(config, enableRateLimit=False))
+    try:
+        await api.load_markets()
+        symbols = [api.markets_by_id[market_id]['symbol'] for market_id in DEFAULT_SYMBOLS]
+        stats = Stats()
+        rss_before = rss()
+        deadline = time.monotonic() + args.duration
+        started = time.perf_counter()
+        workers = [Bot(api, tenant, symbols[tenant % len(symbols)], stats, random.Random(tenant), step).run(args.interval, deadline)
+                   for tenant in range(bots)]
+        await asyncio.gather(monitor_lag(stats.lag, args.lag_resolution, deadline), *workers)
+        elapsed = time.perf_counter() - started
+        rss_after = rss()
+    finally:
+        await api.close()
+    return {
+        'bots': bots,
+        'elapsed': elapsed,
+        'calls': stats.latencies.count,
+        'errors': stats.errors,
+        'throughput': stats.latencies.count / elapsed,
+        'p50': ms(stats.latencies.percentile(50)),
+        'p99': ms(stats.latencies.percentile(99)),
+        'max': ms(stats.latencies.max),
+        'lagP50': ms(stats.lag.percentile(50)),
+        'lagP99': ms(stats.lag.percentile(99)),
+        'lagMax': ms(stats.lag.max),
+        'rss': rss_after,
+        'rssPerBot': (rss_after - rss_before) / bots,
+        'methods': {name: {'calls': histogram.count, 'p50': ms(histogram.percentile(50)), 'p99': ms(histogram.percentile(99))}
+                    for name, histogram in stats.calls.items()},
+    }
+
+
+def serve_mock(connection, latency, error_rate):
+    """
+    Run the mock exchange in this process and send its urls through `connection`
+    """
+    async def serve():
+        async with MockBinance(latency=latency, error_rate=error_rate, enforce_limits=False, seed=0) as mock:
+            connection.send(mock.urls())
+            await asyncio.get_running_loop().run_in_executor(None, connection.recv)
+
+    asyncio.run(serve())
+
+
+async def main(args):
+    latency = parse_latency(args.latency)
+    results = []
+    mock = process = connection = None
+    if args.in_process:
+        mock = MockBinance(latency=latency, error_rate=args.error_rate, enforce_limits=False, seed=0)
+        await mock.start()
+        urls = mock.urls()
+    else:
+        connection, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=serve_mock, args=(child, latency, args.error_rate), daemon=True)
+        process.start()
+        urls = connection.recv()
+    try:
+        for step, bots in enumerate(int(value) for value in args.bots.split(',')):
+            result = await run_step(args.exchange, {'urls': urls}, bots, args, step)
+            results.append(result)
+            print(f'{bots:6} bots  {result["throughput"]:9.1f} calls/s  p50 {result["p50"] or 0:8.2f}ms  p99 {result["p99"] or 0:8.2f}ms  '
+                  f'loop lag p99 {result["lagP99"] or 0:8.2f}ms max {result["lagMax"] or 0:8.2f}ms  '
+                  f'rss {result["rss"] / 2 ** 20:7.1f}MB  errors {sum(result["errors"].values())}')
+    finally:
+        if mock is not None:
+            await mock.stop()
+        if process is not None:
+            connection.send('stop')
+            process.join(5)
+    if args.output:
+        with open(args.output, 'w') as f:
+            simplejson.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--bots', default='10,100,1000', help='comma separated numbers of bots, one run each')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of each run')
+    parser.add_argument('--interval', type=float, default=1.0, help='mean seconds between two calls of a bot')
+    parser.add_argument('--latency', default='0', help='ms added by the mock exchange, fixed or "low,high"')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--lag-resolution', type=float, default=0.01, help='seconds between two event loop lag samples')
+    parser.add_argument('--in-process', action='store_true', help='run the mock exchange in the measured event loop')
+    parser.add_argument('--output', help='write the results as json')
+    asyncio.run(main(parser.parse_args()))
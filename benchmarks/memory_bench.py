@@ -0,0 +1,108 @@
+"""
+Memory held by parsed markets, orders, trades, positions and incomes under each infoRetention policy
+
+Records are decoded from their json text and parsed while tracemalloc runs, and the parsed structures are
+kept the way a long-lived cache keeps them, so the raw payload only stays alive through 'info'.
+The time per record includes the decoding, reading one field of 'info' is timed separately.
+
+example:
+    python -m benchmarks.memory_bench
+    python -m benchmarks.memory_bench --records binance.jsonl.gz --output memory.json
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import simplejson
+
+from benchmarks.parser_bench import recorded_payloads, synthetic_payloads
+from ccxt_ext.info import INFO_RETENTIONS
+from exchanges import load_exchange_class
+
+# payload kind: (parse function name, field of 'info' read by the access timing)
+KINDS = {
+    'markets': ('parse_swap_market', 'symbol'),
+    'orders': ('parse_swap_order', 'orderId'),
+    'trades': ('parse_swap_trade', 'orderId'),
+    'positions': ('parse_swap_position', 'symbol'),
+    'incomes': ('parse_swap_income', 'tranId'),
+}
+
+
+def retained(parse, texts, loads):
+    """
+    :return:    (parsed structures, bytes held by them)
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [parse(loads(text)) for text in texts]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return results, sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+
+def timed(function, values, repeat):
+    """
+    :return:    microseconds per value of the best run
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for value in values:
+            function(value)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(values) * 1e6
+
+
+def run(api, payloads, repeat):
+    results = {}
+    saved = api.options.get('infoRetention')
+    try:
+        for kind, (name, field) in KINDS.items():
+            records = payloads.get(kind)
+            if not records:
+                continue
+            parse = getattr(api, name)
+            texts = [simplejson.dumps(record) for record in records]
+            for retention in INFO_RETENTIONS:
+                api.options['infoRetention'] = retention
+                structures, size = retained(parse, texts, api.unjson)
+                results[f'{kind}.{retention}'] = {
+                    'records': len(records),
+                    'bytesPerRecord': size / len(records),
+                    'usPerRecord': timed(lambda text: parse(api.unjson(text)), texts, repeat),
+                    'usPerInfoAccess': timed(lambda structure: structure['info'].get(field), structures, repeat),
+                }
+                del structures
+    finally:
+        api.options['infoRetention'] = saved
+    return results
+
+
+def main(args):
+    api = load_exchange_class(args.exchange, 'swap')({})
+    synthetic = synthetic_payloads(args.count)
+    api.set_markets([api.parse_swap_market(market) for market in synthetic['markets']])
+    payloads = recorded_payloads(args.records) if args.records else synthetic
+    results = run(api, payloads, args.repeat)
+    for name, result in results.items():
+        full = results[name.split('.')[0] + '.full']['bytesPerRecord']
+        print(f'{name:20} {result["bytesPerRecord"]:8.0f} B/record ({result["bytesPerRecord"] / full - 1:+7.1%})  '
+              f'{result["usPerRecord"]:7.1f} us/record  {result["usPerInfoAccess"]:7.2f} us/info access')
+    if args.output:
+        with open(args.output, 'w') as f:
+            simplejson.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--count', type=int, default=2000, help='synthetic records per kind')
+    parser.add_argument('--records', help='archive written by ccxt_ext.transport.Recorder instead of synthetic records')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case, the best one counts')
+    parser.add_argument('--output', help='write the results as json')
+    main(parser.parse_args())
@@ -0,0 +1,968 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import random
+import time
+from collections import Counter
+from decimal import Decimal
+from urllib.parse import parse_qsl
+
+import simplejson
+
+ZERO = Decimal(0)
+
+# market id: (base, quote, price, tick size, step size)
+DEFAULT_SYMBOLS = {
+    'BTCUSDT': ('BTC', 'USDT', Decimal('10000'), Decimal('0.01'), Decimal('0.001')),
+    'ETHUSDT': ('ETH', 'USDT', Decimal('350'), Decimal('0.01'), Decimal('0.001')),
+    'BNBUSDT': ('BNB', 'USDT', Decimal('20'), Decimal('0.001'), Decimal('0.01')),
+    'LTCUSDT': ('LTC', 'USDT', Decimal('50'), Decimal('0.01'), Decimal('0.001')),
+    'XRPUSDT': ('XRP', 'USDT', Decimal('0.25'), Decimal('0.0001'), Decimal('0.1')),
+}
+
+LEVERAGE_BRACKETS = [
+    # bracket, initial leverage, notional floor, notional cap, maintenance margin ratio, cum
+    (1, 125, 0, 50000, Decimal('0.004'), Decimal('0')),
+    (2, 100, 50000, 250000, Decimal('0.005'), Decimal('50')),
+    (3, 50, 250000, 1000000, Decimal('0.01'), Decimal('1300')),
+    (4, 20, 1000000, 5000000, Decimal('0.025'), Decimal('16300')),
+    (5, 10, 5000000, 20000000, Decimal('0.05'), Decimal('141300')),
+]
+
+FUNDING_INTERVAL = 8 * 3600 * 1000
+
+# request weights, a callable takes the params
+WEIGHTS = {
+    ('GET', '/fapi/v1/depth'): lambda params: {5: 2, 10: 2, 20: 2, 50: 2, 100: 5, 500: 10}.get(int(params.get('limit', 100)), 20),
+    ('GET', '/fapi/v1/openOrders'): lambda params: 1 if 'symbol' in params else 40,
+    ('GET', '/fapi/v1/allOrders'): 5,
+    ('GET', '/fapi/v1/userTrades'): 5,
+    ('GET', '/fapi/v1/income'): 30,
+    ('GET', '/fapi/v1/positionSide/dual'): 30,
+    ('GET', '/fapi/v2/account'): 5,
+    ('GET', '/fapi/v2/balance'): 5,
+    ('GET', '/fapi/v2/positionRisk'): 5,
+    ('GET', '/api/v3/exchangeInfo'): 10,
+    ('GET', '/api/v3/depth'): lambda params: {5: 1, 10: 1, 20: 1, 50: 1, 100: 1, 500: 5, 1000: 10}.get(int(params.get('limit', 100)), 50),
+    ('GET', '/api/v3/openOrders'): lambda params: 3 if 'symbol' in params else 40,
+    ('GET', '/api/v3/allOrders'): 10,
+    ('GET', '/api/v3/myTrades'): 10,
+    ('GET', '/api/v3/account'): 10,
+    ('GET', '/sapi/v1/capital/config/getall'): 10,
+}
+
+# weight per minute
+WEIGHT_LIMITS = {
+    'fapi': 2400,
+    'api': 1200,
+}
+
+
+class MockError(Exception):
+    def __init__(self, status, code, msg):
+        super().__init__(msg)
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+def _str(value):
+    return format(Decimal(value).normalize(), 'f') if value else '0'
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+class _Account:
+    def __init__(self, balance):
+        # futures
+        self.wallet = Decimal(balance)
+        self.dual = False
+        self.leverage = {}
+        self.margin_type = {}
+        self.positions = {}
+        self.isolated_margin = {}
+        self.swap_orders = {}
+        self.swap_trades = []
+        self.incomes = []
+        # spot
+        self.balances = {'USDT': Decimal(balance)}
+        self.spot_orders = {}
+        self.spot_trades = []
+
+
+class MockBinanceEngine:
+    """
+    In-memory matching and account state behind the mock exchange, independent of the transport
+
+    Market orders and limit orders crossing the book fill at once, other limit orders rest until
+    `set_price` moves the book through them. Each api key has its own futures and spot account.
+    """
+
+    def __init__(self, symbols=None, balance=10000, fee_tier=0, maker=Decimal('0.0002'), taker=Decimal('0.0004'),
+                 depth=20, funding_days=30):
+        """
+        :param symbols:         {market id: (base, quote, price, tick size, step size)}, see DEFAULT_SYMBOLS
+        :param balance:         USDT of a new account, futures and spot
+        :param depth:           price levels on each side of the order book
+        :param funding_days:    days of funding rate history
+        """
+        self.symbols = dict(symbols or DEFAULT_SYMBOLS)
+        self.prices = {symbol: spec[2] for symbol, spec in self.symbols.items()}
+        self.balance = balance
+        self.fee_tier = fee_tier
+        self.maker = Decimal(maker)
+        self.taker = Decimal(taker)
+        self.depth = depth
+        self.accounts = {}
+        self.ids = itertools.count(1)
+        self.update_id = itertools.count(1)
+        self.funding_rates = {}
+        now = _now()
+        last_funding = now - now % FUNDING_INTERVAL
+        for symbol in self.symbols:
+            rates = self.funding_rates[symbol] = []
+            for i in range(funding_days * 24 * 3600 * 1000 // FUNDING_INTERVAL, -1, -1):
+                # deterministic, varying around 0.01%
+                rate = Decimal('0.0001') + Decimal((i * 7 + len(symbol)) % 11 - 5) / Decimal(100000)
+                rates.append((last_funding - i * FUNDING_INTERVAL, rate))
+
+    def account(self, api_key):
+        account = self.accounts.get(api_key)
+        if account is None:
+            account = self.accounts[api_key] = _Account(self.balance)
+        return account
+
+    def market(self, params, required=True):
+        symbol = params.get('symbol')
+        if symbol is None:
+            if required:
+                raise MockError(400, -1102, "Mandatory parameter 'symbol' was not sent, was empty/null, or malformed.")
+            return None
+        if symbol not in self.symbols:
+            raise MockError(400, -1121, 'Invalid symbol.')
+        return symbol
+
+    # market data --------------------------------------------------------------------------------------------------
+
+    def best(self, symbol):
+        tick = self.symbols[symbol][3]
+        price = self.prices[symbol]
+        return price - tick, price + tick
+
+    def set_price(self, symbol, price):
+        """
+        Move the book of the symbol, resting limit orders it crosses are filled at their price
+        """
+        self.prices[symbol] = Decimal(price)
+        bid, ask = self.best(symbol)
+        for api_key, account in self.accounts.items():
+            for futures, orders in ((True, account.swap_orders), (False, account.spot_orders)):
+                for order in list(orders.values()):
+                    if order['symbol'] != symbol or order['status'] != 'NEW':
+                        continue
+                    limit = Decimal(order['price'])
+                    if (order['side'] == 'BUY' and limit >= ask) or (order['side'] == 'SELL' and limit <= bid):
+                        self._fill(account, order, limit, True, futures)
+
+    def settle_funding(self, rate=None):
+        """
+        Apply a funding to every open futures position and record it in the funding rate history
+        """
+        now = _now()
+        for symbol in self.symbols:
+            symbol_rate = Decimal(rate) if rate is not None else self.funding_rates[symbol][-1][1]
+            self.funding_rates[symbol].append((now, symbol_rate))
+            for account in self.accounts.values():
+                for (position_symbol, _), position in account.positions.items():
+                    if position_symbol != symbol or not position['amt']:
+                        continue
+                    fee = -position['amt'] * self.prices[symbol] * symbol_rate
+                    account.wallet += fee
+                    self._income(account, symbol, 'FUNDING_FEE', fee, now, '')
+
+    def exchange_info(self, futures):
+        symbols = []
+        for symbol, (base, quote, price, tick, step) in self.symbols.items():
+            filters = [
+                {'filterType': 'PRICE_FILTER', 'minPrice': _str(tick), 'maxPrice': _str(price * 100), 'tickSize': _str(tick)},
+                {'filterType': 'LOT_SIZE', 'minQty': _str(step), 'maxQty': '100000', 'stepSize': _str(step)},
+                {'filterType': 'MARKET_LOT_SIZE', 'minQty': _str(step), 'maxQty': '1000', 'stepSize': _str(step)},
+                {'filterType': 'MAX_NUM_ORDERS', 'limit': 200},
+                {'filterType': 'PERCENT_PRICE', 'multiplierUp': '1.1500', 'multiplierDown': '0.8500', 'multiplierDecimal': 4},
+            ]
+            price_precision = max(-tick.normalize().as_tuple().exponent, 0)
+            quantity_precision = max(-step.normalize().as_tuple().exponent, 0)
+            if futures:
+                symbols.append({
+                    'symbol': symbol,
+                    'status': 'TRADING',
+                    'maintMarginPercent': '2.5000',
+                    'requiredMarginPercent': '5.0000',
+                    'baseAsset': base,
+                    'quoteAsset': quote,
+                    'pricePrecision': price_precision,
+                    'quantityPrecision': quantity_precision,
+                    'baseAssetPrecision': 8,
+                    'quotePrecision': 8,
+                    'filters': filters,
+                    'orderTypes': ['LIMIT', 'MARKET', 'STOP', 'TAKE_PROFIT'],
+                    'timeInForce': ['GTC', 'IOC', 'FOK', 'GTX'],
+                })
+            else:
+                filters.append({'filterType': 'MIN_NOTIONAL', 'minNotional': '10.00000000', 'applyToMarket': True, 'avgPriceMins': 5})
+                symbols.append({
+                    'symbol': symbol,
+                    'status': 'TRADING',
+                    'baseAsset': base,
+                    'baseAssetPrecision': 8,
+                    'quoteAsset': quote,
+                    'quotePrecision': 8,
+                    'quoteAssetPrecision': 8,
+                    'baseCommissionPrecision': 8,
+                    'quoteCommissionPrecision': 8,
+                    'orderTypes': ['LIMIT', 'LIMIT_MAKER', 'MARKET', 'STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT'],
+                    'icebergAllowed': True,
+                    'ocoAllowed': True,
+                    'quoteOrderQtyMarketAllowed': True,
+                    'isSpotTradingAllowed': True,
+                    'isMarginTradingAllowed': False,
+                    'filters': filters,
+                    'permissions': ['SPOT'],
+                })
+        return {
+            'timezone': 'UTC',
+            'serverTime': _now(),
+            'rateLimits': [
+                {'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1,
+                 'limit': WEIGHT_LIMITS['fapi' if futures else 'api']},
+                {'rateLimitType': 'ORDERS', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': 1200},
+            ],
+            'exchangeFilters': [],
+            'symbols': symbols,
+        }
+
+    def order_book(self, params, futures):
+        symbol = self.market(params)
+        limit = min(int(params.get('limit', 100)), self.depth)
+        tick, step = self.symbols[symbol][3:5]
+        bid, ask = self.best(symbol)
+        result = {
+            'lastUpdateId': next(self.update_id),
+            'bids': [[_str(bid - tick * i), _str(step * (i + 1) * 10)] for i in range(limit)],
+            'asks': [[_str(ask + tick * i), _str(step * (i + 1) * 10)] for i in range(limit)],
+        }
+        if futures:
+            result['E'] = result['T'] = _now()
+        return result
+
+    def premium_index(self, params):
+        symbol = self.market(params, required=False)
+        now = _now()
+
+        def entry(symbol):
+            return {
+                'symbol': symbol,
+                'markPrice': _str(self.prices[symbol]),
+                'indexPrice': _str(self.prices[symbol]),
+                'lastFundingRate': _str(self.funding_rates[symbol][-1][1]),
+                'nextFundingTime': now - now % FUNDING_INTERVAL + FUNDING_INTERVAL,
+                'interestRate': '0.00010000',
+                'time': now,
+            }
+
+        return entry(symbol) if symbol else [entry(symbol) for symbol in self.symbols]
+
+    def funding_rate(self, params):
+        symbol = self.market(params)
+        limit = min(int(params.get('limit', 100)), 1000)
+        rates = [{'symbol': symbol, 'fundingTime': time, 'fundingRate': _str(rate)}
+                 for time, rate in self.funding_rates[symbol]]
+        return self._page(rates, 'fundingTime', params, limit)
+
+    # helpers -----------------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def _page(rows, time_key, params, limit, id_key=None, from_key=None):
+        """
+        Rows in [startTime, endTime] from `from_key` on, the oldest `limit` ones when paging forward,
+        the latest `limit` ones otherwise
+        """
+        start = params.get('startTime')
+        end = params.get('endTime')
+        from_id = params.get(from_key) if from_key else None
+        if start is not None:
+            rows = [row for row in rows if row[time_key] >= int(start)]
+        if end is not None:
+            rows = [row for row in rows if row[time_key] <= int(end)]
+        if from_id is not None:
+            rows = [row for row in rows if row[id_key] >= int(from_id)]
+        if start is not None or from_id is not None:
+            return rows[:limit]
+        return rows[-limit:]
+
+    def _income(self, account, symbol, income_type, amount, time, trade_id):
+        account.incomes.append({
+            'symbol': symbol,
+            'incomeType': income_type,
+            'income': _str(amount),
+            'asset': 'USDT',
+            'info': income_type,
+            'time': time,
+            'tranId': next(self.ids),
+            'tradeId': str(trade_id),
+        })
+
+    def _position(self, account, symbol, position_side):
+        position = account.positions.get((symbol, position_side))
+        if position is None:
+            position = account.positions[(symbol, position_side)] = {'amt': ZERO, 'entry': ZERO}
+        return position
+
+    def _find(self, orders, params):
+        if 'orderId' in params:
+            order = orders.get(int(params['orderId']))
+        else:
+            client_order_id = params.get('origClientOrderId')
+            order = next((order for order in reversed(list(orders.values()))
+                          if order['clientOrderId'] == client_order_id), None)
+        if order is None or order['symbol'] != params['symbol']:
+            raise MockError(400, -2013, 'Order does not exist.')
+        return order
+
+    def _fill(self, account, order, price, maker, futures):
+        now = _now()
+        quantity = Decimal(order['origQty']) - Decimal(order['executedQty'])
+        quote = quantity * price
+        commission = quote * (self.maker if maker else self.taker)
+        buy = order['side'] == 'BUY'
+        order['executedQty'] = order['origQty']
+        order['status'] = 'FILLED'
+        order['updateTime'] = now
+        trade_id = next(self.ids)
+        trade = {
+            'symbol': order['symbol'],
+            'id': trade_id,
+            'orderId': order['orderId'],
+            'price': _str(price),
+            'qty': _str(quantity),
+            'quoteQty': _str(quote),
+            'commission': _str(commission),
+            'commissionAsset': 'USDT',
+            'time': now,
+        }
+        if futures:
+            order['avgPrice'] = _str(price)
+            order['cumQty'] = order['executedQty']
+            order['cumQuote'] = _str(quote)
+            realized = self._apply_position(account, order['symbol'], order['positionSide'], quantity if buy else -quantity, price)
+            account.wallet += realized - commission
+            trade.update({
+                'buyer': buy,
+                'maker': maker,
+                'realizedPnl': _str(realized),
+                'side': order['side'],
+                'positionSide': order['positionSide'],
+            })
+            account.swap_trades.append(trade)
+            self._income(account, order['symbol'], 'COMMISSION', -commission, now, trade_id)
+            if realized:
+                self._income(account, order['symbol'], 'REALIZED_PNL', realized, now, trade_id)
+        else:
+            order['cummulativeQuoteQty'] = _str(quote)
+            base, quote_asset = self.symbols[order['symbol']][:2]
+            balances = account.balances
+            balances[base] = balances.get(base, ZERO) + (quantity if buy else -quantity)
+            balances[quote_asset] = balances.get(quote_asset, ZERO) - (quote if buy else -quote) - commission
+            trade.update({
+                'orderListId': -1,
+                'isBuyer': buy,
+                'isMaker': maker,
+                'isBestMatch': True,
+            })
+            account.spot_trades.append(trade)
+        return trade
+
+    @staticmethod
+    def _apply_position(account, symbol, position_side, signed, price):
+        """
+        :return:    realized pnl
+        """
+        position = account.positions.setdefault((symbol, position_side), {'amt': ZERO, 'entry': ZERO})
+        amount, entry = position['amt'], position['entry']
+        realized = ZERO
+        if not amount or (amount > 0) == (signed > 0):
+            position['entry'] = (amount * entry + signed * price) / (amount + signed)
+        else:
+            closed = min(abs(signed), abs(amount))
+            realized = closed * (price - entry) * (1 if amount > 0 else -1)
+            if abs(signed) > abs(amount):
+                position['entry'] = price
+            elif abs(signed) == abs(amount):
+                position['entry'] = ZERO
+        position['amt'] = amount + signed
+        return realized
+
+    def _create_order(self, account, params, futures):
+        symbol = self.market(params)
+        orders = account.swap_orders if futures else account.spot_orders
+        side = params.get('side')
+        type = params.get('type')
+        if side not in ('BUY', 'SELL') or type is None:
+            raise MockError(400, -1102, "Mandatory parameter 'side' or 'type' was not sent, was empty/null, or malformed.")
+        tick, step = self.symbols[symbol][3:5]
+        quantity = Decimal(params.get('quantity') or 0)
+        price = Decimal(params.get('price') or 0)
+        if quantity <= 0 or quantity % step:
+            raise MockError(400, -1013, 'Filter failure: LOT_SIZE')
+        if type != 'MARKET' and (price <= 0 or price % tick):
+            raise MockError(400, -1013, 'Filter failure: PRICE_FILTER')
+        client_order_id = params.get('newClientOrderId') or f'mock{next(self.ids)}'
+        if any(order['clientOrderId'] == client_order_id and order['status'] == 'NEW' for order in orders.values()):
+            raise MockError(400, -2010, 'Duplicate order sent.')
+        position_side = params.get('positionSide', 'BOTH')
+        if futures and (position_side == 'BOTH') == account.dual:
+            raise MockError(400, -4061, "Order's position side does not match user's setting.")
+        now = _now()
+        order = {
+            'orderId': next(self.ids),
+            'symbol': symbol,
+            'status': 'NEW',
+            'clientOrderId': client_order_id,
+            'price': _str(price),
+            'origQty': _str(quantity),
+            'executedQty': '0',
+            'timeInForce': params.get('timeInForce', 'GTC'),
+            'type': type,
+            'side': side,
+            'stopPrice': _str(params.get('stopPrice', 0)),
+            'time': now,
+            'updateTime': now,
+        }
+        if futures:
+            order.update({
+                'avgPrice': '0',
+                'cumQty': '0',
+                'cumQuote': '0',
+                'reduceOnly': params.get('reduceOnly') == 'true',
+                'closePosition': False,
+                'positionSide': position_side,
+                'workingType': 'CONTRACT_PRICE',
+                'origType': type,
+            })
+        else:
+            order.update({
+                'orderListId': -1,
+                'cummulativeQuoteQty': '0',
+                'icebergQty': '0',
+                'isWorking': True,
+                'origQuoteOrderQty': '0',
+            })
+        orders[order['orderId']] = order
+        bid, ask = self.best(symbol)
+        fills = []
+        if type == 'MARKET':
+            fills.append(self._fill(account, order, ask if side == 'BUY' else bid, False, futures))
+        elif type in ('LIMIT', 'LIMIT_MAKER') and ((side == 'BUY' and price >= ask) or (side == 'SELL' and price <= bid)):
+            if type == 'LIMIT_MAKER':
+                del orders[order['orderId']]
+                raise MockError(400, -2010, 'Order would immediately match and take.')
+            fills.append(self._fill(account, order, ask if side == 'BUY' else bid, False, futures))
+        response = dict(order)
+        if futures:
+            # the order response has no creation time
+            del response['time']
+        else:
+            response['transactTime'] = response.pop('time')
+            del response['updateTime'], response['isWorking']
+            if params.get('newOrderRespType') == 'FULL':
+                response['fills'] = [{
+                    'price': fill['price'],
+                    'qty': fill['qty'],
+                    'commission': fill['commission'],
+                    'commissionAsset': fill['commissionAsset'],
+                } for fill in fills]
+        return response
+
+    def _cancel_order(self, account, params, futures):
+        self.market(params)
+        orders = account.swap_orders if futures else account.spot_orders
+        try:
+            order = self._find(orders, params)
+        except MockError:
+            raise MockError(400, -2011, 'Unknown order sent.')
+        if order['status'] != 'NEW':
+            raise MockError(400, -2011, 'Unknown order sent.')
+        order['status'] = 'CANCELED'
+        order['updateTime'] = _now()
+        return dict(order)
+
+    def _open_orders(self, orders, params):
+        symbol = self.market(params, required=False)
+        return [order for order in orders.values() if order['status'] == 'NEW' and (symbol is None or order['symbol'] == symbol)]
+
+    def _all_orders(self, orders, params, default_limit):
+        symbol = self.market(params)
+        limit = min(int(params.get('limit', default_limit)), 1000)
+        rows = [order for order in orders.values() if order['symbol'] == symbol]
+        return self._page(rows, 'time', params, limit, 'orderId', 'orderId')
+
+    def _trades(self, trades, params, default_limit):
+        symbol = self.market(params)
+        limit = min(int(params.get('limit', default_limit)), 1000)
+        rows = [trade for trade in trades if trade['symbol'] == symbol and
+                ('orderId' not in params or trade['orderId'] == int(params['orderId']))]
+        return self._page(rows, 'time', params, limit, 'id', 'fromId')
+
+    # futures ------------------------------------------------------------------------------------------------------
+
+    def _unrealized(self, symbol, position):
+        return position['amt'] * (self.prices[symbol] - position['entry'])
+
+    def _position_risk(self, account, symbol, position_side):
+        position = self._position(account, symbol, position_side)
+        leverage = account.leverage.get(symbol, 20)
+        isolated = account.margin_type.get(symbol, 'CROSSED') == 'ISOLATED'
+        unrealized = self._unrealized(symbol, position)
+        liquidation = ZERO
+        if position['amt']:
+            sign = 1 if position['amt'] > 0 else -1
+            liquidation = max(position['entry'] * (1 - sign / Decimal(leverage) + sign * LEVERAGE_BRACKETS[0][4]), ZERO)
+        isolated_margin = ZERO
+        if isolated and position['amt']:
+            isolated_margin = abs(position['amt']) * position['entry'] / leverage + unrealized + \
+                account.isolated_margin.get((symbol, position_side), ZERO)
+        return {
+            'symbol': symbol,
+            'positionAmt': _str(position['amt']),
+            'entryPrice': _str(position['entry']),
+            'markPrice': _str(self.prices[symbol]),
+            'unRealizedProfit': _str(unrealized),
+            'liquidationPrice': _str(liquidation),
+            'leverage': str(leverage),
+            'maxNotionalValue': str(LEVERAGE_BRACKETS[-1][3]),
+            'marginType': 'isolated' if isolated else 'cross',
+            'isolatedMargin': _str(isolated_margin),
+            'isAutoAddMargin': 'false',
+            'positionSide': position_side,
+        }
+
+    def _position_sides(self, account):
+        return ('LONG', 'SHORT') if account.dual else ('BOTH',)
+
+    def position_risk(self, account, params):
+        symbol = self.market(params, required=False)
+        symbols = [symbol] if symbol else list(self.symbols)
+        return [self._position_risk(account, symbol, side) for symbol in symbols for side in self._position_sides(account)]
+
+    def futures_account(self, account):
+        positions = []
+        initial_margin = unrealized = ZERO
+        for symbol in self.symbols:
+            for side in self._position_sides(account):
+                position = self._position(account, symbol, side)
+                leverage = account.leverage.get(symbol, 20)
+                margin = abs(position['amt']) * position['entry'] / leverage
+                profit = self._unrealized(symbol, position)
+                initial_margin += margin
+                unrealized += profit
+                positions.append({
+                    'symbol': symbol,
+                    'initialMargin': _str(margin),
+                    'maintMargin': _str(abs(position['amt']) * position['entry'] * LEVERAGE_BRACKETS[0][4]),
+                    'unrealizedProfit': _str(profit),
+                    'positionInitialMargin': _str(margin),
+                    'openOrderInitialMargin': '0',
+                    'leverage': str(leverage),
+                    'isolated': account.margin_type.get(symbol) == 'ISOLATED',
+                    'entryPrice': _str(position['entry']),
+                    'maxNotional': str(LEVERAGE_BRACKETS[-1][3]),
+                    'positionSide': side,
+                    'positionAmt': _str(position['amt']),
+                })
+        available = account.wallet + unrealized - initial_margin
+        asset = {
+            'asset': 'USDT',
+            'walletBalance': _str(account.wallet),
+            'unrealizedProfit': _str(unrealized),
+            'marginBalance': _str(account.wallet + unrealized),
+            'maintMargin': '0',
+            'initialMargin': _str(initial_margin),
+            'positionInitialMargin': _str(initial_margin),
+            'openOrderInitialMargin': '0',
+            'maxWithdrawAmount': _str(available),
+            'crossWalletBalance': _str(account.wallet),
+            'crossUnPnl': _str(unrealized),
+            'availableBalance': _str(available),
+        }
+        return {
+            'feeTier': self.fee_tier,
+            'canTrade': True,
+            'canDeposit': True,
+            'canWithdraw': True,
+            'updateTime': 0,
+            'totalInitialMargin': asset['initialMargin'],
+            'totalMaintMargin': '0',
+            'totalWalletBalance': asset['walletBalance'],
+            'totalUnrealizedProfit': asset['unrealizedProfit'],
+            'totalMarginBalance': asset['marginBalance'],
+            'totalPositionInitialMargin': asset['positionInitialMargin'],
+            'totalOpenOrderInitialMargin': '0',
+            'totalCrossWalletBalance': asset['crossWalletBalance'],
+            'totalCrossUnPnl': asset['crossUnPnl'],
+            'availableBalance': asset['availableBalance'],
+            'maxWithdrawAmount': asset['maxWithdrawAmount'],
+            'assets': [asset],
+            'positions': positions,
+        }
+
+    def change_leverage(self, account, params):
+        symbol = self.market(params)
+        leverage = int(params.get('leverage', 0))
+        if not 1 <= leverage <= 125:
+            raise MockError(400, -4028, f'Leverage {leverage} is not valid')
+        account.leverage[symbol] = leverage
+        return {'leverage': leverage, 'maxNotionalValue': str(LEVERAGE_BRACKETS[-1][3]), 'symbol': symbol}
+
+    def _has_position(self, account, symbol=None):
+        return any(position['amt'] for (position_symbol, _), position in account.positions.items()
+                   if symbol is None or position_symbol == symbol) or \
+            any(order['status'] == 'NEW' for order in account.swap_orders.values()
+                if symbol is None or order['symbol'] == symbol)
+
+    def change_margin_type(self, account, params):
+        symbol = self.market(params)
+        margin_type = params.get('marginType')
+        if margin_type == account.margin_type.get(symbol, 'CROSSED'):
+            raise MockError(400, -4046, 'No need to change margin type.')
+        if self._has_position(account, symbol):
+            raise MockError(400, -4048, 'Margin type cannot be changed if there exists position.')
+        account.margin_type[symbol] = margin_type
+        return {'code': 200, 'msg': 'success'}
+
+    def change_position_margin(self, account, params):
+        symbol = self.market(params)
+        amount = Decimal(params.get('amount', 0))
+        key = (symbol, params.get('positionSide', 'BOTH'))
+        sign = 1 if str(params.get('type')) == '1' else -1
+        account.isolated_margin[key] = account.isolated_margin.get(key, ZERO) + sign * amount
+        account.wallet -= sign * amount
+        return {'amount': _str(amount), 'code': 200, 'msg': 'Successfully modify position margin.', 'type': int(params.get('type'))}
+
+    def change_position_side(self, account, params):
+        dual = params.get('dualSidePosition') == 'true'
+        if dual == account.dual:
+            raise MockError(400, -4059, 'No need to change position side.')
+        if self._has_position(account):
+            raise MockError(400, -4068, 'Position side cannot be changed if there exists position.')
+        account.dual = dual
+        return {'code': 200, 'msg': 'success'}
+
+    def income(self, account, params):
+        symbol = self.market(params, required=False)
+        income_type = params.get('incomeType')
+        limit = min(int(params.get('limit', 100)), 1000)
+        rows = [income for income in account.incomes
+                if (symbol is None or income['symbol'] == symbol) and (income_type is None or income['incomeType'] == income_type)]
+        return self._page(rows, 'time', params, limit)
+
+    def leverage_bracket(self, params):
+        symbol = self.market(params, required=False)
+        brackets = [{
+            'bracket': bracket,
+            'initialLeverage': leverage,
+            'notionalCap': cap,
+            'notionalFloor': floor,
+            'maintMarginRatio': ratio,
+            'cum': cum,
+        } for bracket, leverage, floor, cap, ratio, cum in LEVERAGE_BRACKETS]
+        return [{'symbol': symbol, 'brackets': brackets} for symbol in ([symbol] if symbol else self.symbols)]
+
+    # spot ---------------------------------------------------------------------------------------------------------
+
+    def spot_account(self, account):
+        return {
+            'makerCommission': 10,
+            'takerCommission': 10,
+            'buyerCommission': 0,
+            'sellerCommission': 0,
+            'canTrade': True,
+            'canWithdraw': True,
+            'canDeposit': True,
+            'updateTime': _now(),
+            'accountType': 'SPOT',
+            'balances': [{'asset': asset, 'free': _str(amount), 'locked': '0'} for asset, amount in account.balances.items()],
+            'permissions': ['SPOT'],
+        }
+
+    def trade_fee(self, params):
+        symbols = [self.market(params)] if params.get('symbol') else self.symbols
+        return {
+            'tradeFee': [{'symbol': symbol, 'maker': float(self.maker), 'taker': float(self.taker)} for symbol in symbols],
+            'success': True,
+        }
+
+    # dispatch -----------------------------------------------------------------------------------------------------
+
+    def handle(self, method, path, params, api_key):
+        """
+        :param api_key:     None for public endpoints
+        :return:            response payload
+        :raise MockError:   error response
+        """
+        futures = path.startswith('/fapi/')
+        endpoint = path.rsplit('/v1/', 1)[-1].rsplit('/v2/', 1)[-1].rsplit('/v3/', 1)[-1]
+        if method == 'GET' and endpoint in ('time', 'ping'):
+            return {'serverTime': _now()} if endpoint == 'time' else {}
+        if method == 'GET' and endpoint == 'exchangeInfo':
+            return self.exchange_info(futures)
+        if method == 'GET' and endpoint == 'depth':
+            return self.order_book(params, futures)
+        if futures and method == 'GET' and endpoint == 'premiumIndex':
+            return self.premium_index(params)
+        if futures and method == 'GET' and endpoint == 'fundingRate':
+            return self.funding_rate(params)
+        if api_key is None:
+            raise MockError(401, -2014, 'API-key format invalid.')
+        account = self.account(api_key)
+        orders = account.swap_orders if futures else account.spot_orders
+        if endpoint == 'order':
+            if method == 'POST':
+                return self._create_order(account, params, futures)
+            if method == 'DELETE':
+                return self._cancel_order(account, params, futures)
+            if method == 'GET':
+                self.market(params)
+                return dict(self._find(orders, params))
+        if method == 'GET' and endpoint == 'openOrders':
+            return self._open_orders(orders, params)
+        if method == 'GET' and endpoint == 'allOrders':
+            return self._all_orders(orders, params, 500)
+        if futures:
+            if method == 'GET' and endpoint == 'userTrades':
+                return self._trades(account.swap_trades, params, 500)
+            if method == 'GET' and endpoint == 'account':
+                return self.futures_account(account)
+            if method == 'GET' and endpoint == 'balance':
+                return self.futures_account(account)['assets']
+            if method == 'GET' and endpoint == 'positionRisk':
+                return self.position_risk(account, params)
+            if method == 'POST' and endpoint == 'leverage':
+                return self.change_leverage(account, params)
+            if method == 'POST' and endpoint == 'marginType':
+                return self.change_margin_type(account, params)
+            if method == 'POST' and endpoint == 'positionMargin':
+                return self.change_position_margin(account, params)
+            if endpoint == 'positionSide/dual':
+                if method == 'GET':
+                    return {'dualSidePosition': account.dual}
+                if method == 'POST':
+                    return self.change_position_side(account, params)
+            if method == 'GET' and endpoint == 'income':
+                return self.income(account, params)
+            if method == 'GET' and endpoint == 'leverageBracket':
+                return self.leverage_bracket(params)
+        else:
+            if method == 'GET' and endpoint == 'myTrades':
+                return self._trades(account.spot_trades, params, 500)
+            if method == 'GET' and endpoint == 'account':
+                return self.spot_account(account)
+            if method == 'GET' and endpoint == 'tradeFee.html':
+                return self.trade_fee(params)
+            if method == 'GET' and endpoint == 'capital/config/getall':
+                return []
+        raise MockError(404, -1000, f'unsupported endpoint {method} {path}')
+
+
+class MockBinance:
+    """
+    Local stand-in of the Binance futures (fapi) and spot (api, wapi, sapi) REST endpoints used by
+    BinanceSwap and BinanceSpot, on top of MockBinanceEngine
+
+    Requests get the configured latency, random errors, and used weight headers. Requests over the
+    weight limit of the minute get 429, repeated ones 418. Signatures are checked for the api keys in
+    `secrets`, other api keys are accepted as they are.
+
+    example:
+        async with MockBinance(latency=(0.001, 0.005)) as mock:
+            api = BinanceSwap(mock.config({'apiKey': 'key', 'secret': 'secret'}))
+            await api.create_order('BTC/USDT', 'market', 'buy', '0.001')
+    """
+
+    def __init__(self, engine=None, latency=0, error_rate=0, errors=None, secrets=None, enforce_limits=True,
+                 ban_after=5, recv_window_check=True, seed=None):
+        """
+        :param engine:              MockBinanceEngine, a default one when None
+        :param latency:             seconds added to each response, a number, a (low, high) range or a
+                                    callable taking (method, path)
+        :param error_rate:          probability of answering a request with one of `errors`
+        :param errors:              list of (http status, code, msg), internal errors by default
+        :param secrets:             {apiKey: secret} whose signatures are verified
+        :param enforce_limits:      answer 429 / 418 over the weight limit
+        :param ban_after:           429s in a minute before answering 418 for the rest of it
+        """
+        self.engine = engine or MockBinanceEngine()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors = errors or [(503, -1001, 'Internal error; unable to process your request. Please try again.')]
+        self.secrets = secrets or {}
+        self.enforce_limits = enforce_limits
+        self.ban_after = ban_after
+        self.recv_window_check = recv_window_check
+        self.random = random.Random(seed)
+        self.failures = []
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.weights = {}
+        self.base_url = None
+        self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        :return:    base url of the server
+        """
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.base_url = f'http://{host}:{port}'
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def urls(self):
+        return {
+            'api': {
+                'web': self.base_url,
+                'wapi': self.base_url + '/wapi/v3',
+                'sapi': self.base_url + '/sapi/v1',
+                'fapiPublic': self.base_url + '/fapi/v1',
+                'fapiPrivate': self.base_url + '/fapi/v1',
+                'fapiPrivatev2': self.base_url + '/fapi/v2',
+                'public': self.base_url + '/api/v3',
+                'private': self.base_url + '/api/v3',
+                'v3': self.base_url + '/api/v3',
+                'v1': self.base_url + '/api/v1',
+            },
+        }
+
+    def config(self, config=None):
+        """
+        :return:    config of an API instance pointed at this server
+        """
+        return dict(config or {}, urls=self.urls())
+
+    def fail_next(self, status, code, msg, count=1):
+        """
+        Answer the next `count` requests with this error
+        """
+        self.failures.extend([(status, code, msg)] * count)
+
+    def used_weight(self, group):
+        minute, weight, _ = self.weights.get(group, (None, 0, 0))
+        return weight if minute == _now() // 60000 else 0
+
+    def _delay(self, method, path):
+        if callable(self.latency):
+            return self.latency(method, path)
+        if isinstance(self.latency, (tuple, list)):
+            return self.random.uniform(*self.latency)
+        return self.latency
+
+    def _weigh(self, group, method, path, params):
+        """
+        :return:    (used weight of the minute, error or None)
+        """
+        weight = WEIGHTS.get((method, path), 1)
+        if callable(weight):
+            weight = weight(params)
+        minute = _now() // 60000
+        used, rejected = 0, 0
+        current = self.weights.get(group)
+        if current is not None and current[0] == minute:
+            used, rejected = current[1:]
+        used += weight
+        error = None
+        if self.enforce_limits and used > WEIGHT_LIMITS[group]:
+            rejected += 1
+            if rejected > self.ban_after:
+                error = MockError(418, -1003, f'Way too many requests; IP banned until {(minute + 1) * 60000}.')
+            else:
+                error = MockError(429, -1003, f'Too many requests; current limit is {WEIGHT_LIMITS[group]} request weight per 1 MINUTE.')
+        self.weights[group] = (minute, used, rejected)
+        return used, error
+
+    def _authenticate(self, request, raw, params):
+        api_key = request.headers.get('X-MBX-APIKEY')
+        if 'signature' not in params:
+            return api_key
+        if api_key is None:
+            raise MockError(401, -2014, 'API-key format invalid.')
+        secret = self.secrets.get(api_key)
+        if secret is not None:
+            payload = raw.rsplit('&signature=', 1)[0]
+            expected = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, params['signature']):
+                raise MockError(400, -1022, 'Signature for this request is not valid.')
+        if self.recv_window_check and 'timestamp' in params:
+            recv_window = int(params.get('recvWindow', 5000))
+            if abs(_now() - int(params['timestamp'])) > recv_window:
+                raise MockError(400, -1021, 'Timestamp for this request is outside of the recvWindow.')
+        return api_key
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        method = request.method
+        path = request.path
+        group = 'fapi' if path.startswith('/fapi/') else 'api'
+        body = await request.text()
+        query = request.query_string
+        raw = body if body and method in ('POST', 'PUT') and 'signature=' in body else query
+        params = dict(parse_qsl(query))
+        if body:
+            params.update(parse_qsl(body))
+        self.requests[(method, path)] += 1
+        delay = self._delay(method, path)
+        if delay:
+            await asyncio.sleep(delay)
+        used, error = self._weigh(group, method, path, params)
+        headers = {
+            'X-MBX-USED-WEIGHT-1M': str(used),
+            'X-MBX-USED-WEIGHT': str(used),
+        }
+        try:
+            if error is not None:
+                headers['Retry-After'] = str(60 - _now() // 1000 % 60)
+                raise error
+            if self.failures:
+                raise MockError(*self.failures.pop(0))
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise MockError(*self.random.choice(self.errors))
+            api_key = self._authenticate(request, raw, params)
+            signed_params = {key: value for key, value in params.items() if key not in ('signature', 'timestamp', 'recvWindow')}
+            payload = self.engine.handle(method, path, signed_params, api_key if 'signature' in params else None)
+            status = 200
+        except MockError as e:
+            status = e.status
+            payload = {'code': e.code, 'msg': e.msg}
+        self.statuses[status] += 1
+        return web.Response(status=status, headers=headers, content_type='application/json',
+                            text=simplejson.dumps(payload, use_decimal=True))
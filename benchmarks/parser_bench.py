@@ -0,0 +1,269 @@
+"""
+Records per second and memory per record of the BinanceSwap parse functions, checked against a stored baseline
+
+Payloads are synthetic, built by the mock exchange, or taken from an archive written by
+ccxt_ext.transport.Recorder. Throughput is stored relative to a calibration loop, so a baseline
+saved on one machine can be checked on another. The baseline is the median of several rounds, and a
+case only fails the check when it is slower again in each of the `--confirm` reruns. A missing
+baseline fails the check unless --allow-missing-baseline is given.
+
+example:
+    python -m benchmarks.parser_bench --save-baseline
+    python -m benchmarks.parser_bench --records binance.jsonl.gz --threshold 0.4
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+import simplejson
+
+from benchmarks.mock_binance import MockBinanceEngine
+from ccxt_ext.transport import load_records
+from exchanges import load_exchange_class
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'parser_baseline.json')
+# records of a case are repeated up to this count, so small payload kinds are sampled as well as the others
+MIN_RECORDS = 1000
+
+# archive path: payload kind
+RECORDED_PATHS = {
+    '/fapi/v1/order': 'orders',
+    '/fapi/v1/openOrders': 'orders',
+    '/fapi/v1/allOrders': 'orders',
+    '/fapi/v1/userTrades': 'trades',
+    '/fapi/v2/positionRisk': 'positions',
+    '/fapi/v1/positionRisk': 'positions',
+    '/fapi/v1/depth': 'order_books',
+    '/fapi/v1/income': 'incomes',
+}
+
+
+def synthetic_payloads(count):
+    """
+    :return:    {kind: list of raw payloads}, decoded the way responses are
+    """
+    engine = MockBinanceEngine(depth=100)
+    api_key = 'bench'
+    symbols = list(engine.symbols)
+    for i in range(count):
+        symbol = symbols[i % len(symbols)]
+        step = engine.symbols[symbol][4]
+        bid, ask = engine.best(symbol)
+        if i % 2:
+            engine.handle('POST', '/fapi/v1/order', {'symbol': symbol, 'side': 'BUY' if i % 4 == 1 else 'SELL',
+                                                     'type': 'MARKET', 'quantity': str(step * (i % 7 + 1))}, api_key)
+        else:
+            engine.handle('POST', '/fapi/v1/order', {'symbol': symbol, 'side': 'BUY', 'type': 'LIMIT',
+                                                     'quantity': str(step * (i % 5 + 1)), 'price': str(bid - i % 3 * engine.symbols[symbol][3])}, api_key)
+    account = engine.account(api_key)
+
+    def decoded(payload):
+        return simplejson.loads(simplejson.dumps(payload, use_decimal=True), use_decimal=True)
+
+    positions = engine.handle('GET', '/fapi/v2/positionRisk', {}, api_key)
+    return {
+        'orders': decoded(list(account.swap_orders.values())),
+        'trades': decoded(account.swap_trades),
+        'positions': decoded((positions * (count // len(positions) + 1))[:count]),
+        'incomes': decoded(account.incomes),
+        'order_books': decoded([engine.handle('GET', '/fapi/v1/depth', {'symbol': symbols[i % len(symbols)], 'limit': 100}, None)
+                                for i in range(max(count // 10, 1))]),
+        'markets': engine.exchange_info(True)['symbols'],
+    }
+
+
+def recorded_payloads(path):
+    payloads = {}
+    for record in load_records(path):
+        kind = RECORDED_PATHS.get(urlsplit(record['url']).path)
+        if kind is None or record['status'] != 200:
+            continue
+        response = simplejson.loads(record['response'], use_decimal=True)
+        if kind == 'order_books' or isinstance(response, dict):
+            payloads.setdefault(kind, []).append(response)
+        else:
+            payloads.setdefault(kind, []).extend(response)
+    return payloads
+
+
+def cases(api, payloads):
+    """
+    :return:    {case name: (function of one record, records, options to set while running)}
+    """
+    result = {}
+    payloads = {kind: records * -(-MIN_RECORDS // len(records)) for kind, records in payloads.items() if records}
+    if payloads.get('orders'):
+        result['parse_swap_order'] = (api.parse_swap_order, payloads['orders'], {})
+        result['parse_swap_order[parseOrderToPrecision]'] = (api.parse_swap_order, payloads['orders'], {'parseOrderToPrecision': True})
+    if payloads.get('trades'):
+        result['parse_swap_trade'] = (api.parse_swap_trade, payloads['trades'], {})
+    if payloads.get('positions'):
+        result['parse_swap_position'] = (api.parse_swap_position, payloads['positions'], {})
+    if payloads.get('incomes'):
+        result['parse_swap_income'] = (api.parse_swap_income, payloads['incomes'], {})
+    if payloads.get('order_books'):
+        result['parse_order_book'] = (api.parse_order_book, payloads['order_books'], {})
+    if payloads.get('markets'):
+        result['parse_swap_market'] = (api.parse_swap_market, payloads['markets'], {})
+    return result
+
+
+def _multiply(value):
+    return Decimal(value['price']) * Decimal(value['qty'])
+
+
+_CALIBRATION = [{'price': str(i), 'qty': '0.001'} for i in range(10000)]
+
+
+def calibrate():
+    """
+    :return:    operations per second of a fixed loop in the style of the parsers
+    """
+    return measure(_multiply, _CALIBRATION)
+
+
+def measure(function, records, min_time=0.1):
+    """
+    :return:    records per second of one run, passing over the records until it took `min_time` seconds
+                with the garbage collector kept from running in the middle
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        count = 0
+        started = time.perf_counter()
+        while True:
+            for record in records:
+                function(record)
+            count += len(records)
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                return count / elapsed
+    finally:
+        gc.enable()
+
+
+def measure_memory(function, records):
+    """
+    :return:    (retained bytes per record, retained blocks per record)
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [function(record) for record in records]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    del results
+    return size / len(records), blocks / len(records)
+
+
+def run(api, payloads, repeat, names=None):
+    """
+    :param names:   cases to run, all when None
+    """
+    results = {}
+    for name, (function, records, options) in cases(api, payloads).items():
+        if names is not None and name not in names:
+            continue
+        saved = {key: api.options.get(key) for key in options}
+        api.options.update(options)
+        try:
+            throughputs = []
+            calibrations = []
+            for _ in range(repeat):
+                # interleaved, so a busy moment of the machine slows both
+                calibrations.append(calibrate())
+                throughputs.append(measure(function, records))
+            size, blocks = measure_memory(function, records)
+        finally:
+            api.options.update(saved)
+        results[name] = {
+            'records': len(records),
+            # the fastest run is the one least disturbed by the rest of the machine
+            'recordsPerSecond': max(throughputs),
+            'relative': max(throughputs) / max(calibrations),
+            'bytesPerRecord': size,
+            'blocksPerRecord': blocks,
+        }
+    return results
+
+
+def median_results(rounds):
+    """
+    :return:    results of several `run`s with the median throughputs, so one disturbed round does not move a baseline
+    """
+    results = {}
+    for name, result in rounds[0].items():
+        results[name] = dict(result, **{key: statistics.median(round[name][key] for round in rounds)
+                                        for key in ('recordsPerSecond', 'relative')})
+    return results
+
+
+def check(results, baseline, threshold):
+    """
+    :return:    list of (case, relative throughput, baseline) slower than the baseline by more than `threshold`
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name, {}).get('relative')
+        if expected and result['relative'] < expected * (1 - threshold):
+            regressions.append((name, result['relative'], expected))
+    return regressions
+
+
+def main(args):
+    api = load_exchange_class(args.exchange, 'swap')({})
+    synthetic = synthetic_payloads(args.count)
+    api.set_markets([api.parse_swap_market(market) for market in synthetic['markets']])
+    payloads = recorded_payloads(args.records) if args.records else synthetic
+    results = run(api, payloads, args.repeat)
+    for name, result in results.items():
+        print(f'{name:42} {result["recordsPerSecond"]:12.0f} records/s  {result["bytesPerRecord"]:8.0f} B/record  '
+              f'{result["blocksPerRecord"]:6.1f} blocks/record')
+
+    if args.save_baseline:
+        results = median_results([results] + [run(api, payloads, args.repeat) for _ in range(args.rounds - 1)])
+        with open(args.baseline, 'w') as f:
+            simplejson.dump(results, f, indent=2)
+        print(f'baseline saved to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}, run with --save-baseline first')
+        return 0 if args.allow_missing_baseline else 2
+    with open(args.baseline) as f:
+        baseline = simplejson.load(f)
+    regressions = check(results, baseline, args.threshold)
+    for _ in range(args.confirm):
+        if not regressions:
+            break
+        # a regression shows again, noise of the machine does not
+        results = run(api, payloads, args.repeat, [name for name, _, _ in regressions])
+        regressions = check(results, baseline, args.threshold)
+    for name, relative, expected in regressions:
+        print(f'REGRESSION {name}: {relative:.3f} vs baseline {expected:.3f} ({relative / expected - 1:+.1%})')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--count', type=int, default=2000, help='synthetic records per parse function')
+    parser.add_argument('--records', help='archive written by ccxt_ext.transport.Recorder instead of synthetic records')
+    parser.add_argument('--repeat', type=int, default=7, help='runs per case, each next to a calibration run, the fastest counts')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--rounds', type=int, default=5, help='runs of all cases whose median is saved as baseline')
+    parser.add_argument('--confirm', type=int, default=2, help='reruns a regression has to show in again to fail the check')
+    parser.add_argument('--allow-missing-baseline', action='store_true', help='exit 0 when there is no baseline to check')
+    # run to run noise of a case reaches 25-30% on a shared machine, a regression below that is not told apart
+    parser.add_argument('--threshold', type=float, default=0.3, help='allowed slowdown against the baseline')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Validation time of parsed structures with the schemas of utils/schemas.py against their compiled validators
+
+Structures are parsed by BinanceSwap from the synthetic payloads of parser_bench and validated in pages,
+the way fetch_* results are.
+
+example:
+    python -m benchmarks.validator_bench
+    python -m benchmarks.validator_bench --count 5000 --page 500
+"""
+import argparse
+import time
+
+from benchmarks.parser_bench import synthetic_payloads
+from exchanges import load_exchange_class
+from utils import schemas
+from utils.validators import compile_schema
+
+
+def pages(api, payloads, size):
+    """
+    :return:    {case name: (list schema, list of pages of structures)}
+    """
+    structures = {
+        'markets': (schemas.MARKETS_SCHEMA, [api.parse_swap_market(market) for market in payloads['markets']]),
+        'orders': (schemas.ORDERS_SCHEMA, [api.parse_swap_order(order) for order in payloads['orders']]),
+        'trades': (schemas.TRADES_SCHEMA, [api.parse_swap_trade(trade) for trade in payloads['trades']]),
+        'positions': (schemas.POSITIONS_SCHEMA, [api.parse_swap_position(position) for position in payloads['positions']]),
+    }
+    result = {name: (schema, [records[i:i + size] for i in range(0, len(records), size)])
+              for name, (schema, records) in structures.items()}
+    result['order_book'] = (schemas.ORDER_BOOK_SCHEMA, [api.parse_order_book(book) for book in payloads['order_books']])
+    return result
+
+
+def measure(validate, values, repeat):
+    """
+    :return:    seconds of the best run
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for value in values:
+            validate(value)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(api, payloads, page, repeat):
+    results = {}
+    for name, (schema, values) in pages(api, payloads, page).items():
+        records = sum(len(value) for value in values) if name != 'order_book' else len(values)
+        started = time.perf_counter()
+        validator = compile_schema(schema)
+        compile_time = time.perf_counter() - started
+        interpreted = measure(schema.validate, values, repeat)
+        compiled = measure(validator, values, repeat)
+        results[name] = {
+            'records': records,
+            'schemaUsPerRecord': interpreted / records * 1e6,
+            'compiledUsPerRecord': compiled / records * 1e6,
+            'speedup': interpreted / compiled,
+            'compileMs': compile_time * 1000,
+        }
+    return results
+
+
+def main(args):
+    api = load_exchange_class(args.exchange, 'swap')({})
+    payloads = synthetic_payloads(args.count)
+    api.set_markets([api.parse_swap_market(market) for market in payloads['markets']])
+    for name, result in run(api, payloads, args.page, args.repeat).items():
+        print(f'{name:12} schema {result["schemaUsPerRecord"]:9.2f} us/record  compiled {result["compiledUsPerRecord"]:7.2f} us/record  '
+              f'x{result["speedup"]:6.1f}  compiled in {result["compileMs"]:.1f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--count', type=int, default=2000, help='synthetic records per structure')
+    parser.add_argument('--page', type=int, default=100, help='records per validated list, like a fetch_* page')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the best one counts')
+    main(parser.parse_args())
@@ -1,10 +1,77 @@
+import asyncio
+import contextvars
+import functools
+import gzip
+import hashlib
 from decimal import Decimal
+from urllib.parse import urlsplit
 import simplejson
+import yarl
 from ccxt.async_support import Exchange
 import collections
 
+from ccxt_ext.info import INFO_RETENTIONS, LazyInfo
+from ccxt_ext.json_stream import JsonArrayStream
+from ccxt_ext.transport import HttpTransport, client_errors
+
+_describe_cache = {}
+_http_transport = HttpTransport()
+# (tenant, endpoint, weight) of the request being sent, for the accounting
+_request_entry = contextvars.ContextVar('request_entry', default=None)
+
+
+@functools.lru_cache(maxsize=4096)
+def _digest(api_key):
+    return api_key and hashlib.sha256(api_key.encode()).hexdigest()[:32]
+
+
+def tenant_key(credentials):
+    """
+    Digest of the api key in `credentials`, the identity of a tenant wherever it keys a cache or a limit
+    """
+    return _digest((credentials or {}).get('apiKey'))
+
+
+def _to_key(value):
+    # json turns tuple keys into lists
+    if isinstance(value, list):
+        return tuple(_to_key(item) for item in value)
+    return value
+
+
+def cached_describe(describe):
+    """
+    Compute describe() once per class and share the result between instances.
+    Exchange.__init__ deep extends it with the config, which copies every dict, so instances never modify it.
+    """
+    @functools.wraps(describe)
+    def wrapper(self):
+        key = (type(self), describe)
+        result = _describe_cache.get(key)
+        if result is None:
+            result = _describe_cache[key] = describe(self)
+        return result
+    return wrapper
+
 
 class CCXTExtension:
+    # ccxt_ext.transport.Recorder or Replayer, given as 'transport' in the config, None to send requests as ccxt does
+    transport = None
+    # utils.request_accounting.RequestAccounting, given as 'accounting' in the config
+    accounting = None
+    # task reloading the markets restored by `restore_warm_state`
+    markets_validation = None
+
+    @classmethod
+    def define_rest_api(cls, api, method_name, options={}):
+        # ccxt binds the endpoint methods to the class, so they are only generated again for a different api,
+        # eg. one given in the config of an instance
+        defined = cls.__dict__.get('_defined_rest_apis', {})
+        if defined.get(method_name) == api:
+            return
+        super().define_rest_api(api, method_name, options)
+        cls._defined_rest_apis = dict(defined, **{method_name: api})
+
     @staticmethod
     def extend(*args):
         if args is not None:
@@ -34,6 +101,136 @@ class CCXTExtension:
     def safe_decimal_2(dictionary, key1, key2, default_value=None):
         return Exchange.safe_either(CCXTExtension.safe_decimal, dictionary, key1, key2, default_value)
 
+    CREDENTIAL_KEYS = ('apiKey', 'secret')
+
+    @staticmethod
+    def split_credentials(params):
+        """
+        Take the per call credentials out of the request params
+
+        :return:    (params without credentials, apiKey or None, secret or None)
+        """
+        if not params or not any(key in params for key in CCXTExtension.CREDENTIAL_KEYS):
+            return params, None, None
+        params = dict(params)
+        return params, params.pop('apiKey', None), params.pop('secret', None)
+
+    def sign(self, path, api='public', method='GET', params={}, headers=None, body=None):
+        params, api_key, secret = self.split_credentials(params)
+        if api_key is None and secret is None:
+            return super().sign(path, api, method, params, headers, body)
+        # sign is synchronous, no other coroutine can observe the swapped credentials
+        instance_api_key, instance_secret = self.apiKey, self.secret
+        self.apiKey, self.secret = api_key or instance_api_key, secret or instance_secret
+        try:
+            return super().sign(path, api, method, params, headers, body)
+        finally:
+            self.apiKey, self.secret = instance_api_key, instance_secret
+
+    def tenant_key(self, params=None):
+        """
+        Identity of the account a call is made for, used to key per-tenant caches.
+        A digest of the api key, so caches can be persisted without credentials.
+        """
+        return _digest((params or {}).get('apiKey') or self.apiKey)
+
+    def warm_state_caches(self):
+        """
+        :return:    {name: CoalescingCache} of the caches saved with the warm state, to be overridden
+        """
+        return {}
+
+    def save_warm_state(self, path):
+        """
+        Save markets, clock offset and caches to a gzipped json file. Holds no credentials.
+        """
+        state = {
+            'savedAt': self.milliseconds(),
+            'markets': list(self.markets.values()) if self.markets else None,
+            'currencies': self.currencies,
+            'timeDifference': self.options.get('timeDifference'),
+            'caches': {name: [[key, age, value] for key, age, value in cache.dump()]
+                       for name, cache in self.warm_state_caches().items()},
+        }
+        with gzip.open(path, 'wt') as f:
+            simplejson.dump(state, f, separators=(',', ':'), for_json=True)
+
+    def restore_warm_state(self, path, validate=True):
+        """
+        Restore the state saved by `save_warm_state`. Cache entries keep the age they had when saved.
+
+        :param validate:    reload the markets in the background when an event loop is running, as
+                            `markets_validation`. Calls made meanwhile use the restored ones, and keep
+                            using them if the reload fails.
+        :return:            False if there was no usable state
+        """
+        try:
+            with gzip.open(path, 'rt') as f:
+                state = simplejson.load(f, use_decimal=True)
+        except (OSError, ValueError):
+            return False
+        downtime = max(self.milliseconds() - int(state['savedAt']), 0) / 1000
+        if state['markets']:
+            self.set_markets(state['markets'], state['currencies'])
+        if state['timeDifference'] is not None:
+            self.options['timeDifference'] = int(state['timeDifference'])
+        caches = self.warm_state_caches()
+        for name, entries in state['caches'].items():
+            if name in caches:
+                caches[name].load([(_to_key(key), float(age) + downtime, value) for key, age, value in entries])
+        if validate and state['markets']:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                # not through load_markets, which would make every call wait for the reload
+                self.markets_validation = asyncio.ensure_future(self._validate_markets())
+        return True
+
+    async def _validate_markets(self):
+        try:
+            currencies = await self.fetch_currencies() if self.has['fetchCurrencies'] else None
+            markets = await self.fetch_markets()
+        except Exception as e:
+            self.logger.warning('%s reloading the restored markets failed: %r', self.id, e)
+            return
+        self.set_markets(markets, currencies)
+
+    def retain_info(self, kind, info):
+        """
+        Raw payload to keep as 'info' of a parsed structure, following the `infoRetention` option:
+        'full' keeps it as it is, 'minimal' only its `infoFields` of the kind, 'lazy' keeps it as json bytes
+        decoded on access (LazyInfo)
+
+        :param kind:    'market', 'order', 'trade', 'position', 'income', ...
+        """
+        retention = self.options.get('infoRetention', 'full')
+        if retention == 'full' or info is None:
+            return info
+        if retention == 'minimal':
+            return {key: info[key] for key in self.options.get('infoFields', {}).get(kind, ()) if key in info}
+        if retention == 'lazy':
+            return LazyInfo.encode(info)
+        raise ValueError(f'unknown infoRetention: {retention}, expected one of {INFO_RETENTIONS}')
+
+    async def fetch_by_symbols(self, symbols, fetch_one, fetch_all, weight_one, weight_all):
+        """
+        Call fetch_all once, or fetch_one for each symbol, whichever costs less request weight
+
+        :param symbols:     list of symbols, None for all
+        :param fetch_one:   coroutine function taking a symbol, returns the list of its structures
+        :param fetch_all:   coroutine function taking the symbols, returns structures of any symbols
+        :return:            {symbol: list of structures}, every requested symbol is a key
+        """
+        if symbols is None or len(symbols) * weight_one >= weight_all:
+            grouped = self.group_by(await fetch_all(symbols), 'symbol')
+            if symbols is None:
+                return grouped
+            return {symbol: grouped.get(symbol, []) for symbol in symbols}
+        results = await asyncio.gather(*[fetch_one(symbol) for symbol in symbols])
+        return dict(zip(symbols, results))
+
     def parse_json(self, http_response):
         try:
             if Exchange.is_json_encoded_object(http_response):
@@ -47,4 +244,156 @@ class CCXTExtension:
 
     @staticmethod
     def json(data, params=None):
-        return simplejson.dumps(data, separators=(',', ':'))
\ No newline at end of file
+        return simplejson.dumps(data, separators=(',', ':'))
+
+    def request_weight(self, path, api='public', method='GET', params=None):
+        """
+        :return:    weight of the request against the rate limit of the exchange, from the `requestWeights` option
+        """
+        return self.options.get('requestWeights', {}).get(path, 1)
+
+    def account_request(self, url, status, headers=None):
+        """
+        Record the response of the request being sent, status None if there was no response
+        """
+        entry = _request_entry.get()
+        if self.accounting is not None and entry is not None:
+            self.accounting.record(*entry, status, headers, urlsplit(url).netloc)
+
+    def _enter_request(self, path, api, method, params):
+        if self.accounting is None:
+            return None
+        return _request_entry.set((self.tenant_key(params), f'{method} {api}/{path}',
+                                   self.request_weight(path, api, method, params)))
+
+    async def fetch2(self, path, api='public', method='GET', params={}, headers=None, body=None):
+        token = self._enter_request(path, api, method, params)
+        try:
+            return await super().fetch2(path, api, method, params, headers, body)
+        finally:
+            if token is not None:
+                _request_entry.reset(token)
+
+    async def request_stream(self, path, api='public', method='GET', params={}, key=None, headers=None, body=None):
+        """
+        Same as `request`, but yields the elements of the array in the response one by one as they arrive
+
+        :param key:     key of the array in the top-level object, None if the response itself is an array
+        """
+        if self.enableRateLimit:
+            await self.throttle()
+        self.lastRestRequestTimestamp = self.milliseconds()
+        request = self.sign(path, api, method, params, headers, body)
+        token = self._enter_request(path, api, method, params)
+        try:
+            async for element in self.fetch_stream(request['url'], request['method'], request['headers'], request['body'], key):
+                yield element
+        finally:
+            if token is not None:
+                _request_entry.reset(token)
+
+    async def request_parsed(self, path, api='public', method='GET', params={}, parse=None, key=None):
+        """
+        Stream the array in the response and hand each element to `parse`
+        """
+        result = []
+        async for element in self.request_stream(path, api, method, params, key):
+            result.append(parse(element))
+        return result
+
+    async def fetch(self, url, method='GET', headers=None, body=None):
+        if self.transport is None and self.accounting is None:
+            return await super().fetch(url, method, headers, body)
+        http_response, json_response = await self.fetch_transport(url, method, headers, body)
+        return http_response if json_response is None else json_response
+
+    async def fetch_transport(self, url, method='GET', headers=None, body=None):
+        """
+        Send the request through `transport`, plain http if there is none, and handle errors the way `fetch` does
+
+        :return:    (response text, decoded json or None)
+        """
+        request_headers = self.prepare_request_headers(headers)
+        self.log_request(url, method, request_headers, body)
+        self.lastRestRequestTimestamp = self.milliseconds()
+        try:
+            status, reason, response_headers, http_response = await (self.transport or _http_transport).request(
+                self, url, method, request_headers, body)
+        except Exception:
+            self.account_request(url, None)
+            raise
+        self.account_request(url, status, response_headers)
+        json_response = self.handle_response(url, method, request_headers, body, status, reason, response_headers,
+                                             http_response)
+        return http_response, json_response
+
+    def log_request(self, url, method, headers, body):
+        if self.verbose:
+            self.print("\nRequest:", method, self.proxy + url, headers, body)
+        self.logger.debug("%s %s, Request: %s %s", method, self.proxy + url, headers, body)
+
+    def handle_response(self, url, method, request_headers, body, status, reason, headers, http_response):
+        """
+        Keep the response as the last one and raise the errors found in it, as `fetch` does
+
+        :return:    decoded json, None if the response is no json
+        """
+        url = self.proxy + url
+        json_response = self.parse_json(http_response)
+        if self.enableLastHttpResponse:
+            self.last_http_response = http_response
+        if self.enableLastResponseHeaders:
+            self.last_response_headers = headers
+        if self.enableLastJsonResponse:
+            self.last_json_response = json_response
+        if self.verbose:
+            self.print("\nResponse:", method, url, status, headers, http_response)
+        self.logger.debug("%s %s, Response: %s %s %s", method, url, status, headers, http_response)
+        self.handle_errors(status, reason, url, method, headers, http_response, json_response, request_headers, body)
+        self.handle_rest_errors(status, reason, http_response, url, method)
+        self.handle_rest_response(http_response, json_response, url, method)
+        return json_response
+
+    async def fetch_stream(self, url, method='GET', headers=None, body=None, key=None):
+        if self.transport is not None:
+            # recorded responses are whole, parse them in one go
+            http_response, _ = await self.fetch_transport(url, method, headers, body)
+            for element in JsonArrayStream(key, loads=self.unjson).feed(http_response):
+                yield element
+            return
+        request_headers = self.prepare_request_headers(headers)
+        self.log_request(url, method, request_headers, body)
+        self.lastRestRequestTimestamp = self.milliseconds()
+        encoded_body = body.encode() if body else None
+        self.open()
+        session_method = getattr(self.session, method.lower())
+        responded = False
+        try:
+            with client_errors(method, self.proxy + url):
+                async with session_method(yarl.URL(self.proxy + url, encoded=True), data=encoded_body,
+                                          headers=request_headers, timeout=(self.timeout / 1000),
+                                          proxy=self.aiohttp_proxy) as response:
+                    responded = True
+                    self.account_request(url, response.status, response.headers)
+                    if response.status >= 300:
+                        # errors are small, let the regular handlers deal with them
+                        self.handle_response(url, method, request_headers, body, response.status, response.reason,
+                                             response.headers, await response.text())
+                        return
+                    # the streamed body is not kept, the last response is only known by its headers
+                    if self.enableLastHttpResponse:
+                        self.last_http_response = None
+                    if self.enableLastResponseHeaders:
+                        self.last_response_headers = response.headers
+                    if self.enableLastJsonResponse:
+                        self.last_json_response = None
+                    parser = JsonArrayStream(key, loads=self.unjson)
+                    async for chunk in response.content.iter_any():
+                        for element in parser.feed(chunk):
+                            yield element
+                        if parser.done:
+                            break
+        except Exception:
+            if not responded:
+                self.account_request(url, None)
+            raise
@@ -1,4 +1,4 @@
-from ccxt import ExchangeError
+from ccxt import ExchangeError, ExchangeNotAvailable
 
 
 class ChangeMarginTypeError(ExchangeError):
@@ -7,3 +7,15 @@ class ChangeMarginTypeError(ExchangeError):
 
 class ChangePositionError(ExchangeError):
     pass
+
+
+class ReplayMissError(ExchangeError):
+    pass
+
+
+class InvalidResultError(ExchangeError):
+    pass
+
+
+class WorkerExitedError(ExchangeNotAvailable):
+    pass
@@ -0,0 +1,52 @@
+from collections.abc import Mapping
+
+import simplejson
+
+# values of the infoRetention option
+INFO_RETENTIONS = ('full', 'minimal', 'lazy')
+
+
+class LazyInfo(Mapping):
+    """
+    Raw payload of a parsed structure kept as compact json bytes, decoded again on every access
+
+    A bytes object takes a fraction of the memory of the dict it encodes, which is what long-lived
+    caches of orders, trades and positions hold. Reading it costs a decode each time, call `decode`
+    once when several fields are needed.
+    """
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        """
+        :param raw: json bytes of the payload
+        """
+        self.raw = raw
+
+    @classmethod
+    def encode(cls, payload):
+        return cls(simplejson.dumps(payload, separators=(',', ':')).encode())
+
+    def decode(self):
+        return simplejson.loads(self.raw, use_decimal=True)
+
+    def __getitem__(self, key):
+        return self.decode()[key]
+
+    def __iter__(self):
+        return iter(self.decode())
+
+    def __len__(self):
+        return len(self.decode())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyInfo):
+            return self.raw == other.raw
+        return self.decode() == other
+
+    def __repr__(self):
+        return f'LazyInfo({self.raw.decode()})'
+
+    def for_json(self):
+        # simplejson.dumps(..., for_json=True) writes the payload itself
+        return self.decode()
@@ -0,0 +1,106 @@
+import codecs
+
+import simplejson
+
+
+class JsonArrayStream:
+    """
+    Incremental parser which picks the elements of one JSON array out of a byte stream.
+
+    The array is either the top-level value (key=None) or the value of `key` in the top-level object,
+    eg. key='symbols' for the exchangeInfo response. Each element is decoded as soon as it is complete,
+    so the whole response never has to be buffered.
+    """
+
+    WHITESPACE = ' \t\r\n'
+
+    def __init__(self, key=None, loads=None):
+        self.key = key
+        self.loads = loads or (lambda text: simplejson.loads(text, use_decimal=True))
+        self.done = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._target_depth = None
+        self._element_start = None
+
+    def feed(self, data):
+        """
+        Feed a chunk of the response
+
+        :param data:    bytes or str
+        :return:        list of the elements completed by this chunk
+        """
+        if self.done:
+            return []
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        self._buffer += data
+        buffer = self._buffer
+        elements = []
+        i = self._pos
+        n = len(buffer)
+        while i < n:
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._target_depth is None:
+                        self._last_key = buffer[self._string_start + 1:i]
+                i += 1
+                continue
+
+            in_target = self._target_depth is not None and self._depth == self._target_depth
+            if in_target and self._element_start is None and c not in self.WHITESPACE and c not in ',]':
+                self._element_start = i
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == '{' or c == '[':
+                if c == '[' and self._target_depth is None and self._is_target_start():
+                    self._target_depth = self._depth + 1
+                self._depth += 1
+            elif c == ',' and in_target:
+                elements.append(self._take_element(buffer, i))
+            elif c == '}' or c == ']':
+                if in_target:
+                    if self._element_start is not None:
+                        elements.append(self._take_element(buffer, i))
+                    self.done = True
+                    break
+                self._depth -= 1
+            i += 1
+
+        if self._element_start is not None:
+            cut = self._element_start
+        elif self._in_string:
+            cut = self._string_start
+        else:
+            cut = i
+        self._buffer = buffer[cut:]
+        self._pos = i - cut
+        if self._element_start is not None:
+            self._element_start -= cut
+        if self._string_start is not None:
+            self._string_start -= cut
+        return elements
+
+    def _is_target_start(self):
+        if self.key is None:
+            return self._depth == 0
+        return self._depth == 1 and self._last_key == self.key
+
+    def _take_element(self, buffer, end):
+        text = buffer[self._element_start:end]
+        self._element_start = None
+        return self.loads(text)
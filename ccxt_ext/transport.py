@@ -0,0 +1,182 @@
+import asyncio
+import contextlib
+import gzip
+import re
+import socket
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import aiohttp
+import simplejson
+import yarl
+from ccxt.base.errors import ExchangeError, ExchangeNotAvailable, RequestTimeout
+
+from ccxt_ext.errors import ReplayMissError
+
+# query / body parameters replaced by REDACTED in records
+REDACTED_PARAMS = {'signature', 'apiKey', 'secret', 'listenKey'}
+# parameters which differ between a recording and its replay, ignored to match requests
+VOLATILE_PARAMS = {'signature', 'timestamp', 'recvWindow'}
+REDACTED = 'REDACTED'
+# response headers kept in records, the rest is noise
+RECORDED_HEADERS = {'content-type', 'x-mbx-used-weight', 'x-mbx-used-weight-1m', 'x-mbx-order-count-10s',
+                    'x-mbx-order-count-1m', 'retry-after'}
+
+_listen_key = re.compile(r'("listenKey"\s*:\s*")[^"]*(")')
+
+
+def _redact_query(query):
+    if not query:
+        return query
+    return urlencode([(key, REDACTED if key in REDACTED_PARAMS else value)
+                      for key, value in parse_qsl(query, keep_blank_values=True)])
+
+
+def redact_url(url):
+    parts = urlsplit(url)
+    return parts._replace(query=_redact_query(parts.query)).geturl()
+
+
+def request_key(method, url, body=None):
+    """
+    Identity of a request regardless of host, signature and timestamp
+    """
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    if body:
+        params += parse_qsl(body, keep_blank_values=True)
+    return method.upper(), parts.path, tuple(sorted((key, value) for key, value in params if key not in VOLATILE_PARAMS))
+
+
+@contextlib.contextmanager
+def client_errors(method, url):
+    """
+    Raise the ccxt error `Exchange.fetch` raises for an exception of the connection
+    """
+    try:
+        yield
+    except socket.gaierror:
+        raise ExchangeNotAvailable(method + ' ' + url)
+    except asyncio.TimeoutError:
+        raise RequestTimeout(method + ' ' + url)
+    except aiohttp.ClientConnectionError:
+        raise ExchangeNotAvailable(method + ' ' + url)
+    except aiohttp.ClientError:
+        raise ExchangeError(method + ' ' + url)
+
+
+def load_records(path):
+    """
+    :return:    iterator of the records in an archive written by Recorder
+    """
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            if line.strip():
+                yield simplejson.loads(line)
+
+
+class HttpTransport:
+    """
+    Plain aiohttp transport, the way ccxt sends requests
+    """
+
+    async def request(self, api, url, method, headers, body):
+        """
+        :return:    (http status, reason, response headers, response text)
+        """
+        url = api.proxy + url
+        api.open()
+        session_method = getattr(api.session, method.lower())
+        encoded_body = body.encode() if body else None
+        with client_errors(method, url):
+            async with session_method(yarl.URL(url, encoded=True), data=encoded_body, headers=headers,
+                                      timeout=(api.timeout / 1000), proxy=api.aiohttp_proxy) as response:
+                return response.status, response.reason, response.headers, await response.text()
+
+
+class Recorder(HttpTransport):
+    """
+    Sends requests over the network and appends each exchange of request and response to a gzipped
+    JSONL archive. Signatures, keys and listen keys are redacted, request headers are not recorded.
+
+    example:
+        with Recorder('binance.jsonl.gz') as recorder:
+            api = BinanceSwap({'transport': recorder})
+            ...
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._started = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    async def request(self, api, url, method, headers, body):
+        started = time.monotonic()
+        status, reason, response_headers, text = await super().request(api, url, method, headers, body)
+        if self._file is None:
+            self._file = gzip.open(self.path, 'at')
+            self._started = started
+        self._file.write(simplejson.dumps({
+            'offset': int((started - self._started) * 1000),
+            'elapsed': int((time.monotonic() - started) * 1000),
+            'method': method,
+            'url': redact_url(url),
+            'body': _redact_query(body) if body else None,
+            'status': status,
+            'reason': reason,
+            'headers': {key: value for key, value in response_headers.items() if key.lower() in RECORDED_HEADERS},
+            'response': _listen_key.sub(r'\1' + REDACTED + r'\2', text),
+        }, separators=(',', ':')) + '\n')
+        return status, reason, response_headers, text
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Replayer:
+    """
+    Serves the responses of an archive written by Recorder instead of sending requests
+
+    Requests are matched by method, path and parameters, ignoring host, signature and timestamp.
+    Responses of the same request are served in recorded order, and over again once exhausted when
+    `cycle` is set.
+
+    example:
+        api = BinanceSwap({'transport': Replayer('binance.jsonl.gz', timing='recorded'), 'apiKey': '-', 'secret': '-'})
+    """
+
+    def __init__(self, path, timing='fast', speed=1.0, cycle=True):
+        """
+        :param timing:  'fast' to answer at once, 'recorded' to take as long as the recorded response
+        :param speed:   divides the recorded durations
+        """
+        if timing not in ('fast', 'recorded'):
+            raise ValueError(f'unknown timing: {timing}')
+        self.timing = timing
+        self.speed = speed
+        self.cycle = cycle
+        self.records = {}
+        for record in load_records(path):
+            self.records.setdefault(request_key(record['method'], record['url'], record['body']), []).append(record)
+        self._queues = {key: deque(records) for key, records in self.records.items()}
+
+    async def request(self, api, url, method, headers, body):
+        key = request_key(method, url, body)
+        queue = self._queues.get(key)
+        if not queue:
+            if not self.cycle or key not in self.records:
+                raise ReplayMissError(f'no recorded response for {method} {redact_url(url)}')
+            queue = self._queues[key] = deque(self.records[key])
+        record = queue.popleft()
+        if self.timing == 'recorded' and record['elapsed']:
+            await asyncio.sleep(record['elapsed'] / 1000 / self.speed)
+        return record['status'], record['reason'], record['headers'], record['response']
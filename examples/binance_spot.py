@@ -7,12 +7,56 @@ from ccxt.base.errors import DDoSProtection
 from ccxt.base.errors import ExchangeError
 from ccxt.base.errors import InvalidOrder
 
-from ccxt_ext.ccxt_ext import CCXTExtension
+from ccxt_ext.ccxt_ext import CCXTExtension, cached_describe
 from spot_api import SpotApi
+from utils.cache import CoalescingCache
+from utils.fees import FeeSchedule
 
 
 class BinanceSpot(CCXTExtension, ccxt.async_support.binance, SpotApi):
 
+    @cached_describe
+    def describe(self):
+        return self.deep_extend(super().describe(), {
+            'options': {
+                'tradingFeesTTL': 3600 * 1000,  # ms the trading fees of a tenant are cached
+                'warnOnFetchOpenOrdersWithoutSymbol': False,  # fetch_open_orders(None) is one account wide request
+                'openOrdersWeight': {'symbol': 3, 'all': 40},  # request weight of openOrders with and without a symbol
+                # request weight of the endpoints weighing more than 1, see request_weight for depth and openOrders
+                'requestWeights': {
+                    'exchangeInfo': 10,
+                    'allOrders': 10,
+                    'myTrades': 10,
+                    'account': 10,
+                    'capital/config/getall': 10,
+                },
+                'infoRetention': 'full',  # raw payload kept as 'info' of the markets: 'full', 'minimal' or 'lazy'
+                # fields of the raw payload kept with 'minimal' retention
+                'infoFields': {
+                    'market': ['symbol', 'status', 'orderTypes', 'permissions'],
+                },
+            },
+        })
+
+    def __init__(self, config={}):
+        super().__init__(config)
+        # trading fees by tenant
+        self.trading_fees = CoalescingCache(self.options['tradingFeesTTL'] / 1000)
+
+    def warm_state_caches(self):
+        return {
+            'tradingFees': self.trading_fees,
+        }
+
+    def request_weight(self, path, api='public', method='GET', params=None):
+        params = params or {}
+        if path == 'depth':
+            limit = int(params.get('limit', 100))
+            return 1 if limit <= 100 else 5 if limit <= 500 else 10 if limit <= 1000 else 50
+        if path == 'openOrders':
+            return self.options['openOrdersWeight']['symbol' if 'symbol' in params else 'all']
+        return super().request_weight(path, api, method, params)
+
     @staticmethod
     def safe_float(dictionary, key, default_value=None):
         return CCXTExtension.safe_decimal(dictionary, key, default_value=None)
@@ -22,7 +66,10 @@ class BinanceSpot(CCXTExtension, ccxt.async_support.binance, SpotApi):
         return CCXTExtension.safe_decimal_2(dictionary, key1, key2, default_value=None)
 
     async def fetch_markets(self, params=None):
-        return await super().fetch_markets(params=params or {})
+        markets = await super().fetch_markets(params=params or {})
+        for market in markets:
+            market['info'] = self.retain_info('market', market['info'])
+        return markets
 
     async def fetch_order_book(self, symbol, since=None, limit=None, fromId=None, direct=None, params=None):
         return await super().fetch_order_book(symbol, limit, params=params or {})
@@ -54,9 +101,26 @@ class BinanceSpot(CCXTExtension, ccxt.async_support.binance, SpotApi):
             params['orderId'] = fromId
         return await super().fetch_orders(symbol, since=since, limit=limit, params=params)
 
-    async def fetch_open_orders(self, symbol, since=None, limit=None, fromId=None, direct=None, params=None):
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, fromId=None, direct=None, params=None):
         return await super().fetch_open_orders(symbol, since=since, limit=limit, params=params or {})
 
+    async def fetch_open_orders_by_symbols(self, symbols=None, since=None, limit=None, params=None):
+        await self.load_markets()
+        if symbols is not None:
+            symbols = [self.market(symbol)['symbol'] for symbol in symbols]
+
+        async def fetch_one(symbol):
+            return await super(BinanceSpot, self).fetch_open_orders(symbol, since=since, limit=limit, params=params or {})
+
+        async def fetch_all(symbols):
+            return await super(BinanceSpot, self).fetch_open_orders(None, since=since, params=params or {})
+
+        weights = self.options['openOrdersWeight']
+        grouped = await self.fetch_by_symbols(symbols, fetch_one, fetch_all, weights['symbol'], weights['all'])
+        if limit is not None:
+            grouped = {symbol: orders[-limit:] for symbol, orders in grouped.items()}
+        return grouped
+
     async def fetch_closed_orders(self, symbol, since=None, limit=None, fromId=None, direct=None, params=None):
         orders = await self.fetch_orders(symbol=symbol, since=since, limit=limit, fromId=fromId, direct=direct, params=params or {})
         return self.filter_by_array(orders, 'status', values={'closed', 'canceled'}, indexed=False)
@@ -74,5 +138,14 @@ class BinanceSpot(CCXTExtension, ccxt.async_support.binance, SpotApi):
         return await super().fetch_balance(params=params or {})
 
     async def fetch_trading_fees(self, params=None):
+        return await self.trading_fees.get(self.tenant_key(params), lambda: self._fetch_trading_fees(params))
+
+    async def _fetch_trading_fees(self, params=None):
         response = await super().fetch_trading_fees(params=params or {})
         return list(response.values())
+
+    async def fetch_fee_schedule(self, params=None):
+        """
+        Fee schedule of the tenant from the cached trading fees
+        """
+        return FeeSchedule(await self.fetch_trading_fees(params))
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from decimal import Decimal
 
@@ -14,15 +15,42 @@ from ccxt.base.errors import DDoSProtection
 from ccxt.base.errors import ExchangeNotAvailable
 from ccxt.base.errors import InvalidNonce
 
-from ccxt_ext.ccxt_ext import CCXTExtension
+from ccxt_ext.ccxt_ext import CCXTExtension, cached_describe
 from ccxt_ext.errors import ChangeMarginTypeError, ChangePositionError
 from swap_api import SwapApi
+from utils.cache import CoalescingCache
+from utils.fees import FeeSchedule
+from utils.funding import FundingRateStore
+from utils.margin import MarginCalculator
 
 
 class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
 
+    def __init__(self, config={}):
+        super().__init__(config)
+        # per tenant account and position payloads, keyed by (tenant, endpoint)
+        self.account_snapshots = CoalescingCache(self.options['accountSnapshotTTL'] / 1000)
+        # leverage bracket tiers by tenant, they rarely change
+        self.leverage_brackets = CoalescingCache(self.options['leverageBracketsTTL'] / 1000)
+        # known leverage / margin type / position side settings, keyed by (tenant, symbol, setting)
+        self.symbol_configs = CoalescingCache(self.options['symbolConfigTTL'] / 1000)
+        # fee schedule by tenant
+        self.fee_schedules = CoalescingCache(self.options['feeTierTTL'] / 1000)
+        # public funding data, shared by all tenants
+        self.funding_rates = FundingRateStore()
+        # results land in funding_rates, this only coalesces concurrent loads of the same range
+        self.funding_rate_loads = CoalescingCache(0)
+        self.premium_indexes = CoalescingCache(self.options['premiumIndexTTL'] / 1000)
+
+    def warm_state_caches(self):
+        return {
+            'leverageBrackets': self.leverage_brackets,
+            'symbolConfigs': self.symbol_configs,
+        }
+
     # ------------------------------------------------------------------------------------------------------------------
 
+    @cached_describe
     def describe(self):
         return self.deep_extend(super().describe(), {
             'id': 'binance',
@@ -104,6 +132,7 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
                         'positionRisk',
                         'userTrades',
                         'income',
+                        'leverageBracket',
                     ],
                     'post': [
                         'batchOrders',
@@ -196,6 +225,36 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
                 'timeDifference': 0,  # the difference between system clock and Binance clock
                 'adjustForTimeDifference': False,  # controls the adjustment logic upon instantiation
                 'parseOrderToPrecision': False,  # force amounts and costs in parseOrder to precision
+                'streamResponses': False,  # parse large array responses element by element while they arrive
+                'leverageBracketsTTL': 3600 * 1000,  # ms the leverage bracket tiers are cached
+                'symbolConfigTTL': 600 * 1000,  # ms a known leverage/margin type/position side is trusted to skip no-op changes
+                'feeTierTTL': 3600 * 1000,  # ms the fee tier of a tenant is cached
+                'openOrdersWeight': {'symbol': 1, 'all': 40},  # request weight of openOrders with and without a symbol
+                # request weight of the endpoints weighing more than 1, see request_weight for depth and openOrders
+                'requestWeights': {
+                    'allOrders': 5,
+                    'userTrades': 5,
+                    'account': 5,
+                    'balance': 5,
+                    'positionRisk': 5,
+                    'income': 30,
+                    'positionSide/dual': 30,
+                },
+                'accountSnapshotTTL': 1000,  # ms an account/positionRisk payload is shared between calls, 0 to only coalesce concurrent calls
+                'premiumIndexTTL': 1000,  # ms the premium index is cached
+                'fundingInterval': 8 * 3600 * 1000,  # ms between two fundings
+                'fillFundingRecords': True,  # fill fundingRate and positionValue of funding records from the funding rate history
+                'infoRetention': 'full',  # raw payload kept as 'info' of markets, orders, trades, positions and incomes: 'full', 'minimal' or 'lazy'
+                # fields of the raw payload kept with 'minimal' retention, the ones the parsed structure has no equivalent of
+                'infoFields': {
+                    'market': ['symbol', 'status', 'orderTypes', 'timeInForce'],
+                    'order': ['orderId', 'status', 'timeInForce', 'stopPrice', 'reduceOnly', 'workingType', 'origType'],
+                    'trade': ['id', 'orderId', 'buyer', 'quoteQty'],
+                    'position': ['symbol', 'positionSide', 'isolatedMargin', 'maxNotionalValue', 'isAutoAddMargin'],
+                    'accountPosition': ['symbol', 'positionSide', 'maintMargin', 'maxNotional', 'isolated'],
+                    # every field of an income is in the parsed structure already
+                    'income': [],
+                },
                 'newOrderRespType': {
                     'market': 'FULL',  # 'ACK' for order id, 'RESULT' for full order or 'FULL' for order with fills
                     'limit': 'RESULT',  # we change it from 'ACK' by default to 'RESULT'
@@ -292,31 +351,36 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
         })
 
     def sign(self, path, api='public', method='GET', params={}, headers=None, body=None):
+        # credentials of the tenant may come with the params of each call
+        params, api_key, secret = self.split_credentials(params)
+        api_key = api_key or self.apiKey
+        secret = secret or self.secret
         url = self.urls['api'][api]
         url += '/' + path
         if api == 'wapi':
             url += '.html'
         userDataStream = (path == 'userDataStream') or (path == 'listenKey')
         if path == 'historicalTrades':
-            if self.apiKey:
+            if api_key:
                 headers = {
-                    'X-MBX-APIKEY': self.apiKey,
+                    'X-MBX-APIKEY': api_key,
                 }
             else:
                 raise AuthenticationError(self.id + ' historicalTrades endpoint requires `apiKey` credential')
         elif userDataStream:
-            if self.apiKey:
+            if api_key:
                 # v1 special case for userDataStream
                 body = self.urlencode(params)
                 headers = {
-                    'X-MBX-APIKEY': self.apiKey,
+                    'X-MBX-APIKEY': api_key,
                     'Content-Type': 'application/x-www-form-urlencoded',
                 }
             else:
                 raise AuthenticationError(self.id + ' userDataStream endpoint requires `apiKey` credential')
         if (api == 'private') or (api == 'sapi') or (api == 'wapi' and path != 'systemStatus') or (
                 api == 'fapiPrivate') or (api == 'fapiPrivatev2'):
-            self.check_required_credentials()
+            if not api_key or not secret:
+                raise AuthenticationError(self.id + ' requires `apiKey` and `secret` credentials')
             query = None
             if (api == 'sapi') and (path == 'asset/dust'):
                 query = self.urlencode_with_array_repeat(self.extend({
@@ -328,10 +392,10 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
                     'timestamp': self.nonce(),
                     'recvWindow': self.options['recvWindow'],
                 }, params))
-            signature = self.hmac(self.encode(query), self.encode(self.secret))
+            signature = self.hmac(self.encode(query), self.encode(secret))
             query += '&' + 'signature=' + signature
             headers = {
-                'X-MBX-APIKEY': self.apiKey,
+                'X-MBX-APIKEY': api_key,
             }
             if (method == 'GET') or (method == 'DELETE') or (api == 'wapi'):
                 url += '?' + query
@@ -347,94 +411,117 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
                     url += '?' + self.urlencode(params)
         return {'url': url, 'method': method, 'body': body, 'headers': headers}
 
+    def request_weight(self, path, api='public', method='GET', params=None):
+        params = params or {}
+        if path == 'depth':
+            limit = int(params.get('limit', 100))
+            return 2 if limit <= 50 else 5 if limit <= 100 else 10 if limit <= 500 else 20
+        if path == 'openOrders':
+            return self.options['openOrdersWeight']['symbol' if 'symbol' in params else 'all']
+        return super().request_weight(path, api, method, params)
+
     async def fetch_markets(self, params=None):
-        response = await self.fapiPublicGetExchangeInfo()
+        if self.options['streamResponses']:
+            # parse each market as soon as it arrives instead of decoding the whole exchangeInfo first
+            result = await self.request_parsed('exchangeInfo', 'fapiPublic', 'GET', {}, self.parse_swap_market, key='symbols')
+        else:
+            response = await self.fapiPublicGetExchangeInfo()
+            result = [self.parse_swap_market(market) for market in response['symbols']]
         if self.options['adjustForTimeDifference']:
             await self.load_time_difference()
-        markets = response['symbols']
-
-        result = []
-        for i in range(0, len(markets)):
-            market = markets[i]
-            id = market['symbol']
-            baseId = market['baseAsset']
-            quoteId = market['quoteAsset']
-            base = self.common_currency_code(baseId)
-            quote = self.common_currency_code(quoteId)
-            symbol = base + '/' + quote
-            filters = self.index_by(market['filters'], 'filterType')
-            precision = {
-                # 'base': market['baseAssetPrecision'],
-                # 'quote': market['quotePrecision'],
-                'amount': market['quantityPrecision'],
-                'price': market['pricePrecision'],
-            }
-            active = (market['status'] == 'TRADING')
-            entry = {
-                'id': id,
-                'symbol': symbol,
-                'base': base,
-                'quote': quote,
-                'baseId': baseId,
-                'quoteId': quoteId,
-                'info': market,
-                'active': active,
-                'precision': precision,
-                'limits': {
-                    'amount': {
-                        'min': None,
-                        'max': None,
-                    },
-                    'price': {
-                        'min': None,
-                        'max': None,
-                    },
-                    'cost': {
-                        'min': None,
-                        'max': None,
-                    },
+        return result
+
+    def parse_swap_market(self, market):
+        id = market['symbol']
+        baseId = market['baseAsset']
+        quoteId = market['quoteAsset']
+        base = self.common_currency_code(baseId)
+        quote = self.common_currency_code(quoteId)
+        symbol = base + '/' + quote
+        filters = self.index_by(market['filters'], 'filterType')
+        precision = {
+            # 'base': market['baseAssetPrecision'],
+            # 'quote': market['quotePrecision'],
+            'amount': market['quantityPrecision'],
+            'price': market['pricePrecision'],
+        }
+        active = (market['status'] == 'TRADING')
+        entry = {
+            'id': id,
+            'symbol': symbol,
+            'base': base,
+            'quote': quote,
+            'baseId': baseId,
+            'quoteId': quoteId,
+            'info': self.retain_info('market', market),
+            'active': active,
+            'precision': precision,
+            'limits': {
+                'amount': {
+                    'min': None,
+                    'max': None,
+                },
+                'price': {
+                    'min': None,
+                    'max': None,
                 },
-                # 维持保证金比例
-                'maintMarginPercent': self.safe_decimal(market, 'maintMarginPercent'),
-                # 所需保证金比例
-                'requiredMarginPercent': self.safe_decimal(market, 'requiredMarginPercent'),
+                'cost': {
+                    'min': None,
+                    'max': None,
+                },
+            },
+            # 维持保证金比例
+            'maintMarginPercent': self.safe_decimal(market, 'maintMarginPercent'),
+            # 所需保证金比例
+            'requiredMarginPercent': self.safe_decimal(market, 'requiredMarginPercent'),
+        }
+        # 价格限制
+        if 'PRICE_FILTER' in filters:
+            filter = filters['PRICE_FILTER']
+            entry['limits']['price'] = {
+                'min': self.safe_decimal(filter, 'minPrice'),
+                'max': self.safe_decimal(filter, 'maxPrice'),
+                # 步长
+                'stepSize': self.safe_decimal(filter, 'tickSize'),
             }
-            # 价格限制
-            if 'PRICE_FILTER' in filters:
-                filter = filters['PRICE_FILTER']
-                entry['limits']['price'] = {
-                    'min': self.safe_decimal(filter, 'minPrice'),
-                    'max': self.safe_decimal(filter, 'maxPrice'),
-                    # 步长
-                    'stepSize': self.safe_decimal(filter, 'tickSize'),
-                }
-            # 数量限制
-            if 'LOT_SIZE' in filters:
-                filter = filters['LOT_SIZE']
-                entry['limits']['amount'] = {
-                    'min': self.safe_decimal(filter, 'minQty'),
-                    'max': self.safe_decimal(filter, 'maxQty'),
-                    # 步长
-                    'stepSize': self.safe_decimal(filter, 'stepSize'),
-                }
-            # 市价订单数量限制
-            if 'MARKET_LOT_SIZE' in filters:
-                # 字段同数量限制
-                pass
-            # 价格比限制
-            if 'PERCENT_PRICE' in filters:
-                # multiplierUp: 价格上限百分比
-                # multiplierDown: 价格下限百分比
-                pass
-            # 最多挂单数限制
-            if 'MAX_NUM_ORDERS' in filters:
-                # limit
-                pass
-            result.append(entry)
-        return result
+        # 数量限制
+        if 'LOT_SIZE' in filters:
+            filter = filters['LOT_SIZE']
+            entry['limits']['amount'] = {
+                'min': self.safe_decimal(filter, 'minQty'),
+                'max': self.safe_decimal(filter, 'maxQty'),
+                # 步长
+                'stepSize': self.safe_decimal(filter, 'stepSize'),
+            }
+        # 市价订单数量限制
+        if 'MARKET_LOT_SIZE' in filters:
+            # 字段同数量限制
+            pass
+        # 价格比限制
+        if 'PERCENT_PRICE' in filters:
+            # multiplierUp: 价格上限百分比
+            # multiplierDown: 价格下限百分比
+            pass
+        # 最多挂单数限制
+        if 'MAX_NUM_ORDERS' in filters:
+            # limit
+            pass
+        return entry
+
+    async def fetch_account(self, params=None):
+        """
+        Account payload of the tenant in params, shared by fetch_balance, fetch_trading_fee_rates and
+        fetch_account_positions for `accountSnapshotTTL` ms
+        """
+        return await self.account_snapshots.get(
+            (self.tenant_key(params), 'account'), lambda: self.fapiPrivatev2GetAccount(params))
+
+    def invalidate_account(self, params=None):
+        tenant = self.tenant_key(params)
+        self.account_snapshots.invalidate_where(lambda key: key[0] == tenant)
 
     async def fetch_balance(self, params=None):
-        response = await self.fapiPrivatev2GetAccount()
+        response = await self.fetch_account(params)
         #
         # spot
         #
@@ -559,8 +646,8 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             'side': side.upper(),
         }
 
-        newClientOrderId = clientOrderId
-        request['newClientOrderId'] = newClientOrderId
+        if clientOrderId is not None:
+            request['newClientOrderId'] = clientOrderId
 
         if uppercaseType == 'MARKET':
             quoteOrderQty = self.safe_decimal(params, 'quoteOrderQty')
@@ -613,6 +700,7 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             request['reduceOnly'] = reduceOnly
 
         response = await self.fapiPrivatePostOrder(self.extend(request, params))
+        self.invalidate_account(params)
         return self.parse_swap_order(response, market)
 
     async def cancel_order(self, id, symbol, clientOrderId=None, params=None):
@@ -635,22 +723,21 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             request['orderId'] = int(id)
 
         response = await self.fapiPrivateDeleteOrder(self.extend(request, params))
+        self.invalidate_account(params)
         return {
             'info': response
         }
 
     async def fetch_open_orders(self, symbol=None, since=None, limit=None, fromId=None, direct='next', params=None):
-        if symbol is None:
-            raise ArgumentsRequired(self.id + ' fetch_open_orders requires a symbol argument')
-
         await self.load_markets()
-        market = self.market(symbol)
 
         if direct is not None and direct != 'next':
             raise ArgumentsRequired('in binance "direct" can only be next')
 
+        market = None
         request = {}
         if symbol is not None:
+            market = self.market(symbol)
             request['symbol'] = market['id']
 
         if fromId is not None:
@@ -659,6 +746,27 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
 
         return self.parse_orders(response, market, since, limit)
 
+    async def fetch_open_orders_by_symbols(self, symbols=None, since=None, limit=None, params=None):
+        await self.load_markets()
+        if symbols is not None:
+            symbols = [self.market(symbol)['symbol'] for symbol in symbols]
+
+        async def fetch_one(symbol):
+            return await self.fetch_open_orders(symbol, since, limit, params=params)
+
+        async def fetch_all(symbols):
+            response = await self.fapiPrivateGetOpenOrders(params)
+            if symbols is not None:
+                ids = {self.market_id(symbol) for symbol in symbols}
+                response = [order for order in response if order.get('symbol') in ids]
+            return self.parse_orders(response, None, since)
+
+        weights = self.options['openOrdersWeight']
+        grouped = await self.fetch_by_symbols(symbols, fetch_one, fetch_all, weights['symbol'], weights['all'])
+        if limit is not None:
+            grouped = {symbol: orders[-limit:] for symbol, orders in grouped.items()}
+        return grouped
+
     async def fetch_closed_orders(self, symbol, since=None, limit=None, fromId=None, direct='next', params=None):
         orders = await self.fetch_orders(symbol, since, limit, fromId, direct, params)
         return self.filter_by_array(orders, 'status', values={'closed', 'canceled', 'canceling'}, indexed=False)
@@ -703,6 +811,10 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
 
         if fromId is not None:
             request['orderId'] = fromId
+        if self.options['streamResponses']:
+            array = await self.request_parsed('allOrders', 'fapiPrivate', 'GET', self.extend(request, params),
+                                              lambda order: self.parse_swap_order(order, market))
+            return self.filter_by_symbol_since_limit(self.sort_by(array, 'timestamp'), market['symbol'], since, limit)
         response = await self.fapiPrivateGetAllOrders(self.extend(request, params))
 
         return self.parse_swap_orders(response, market, since, limit)
@@ -730,6 +842,10 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             except (TypeError, ValueError):
                 raise BadRequest(self.id + f' fetchMyTrades invalid fromId: {fromId}')
 
+        if self.options['streamResponses']:
+            array = await self.request_parsed('userTrades', 'fapiPrivate', 'GET', self.extend(request, params),
+                                              lambda trade: self.parse_swap_trade(trade, market))
+            return self.filter_by_symbol_since_limit(self.sort_by(array, 'timestamp'), market['symbol'])
         response = await self.fapiPrivateGetUserTrades(self.extend(request, params))
         return self.parse_swap_trades(response, market)
 
@@ -745,6 +861,12 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
         await self.load_markets()
         market = self.market(symbol)
 
+        config_key = (self.tenant_key(params), market['symbol'], 'leverage')
+        if self.symbol_configs.peek(config_key) == leverage:
+            return {
+                'info': None,
+            }
+
         request = {
             'symbol': market['id'],
             # 目标杠杆倍数：1 到 125 整数
@@ -752,6 +874,8 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
         }
 
         response = await self.fapiPrivatePostLeverage(self.extend(request, params))
+        self.invalidate_account(params)
+        self.symbol_configs.put(config_key, leverage)
         return {
             'info': response,
         }
@@ -767,12 +891,21 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
         await self.load_markets()
         market = self.market(symbol)
 
+        config_key = (self.tenant_key(params), market['symbol'], 'marginType')
+        if self.symbol_configs.peek(config_key) == margin_type:
+            return {
+                'info': None,
+            }
+
         request = {
             'symbol': market['id'],
             'marginType': margin_type,
         }
 
+        # "No need to change margin type." is ignored by handle_rest_errors, so it lands here as well
         response = await self.fapiPrivatePostMarginType(self.extend(request, params))
+        self.invalidate_account(params)
+        self.symbol_configs.put(config_key, margin_type)
         return {
             'info': response,
         }
@@ -798,37 +931,93 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             request['positionSide'] = positionSide.upper()
 
         response = await self.fapiPrivatePostPositionMargin(self.extend(request, params))
+        self.invalidate_account(params)
 
         return {
             'info': response
         }
 
     async def change_position_side(self, symbol, positionSide, params=None):
+        # position side is an account wide setting in binance
+        config_key = (self.tenant_key(params), None, 'positionSide')
+        if self.symbol_configs.peek(config_key) == positionSide:
+            return {
+                'info': None,
+            }
 
         request = {'dualSidePosition': 'true' if positionSide == 'dual' else 'false'}
         response = await self.fapiPrivatePostPositionSideDual(self.extend(request, params))
+        self.symbol_configs.put(config_key, 'dual' if positionSide == 'dual' else 'single')
 
         return {
             'info': response,
         }
 
+    async def apply_symbol_configs(self, configs, positionSide=None, concurrency=5, params=None):
+        """
+        Apply leverage and margin type to many symbols, skipping the settings which are already in place
+
+        :param configs:         list of {'symbol': 'BTC/USDT', 'leverage': 20, 'marginType': 'isolated'},
+                                leverage and marginType are optional
+        :param positionSide:    'dual' or 'single', applied first since it is account wide
+        :param concurrency:     max number of change requests in flight
+        :return:                list of {'symbol': ..., 'marginType': info, 'leverage': info} or the exception
+                                raised for the symbol, in the order of configs
+        """
+        if positionSide is not None:
+            await self.change_position_side(None, positionSide, params)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def apply(config):
+            async with semaphore:
+                result = {'symbol': config['symbol']}
+                if config.get('marginType'):
+                    result['marginType'] = await self.change_margin_type(config['symbol'], config['marginType'], params=params)
+                if config.get('leverage'):
+                    result['leverage'] = await self.change_leverage(config['symbol'], config['leverage'], params=params)
+                return result
+
+        return await asyncio.gather(*[apply(config) for config in configs], return_exceptions=True)
+
     async def fetch_trading_fee_rates(self, symbol=None, params=None):
-        response = await self.fapiPrivateGetAccount(params)
-        fee_tier = response.get('feeTier')
-        fee_tier = self.fee_tiers[int(fee_tier)]
-        return [{
-            'symbol': None,
-            'maker': fee_tier['maker'],
-            'taker': fee_tier['taker'],
-            'info': response
-        }]
+        schedule = await self.fetch_fee_schedule(params)
+        if symbol is None:
+            return [{
+                'symbol': None,
+                'maker': schedule.default[0],
+                'taker': schedule.default[1],
+                'info': schedule.info,
+            }]
+        fee_rates = schedule.fee_rates([self.market(symbol)['symbol']])
+        for fee_rate in fee_rates:
+            fee_rate['info'] = schedule.info
+        return fee_rates
+
+    async def fetch_fee_schedule(self, params=None):
+        """
+        Fee schedule of the tenant, with rates of every symbol precomputed from its fee tier.
+        The tier is cached for `feeTierTTL` ms, `info` is the account payload it was read from.
+        """
+        await self.load_markets()
+
+        async def load():
+            response = await self.fetch_account(params)
+            fee_tier = self.fee_tiers[int(response.get('feeTier'))]
+            # all usdt-m perpetual symbols share the rates of the tier
+            fee_rates = [{'symbol': symbol, 'maker': fee_tier['maker'], 'taker': fee_tier['taker']} for symbol in self.symbols]
+            return FeeSchedule(fee_rates, default=fee_tier, fee_tier=fee_tier['level'], info=response)
+
+        return await self.fee_schedules.get(self.tenant_key(params), load)
 
     async def fetch_position_side(self, symbol=None, params=None):
         response = await self.fapiPrivateGetPositionSideDual(params)
+        position_side = 'dual' if response.get('dualSidePosition') else 'single'
+        self.symbol_configs.put((self.tenant_key(params), None, 'positionSide'), position_side)
 
         return {
             'info': response,
-            'positionSide': 'dual' if response.get('dualSidePosition') else 'single'
+            'positionSide': position_side
         }
 
     async def fetch_funding_records(self, symbol=None, since=None, limit=None, fromId=None, direct='next', params=None):
@@ -846,13 +1035,245 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
         if limit is not None:
             request['limit'] = limit
         response = await self.fapiPrivateGetIncome(self.extend(request, params))
+        if self.options['fillFundingRecords']:
+            await self.load_markets()
+            since_by_market = {}
+            for record in response:
+                marketId = self.safe_string(record, 'symbol')
+                time = self.safe_integer(record, 'time')
+                if marketId in self.markets_by_id and time is not None:
+                    since_by_market[marketId] = min(time, since_by_market.get(marketId, time))
+            await asyncio.gather(*[
+                self.load_funding_rates(self.markets_by_id[marketId]['symbol'], since - FundingRateStore.TOLERANCE)
+                for marketId, since in since_by_market.items()
+            ])
         return self.parse_funding_fees(response)
 
+    async def load_funding_rates(self, symbol, since=None, params=None):
+        """
+        Make sure the local funding rate history of the symbol covers `since` and is up to date
+        """
+        await self.load_markets()
+        market = self.market(symbol)
+        symbol = market['symbol']
+        store = self.funding_rates
+        last_time = store.last_time(symbol)
+        if since is not None and not store.covers(symbol, since):
+            start = since
+        elif last_time is None:
+            start = None
+        elif self.milliseconds() - last_time >= self.options['fundingInterval']:
+            start = last_time + 1
+        else:
+            return
+
+        async def load():
+            request = {
+                'symbol': market['id'],
+                'limit': 1000,
+            }
+            page_start = start
+            while True:
+                if page_start is not None:
+                    request['startTime'] = page_start
+                response = await self.fapiPublicGetFundingRate(self.extend(request, params))
+                for entry in response:
+                    store.add(symbol, self.safe_integer(entry, 'fundingTime'), self.safe_decimal(entry, 'fundingRate'))
+                # without startTime binance returns the latest ones only
+                if page_start is None or len(response) < request['limit']:
+                    return
+                page_start = store.last_time(symbol) + 1
+
+        await self.funding_rate_loads.get((symbol, start), load)
+
+    async def fetch_funding_rate_history(self, symbol, since=None, limit=None, params=None):
+        """
+        Funding rate history of the symbol, served from the local store after the first load
+
+        :return:    list of {'symbol': ..., 'fundingRate': ..., 'fundingTime': ...}, oldest first
+        """
+        await self.load_funding_rates(symbol, since, params)
+        symbol = self.market(symbol)['symbol']
+        history = self.funding_rates.history(symbol, since)
+        if limit is not None:
+            history = history[:limit]
+        return [{'symbol': symbol, 'fundingRate': rate, 'fundingTime': time} for time, rate in history]
+
+    async def fetch_premium_index(self, symbol=None, params=None):
+        """
+        Mark price, index price and current funding rate, cached for `premiumIndexTTL` ms
+
+        :return:    premium index structure of the symbol, or a list of them for all symbols
+        """
+        await self.load_markets()
+        request = {}
+        if symbol is not None:
+            symbol = self.market(symbol)['symbol']
+            request['symbol'] = self.market_id(symbol)
+
+        async def load():
+            response = await self.fapiPublicGetPremiumIndex(self.extend(request, params))
+            if isinstance(response, list):
+                return [self.parse_premium_index(entry) for entry in response]
+            return self.parse_premium_index(response)
+
+        return await self.premium_indexes.get(symbol, load)
+
+    def parse_premium_index(self, premium_index):
+        #
+        #     {
+        #         "symbol": "BTCUSDT",
+        #         "markPrice": "11793.63104562",  // 标记价格
+        #         "indexPrice": "11781.80495970",  // 指数价格
+        #         "lastFundingRate": "0.00038246",  // 最近更新的资金费率
+        #         "nextFundingTime": 1597392000000,  // 下次资金费时间
+        #         "interestRate": "0.00010000",  // 标的资产基础利率
+        #         "time": 1597370495002  // 更新时间
+        #     }
+        #
+        symbol = None
+        marketId = self.safe_string(premium_index, 'symbol')
+        if marketId in self.markets_by_id:
+            symbol = self.markets_by_id[marketId]['symbol']
+        return {
+            'symbol': symbol,
+            'markPrice': self.safe_decimal(premium_index, 'markPrice'),
+            'indexPrice': self.safe_decimal(premium_index, 'indexPrice'),
+            'fundingRate': self.safe_decimal(premium_index, 'lastFundingRate'),
+            'nextFundingTime': self.safe_integer(premium_index, 'nextFundingTime'),
+            'interestRate': self.safe_decimal(premium_index, 'interestRate'),
+            'timestamp': self.safe_integer(premium_index, 'time'),
+            'info': premium_index,
+        }
+
     async def fetch_positions(self, symbol=None, params=None):
         await self.load_markets()
 
-        response = await self.fapiPrivatev2GetPositionRisk(params)
-        return self.parse_swap_positions(response, symbol)
+        tenant = self.tenant_key(params)
+        index = self.account_snapshots.peek((tenant, 'positionRisk'))
+        if index is None and symbol is not None:
+            # only the symbol is needed, let the exchange filter it
+            marketId = self.market_id(symbol)
+            request = {'symbol': marketId}
+            response = await self.account_snapshots.get(
+                (tenant, 'positionRisk', marketId),
+                lambda: self.fapiPrivatev2GetPositionRisk(self.extend(request, params)))
+        else:
+            if index is None:
+                index = await self.fetch_position_index(params)
+            if symbol is not None:
+                response = list(index.get(self.market_id(symbol), {}).values())
+            else:
+                response = [position for positions in index.values() for position in positions.values()]
+        positions = self.parse_swap_positions(response, symbol)
+        self.remember_symbol_configs(tenant, positions)
+        return positions
+
+    async def fetch_position_index(self, params=None):
+        """
+        Raw positionRisk of every symbol indexed by market id and position side, shared for `accountSnapshotTTL` ms.
+        Fetch it once before many per-symbol fetch_positions / fetch_position calls to serve them from one request.
+
+        :return:    {'BTCUSDT': {'BOTH': {...}}, ...}
+        """
+        async def load():
+            response = await self.fapiPrivatev2GetPositionRisk(params)
+            index = {}
+            for position in self.to_array(response):
+                index.setdefault(position['symbol'], {})[position.get('positionSide', 'BOTH')] = position
+            return index
+
+        return await self.account_snapshots.get((self.tenant_key(params), 'positionRisk'), load)
+
+    async def fetch_position(self, symbol, positionSide=None, params=None):
+        """
+        Position of one symbol and side from the position index
+
+        :param positionSide:    'long' or 'short' in dual side mode, None or 'both' in single side mode
+        :return:                position structure, None if there is no such position
+        """
+        await self.load_markets()
+        index = await self.fetch_position_index(params)
+        position = index.get(self.market_id(symbol), {}).get((positionSide or 'both').upper())
+        return position and self.parse_swap_position(position)
+
+    def remember_symbol_configs(self, tenant, positions):
+        for position in positions:
+            if position['symbol'] is None:
+                continue
+            if position['leverage'] is not None:
+                self.symbol_configs.put((tenant, position['symbol'], 'leverage'), position['leverage'])
+            margin_type = position['marginType']
+            if margin_type:
+                # positionRisk says 'cross', change_margin_type takes 'CROSSED'
+                margin_type = 'CROSSED' if margin_type.lower() == 'cross' else margin_type.upper()
+                self.symbol_configs.put((tenant, position['symbol'], 'marginType'), margin_type)
+
+    async def fetch_account_positions(self, symbol=None, params=None):
+        """
+        Positions from the account snapshot, without an extra request.
+        The account payload has no mark price or liquidation price, use fetch_positions when they are needed.
+        """
+        await self.load_markets()
+
+        response = await self.fetch_account(params)
+        array = [self.parse_swap_account_position(position) for position in self.safe_value(response, 'positions', [])]
+        return self.filter_by_symbol(array, symbol)
+
+    async def fetch_leverage_brackets(self, symbol=None, params=None):
+        """
+        Leverage bracket tiers, cached for `leverageBracketsTTL` ms
+
+        :return:    {symbol: [bracket, ...]}, or the list of brackets of the symbol if it is given
+        """
+        await self.load_markets()
+
+        async def load():
+            response = await self.fapiPrivateGetLeverageBracket(params)
+            result = {}
+            for entry in self.to_array(response):
+                market = self.safe_value(self.markets_by_id, self.safe_string(entry, 'symbol'))
+                if market is not None:
+                    result[market['symbol']] = [self.parse_leverage_bracket(bracket) for bracket in entry['brackets']]
+            return result
+
+        brackets = await self.leverage_brackets.get(self.tenant_key(params), load)
+        if symbol is None:
+            return brackets
+        return brackets.get(self.market(symbol)['symbol'], [])
+
+    def parse_leverage_bracket(self, bracket):
+        #
+        #     {
+        #         "bracket": 1,  // 层级
+        #         "initialLeverage": 75,  // 该层允许的最高初始杠杆倍数
+        #         "notionalCap": 10000,  // 该层对应的名义价值上限
+        #         "notionalFloor": 0,  // 该层对应的名义价值下限
+        #         "maintMarginRatio": 0.0065,  // 该层对应的维持保证金率
+        #         "cum": 0  // 速算数
+        #     }
+        #
+        return {
+            'bracket': self.safe_integer(bracket, 'bracket'),
+            'initialLeverage': self.safe_integer(bracket, 'initialLeverage'),
+            'notionalCap': self.safe_decimal(bracket, 'notionalCap'),
+            'notionalFloor': self.safe_decimal(bracket, 'notionalFloor'),
+            'maintMarginRatio': self.safe_decimal(bracket, 'maintMarginRatio'),
+            'cum': self.safe_decimal(bracket, 'cum', Decimal(0)),
+        }
+
+    async def margin_calculator(self, symbol, params=None):
+        """
+        Local liquidation price / maintenance margin calculator of the symbol. Falls back to the
+        market's maintMarginPercent when the brackets can not be fetched.
+        """
+        try:
+            brackets = await self.fetch_leverage_brackets(symbol, params)
+        except ExchangeError:
+            brackets = None
+        if brackets:
+            return MarginCalculator(brackets)
+        return MarginCalculator.from_market(self.market(symbol))
 
     def parse_swap_order_status(self, status):
         statuses = {
@@ -874,8 +1295,10 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             market = self.market(symbol)
 
             request['symbol'] = market['id']
+        params = params or {}
         if 'incomeType' in params:
-            income_type = params.pop('incomeType').upper()
+            income_type = params['incomeType'].upper()
+            params = self.omit(params, 'incomeType')
             if income_type not in {'TRANSFER', 'WELCOME_BONUS', 'REALIZED_PNL',
                                    'FUNDING_FEE', 'COMMISSION', 'INSURANCE_CLEAR'}:
                 raise BadRequest(f'fetchSwapIncome invalid incomeType: {income_type}')
@@ -888,14 +1311,24 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
         return self.parse_swap_incomes(response)
 
     def parse_funding_fee(self, result):
+        funding_fee = self.safe_decimal(result, 'income')
+        timestamp = self.safe_integer(result, 'time')
+        funding_rate = None
+        position_value = None
+        marketId = self.safe_string(result, 'symbol')
+        if self.markets_by_id and marketId in self.markets_by_id and timestamp is not None:
+            funding_rate = self.funding_rates.rate_at(self.markets_by_id[marketId]['symbol'], timestamp)
+        if funding_rate and funding_fee is not None:
+            # fee = -positionValue * fundingRate for long positions
+            position_value = abs(funding_fee / funding_rate)
 
         return {
             'id': None,
-            'fundingFee': self.safe_decimal(result, 'income'),
+            'fundingFee': funding_fee,
             'position': None,
-            'positionValue': None,
-            'fundingRate': None,
-            'timestamp': self.safe_integer(result, 'time'),
+            'positionValue': position_value,
+            'fundingRate': funding_rate,
+            'timestamp': timestamp,
             'info': {}
         }
 
@@ -1009,7 +1442,7 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
         timestamp = timestamp or lastTradeTimestamp
         position_side = self.safe_string(order, 'positionSide')
         return {
-            'info': order,
+            'info': self.retain_info('order', order),
             'id': id,
             'clientOrderId': clientOrderId,
             'timestamp': timestamp,
@@ -1086,7 +1519,7 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
 
         position_side = self.safe_string(trade, 'positionSide')
         return {
-            'info': trade,
+            'info': self.retain_info('trade', trade),
             'timestamp': timestamp,
             'datetime': self.iso8601(timestamp),
             'symbol': symbol,
@@ -1125,8 +1558,11 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
 
     def parse_swap_positions(self, response, symbol, params={}):
         array = self.to_array(response)
-        array = [self.extend(self.parse_swap_position(position), params) for position in array]
-        return self.filter_by_symbol(array, symbol)
+        if symbol is not None:
+            # filter the raw payload, parsing is the expensive part
+            marketId = self.market_id(symbol)
+            array = [position for position in array if position.get('symbol') == marketId]
+        return [self.extend(self.parse_swap_position(position), params) for position in array]
 
     def parse_swap_position(self, position):
         symbol = None
@@ -1138,7 +1574,7 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             symbol = market['symbol']
         position_side = self.safe_string(position, 'positionSide')
         return {
-            'info': position,
+            'info': self.retain_info('position', position),
             'symbol': symbol,
             'position': self.safe_string(position, 'positionAmt'),
             'openPrice': self.safe_string(position, 'entryPrice'),
@@ -1152,6 +1588,40 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             'positionSide': position_side and position_side.lower(),
         }
 
+    def parse_swap_account_position(self, position):
+        # position in the account payload
+        #
+        #     {
+        #         "symbol": "BTCUSDT",
+        #         "initialMargin": "0",
+        #         "maintMargin": "0",
+        #         "unrealizedProfit": "0.00000000",
+        #         "leverage": "100",
+        #         "isolated": true,
+        #         "entryPrice": "0.00000",
+        #         "positionAmt": "0.000",
+        #         "positionSide": "BOTH"
+        #     }
+        symbol = None
+        marketId = self.safe_string(position, 'symbol')
+        if marketId in self.markets_by_id:
+            symbol = self.markets_by_id[marketId]['symbol']
+        position_side = self.safe_string(position, 'positionSide')
+        isolated = self.safe_value(position, 'isolated')
+        return {
+            'info': self.retain_info('accountPosition', position),
+            'symbol': symbol,
+            'position': self.safe_string(position, 'positionAmt'),
+            'openPrice': self.safe_string(position, 'entryPrice'),
+            'markPrice': None,
+            'unrealizedProfit': self.safe_string(position, 'unrealizedProfit'),
+            'liquidatePrice': None,
+            'leverage': self.safe_integer(position, 'leverage'),
+            'marginType': None if isolated is None else ('isolated' if isolated else 'cross'),
+            'initMargin': self.safe_string(position, 'initialMargin'),
+            'positionSide': position_side and position_side.lower(),
+        }
+
     def parse_swap_income(self, income):
         symbol = None
         market = None
@@ -1169,13 +1639,13 @@ class BinanceSwap(SwapApi, CCXTExtension, ccxt.async_support.binance):
             'time': income['time'],
             "tranId": income['tranId'],
             "tradeId": income['tradeId'],
-            "info": income
+            "info": self.retain_info('income', income)
         }
 
     def parse_swap_incomes(self, incomes, params=None):
         array = self.to_array(incomes)
         array = [self.extend(self.parse_swap_income(income), params) for income in array]
-        array = self.sort_by(array, 'timestamp')
+        array = self.sort_by(array, 'time')
         return array
 
     def handle_rest_errors(self, exception, http_status_code, response, url, method='GET'):
@@ -0,0 +1,83 @@
+"""
+Registry of exchange integrations
+
+Modules are found by name without importing them. An integration is a module named
+<exchange>_<market type>.py, eg. binance_swap.py, defining the class named after it, eg. BinanceSwap.
+Only the requested module is imported, on first use.
+
+example:
+    BinanceSwap = load_exchange_class('binance', 'swap')
+"""
+import importlib
+import pkgutil
+
+MARKET_TYPES = ('spot', 'swap')
+
+# packages searched in order, integrations in this package take precedence over the examples
+SEARCH_PACKAGES = [__name__, 'examples']
+
+_registry = {}
+_explicit = set()
+_classes = {}
+_discovered = False
+
+
+def register(exchange, market_type, path):
+    """
+    Register an integration explicitly
+
+    :param path:    'package.module:ClassName'
+    """
+    _registry[(exchange, market_type)] = path
+    _explicit.add((exchange, market_type))
+    _classes.pop((exchange, market_type), None)
+
+
+def _class_name(module_name):
+    return ''.join(part.capitalize() for part in module_name.split('_'))
+
+
+def discover():
+    """
+    :return:    {(exchange, market type): 'package.module:ClassName'} of every integration found
+    """
+    global _discovered
+    if not _discovered:
+        # lowest precedence first, explicit registrations are kept
+        for package_name in reversed(SEARCH_PACKAGES):
+            try:
+                package = importlib.import_module(package_name)
+            except ImportError:
+                continue
+            for module in pkgutil.iter_modules(package.__path__):
+                exchange, _, market_type = module.name.rpartition('_')
+                if exchange and market_type in MARKET_TYPES and (exchange, market_type) not in _explicit:
+                    _registry[(exchange, market_type)] = f'{package_name}.{module.name}:{_class_name(module.name)}'
+        _discovered = True
+    return dict(_registry)
+
+
+def available(market_type=None):
+    """
+    :return:    sorted list of (exchange, market type)
+    """
+    return sorted(key for key in discover() if market_type is None or key[1] == market_type)
+
+
+def load_exchange_class(exchange, market_type):
+    """
+    Import the integration on first use
+
+    :param exchange:        exchange id, eg. 'binance'
+    :param market_type:     'spot' or 'swap'
+    :return:                the API class
+    """
+    key = (exchange, market_type)
+    cls = _classes.get(key)
+    if cls is None:
+        path = _registry.get(key) or discover().get(key)
+        if path is None:
+            raise KeyError(f'no {market_type} integration for {exchange}, available: {available(market_type)}')
+        module_name, _, class_name = path.partition(':')
+        cls = _classes[key] = getattr(importlib.import_module(module_name), class_name)
+    return cls
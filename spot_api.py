@@ -224,17 +224,18 @@ class SpotApi:
         """
         raise NotImplementedError()
 
-    async def fetch_open_orders(self, symbol, since=None, limit=None, fromId=None, direct=None, params=None):
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, fromId=None, direct=None, params=None):
         """
         Fetch all orders in open status
 
-        :param symbol:  symbol in ccxt standard format, example: 'BTC/USDT'
+        :param symbol:  symbol in ccxt standard format, example: 'BTC/USDT', None for the orders of all symbols
         :param since:   start time of the orders, should be a Unix timestamp in milliseconds
         :param limit:   limit number of orders in response
         :param fromId:  start id of the orders
         :param direct:  "prev" or "next"
         :param params:  dict for non-specific parameters
         :return:        a list of ccxt order structures https://github.com/ccxt/ccxt/wiki/Manual#order-structure
+                        if symbol is None, the orders of all symbols in one list, see fetch_open_orders_by_symbols
 
         example:
         [
@@ -269,6 +270,26 @@ class SpotApi:
         """
         raise NotImplementedError()
 
+    async def fetch_open_orders_by_symbols(self, symbols=None, since=None, limit=None, params=None):
+        """
+        Fetch orders in open status of many symbols
+        The implementation should choose between one account wide request and one request per symbol,
+        whichever costs less request weight
+
+        :param symbols: list of symbols in ccxt standard format, None for all symbols
+        :param since:   start time of the orders, should be a Unix timestamp in milliseconds
+        :param limit:   limit number of orders of each symbol
+        :param params:  dict for non-specific parameters
+        :return:        a dict of ccxt order structure lists grouped by symbol
+
+        example:
+        {
+            'ETH/BTC': [ ... ],
+            'BTC/USDT': [],
+        }
+        """
+        raise NotImplementedError()
+
     async def fetch_closed_orders(self, symbol, since=None, limit=None, fromId=None, direct=None, params=None):
         """
         Fetch all orders in closed and canceled status
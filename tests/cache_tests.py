@@ -0,0 +1,115 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from utils.cache import CoalescingCache
+
+
+class TestCoalescingCache(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def load(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.calls
+
+    async def test_coalescing(self):
+        cache = CoalescingCache(ttl=60)
+        callers = [asyncio.ensure_future(cache.get('account', self.load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*callers), [1] * 5)
+        self.assertEqual(await cache.get('account', self.load), 1)
+        self.assertEqual(await cache.get('other', self.load), 2)
+        self.assertEqual(self.calls, 2)
+
+    async def test_ttl(self):
+        self.release.set()
+        cache = CoalescingCache(ttl=0.05)
+        self.assertEqual(await cache.get('account', self.load), 1)
+        self.assertEqual(await cache.get('account', self.load), 1)
+        self.assertEqual(cache.peek('account'), 1)
+        await asyncio.sleep(0.1)
+        self.assertIsNone(cache.peek('account'))
+        self.assertEqual(await cache.get('account', self.load), 2)
+        # a ttl of 0 only coalesces concurrent callers
+        self.assertEqual(await cache.get('account', self.load, ttl=0), 3)
+
+    async def test_cancelled_caller(self):
+        cache = CoalescingCache(ttl=60)
+        first = asyncio.ensure_future(cache.get('account', self.load))
+        await asyncio.sleep(0)
+        others = [asyncio.ensure_future(cache.get('account', self.load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*others), [1] * 3)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.calls, 1)
+
+    async def test_all_callers_cancelled(self):
+        cache = CoalescingCache(ttl=60)
+        caller = asyncio.ensure_future(cache.get('account', self.load))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+        # the load goes on without waiters and its value is cached
+        self.assertEqual(await cache.get('account', self.load), 1)
+        self.assertEqual(self.calls, 1)
+
+    async def test_errors(self):
+        cache = CoalescingCache(ttl=60)
+
+        async def fail():
+            self.calls += 1
+            await self.release.wait()
+            raise ValueError('down')
+
+        callers = [asyncio.ensure_future(cache.get('account', fail)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        # errors are not cached
+        self.assertEqual(await cache.get('account', self.load), 2)
+
+    async def test_invalidate_while_loading(self):
+        cache = CoalescingCache(ttl=60)
+        caller = asyncio.ensure_future(cache.get('account', self.load))
+        await asyncio.sleep(0)
+        cache.invalidate('account')
+        self.release.set()
+        # handed to the waiter but not cached
+        self.assertEqual(await caller, 1)
+        self.assertIsNone(cache.peek('account'))
+        self.assertEqual(await cache.get('account', self.load), 2)
+
+    async def test_expired_values_are_dropped(self):
+        self.release.set()
+        cache = CoalescingCache(ttl=0.05)
+        for key in range(3):
+            await cache.get(key, self.load)
+        await asyncio.sleep(0.1)
+        cache.put('fresh', 0)
+        self.assertEqual(list(cache._values), ['fresh'])
+
+    async def test_max_size(self):
+        cache = CoalescingCache(ttl=60, max_size=2)
+        for key in range(3):
+            cache.put(key, key)
+        cache.put(1, 1)
+        self.assertEqual(list(cache._values), [2, 1])
+        self.assertIsNone(cache.peek(0))
+
+    async def test_coalescing_only(self):
+        cache = CoalescingCache(ttl=0)
+        callers = [asyncio.ensure_future(cache.get(('BTC/USDT', 0), self.load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*callers), [1] * 3)
+        cache.put('other', 1)
+        self.assertFalse(cache._values)
@@ -0,0 +1,68 @@
+from decimal import Decimal
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from benchmarks.parser_bench import synthetic_payloads
+from exchanges import load_exchange_class
+from utils.fees import FeeSchedule
+
+
+class TestFeeSchedule(TestCase):
+
+    def test_rates(self):
+        schedule = FeeSchedule([
+            {'symbol': 'BTC/USDT', 'maker': '0.0002', 'taker': '0.0004'},
+            {'symbol': None, 'maker': 0.001, 'taker': 0.001},
+        ])
+        self.assertEqual(schedule.rate('BTC/USDT', 'maker'), Decimal('0.0002'))
+        self.assertEqual(schedule.rate('BTC/USDT'), Decimal('0.0004'))
+        # symbols without their own rates get the default one
+        self.assertEqual(schedule.rate('ETH/USDT', 'maker'), Decimal('0.001'))
+        self.assertEqual(schedule.fee_rates(), [{'symbol': 'BTC/USDT', 'maker': Decimal('0.0002'), 'taker': Decimal('0.0004')}])
+        self.assertEqual(schedule.fee_rates(['ETH/USDT'])[0]['taker'], Decimal('0.001'))
+
+    def test_unknown_symbol(self):
+        schedule = FeeSchedule([{'symbol': 'BTC/USDT', 'maker': '0.0002', 'taker': '0.0004'}])
+        with self.assertRaises(KeyError):
+            schedule.rate('ETH/USDT')
+        with self.assertRaises(KeyError):
+            schedule.expected_fees([{'symbol': 'ETH/USDT', 'amount': 1, 'price': 1}])
+
+    def test_expected_fees(self):
+        schedule = FeeSchedule([{'symbol': 'BTC/USDT', 'maker': '0.0002', 'taker': '0.0004'}],
+                               default={'maker': '0.001', 'taker': '0.002'})
+        orders = [
+            {'symbol': 'BTC/USDT', 'amount': '0.5', 'price': '10000', 'takerOrMaker': 'maker'},
+            {'symbol': 'BTC/USDT', 'amount': '0.5', 'price': '10000'},
+            {'symbol': 'ETH/USDT', 'amount': 2, 'price': '300', 'takerOrMaker': 'maker'},
+        ]
+        self.assertEqual(schedule.expected_fees(orders), [Decimal('1'), Decimal('2'), Decimal('0.6')])
+        self.assertEqual(schedule.total_expected_fee(orders), Decimal('3.6'))
+
+
+class TestSwapFeeTiers(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.api = load_exchange_class('binance', 'swap')({})
+        self.api.set_markets([self.api.parse_swap_market(market) for market in synthetic_payloads(1)['markets']])
+        self.accounts = []
+
+        async def account(params=None):
+            self.accounts.append(params)
+            return {'feeTier': 2, 'canTrade': True}
+
+        self.api.fapiPrivatev2GetAccount = account
+
+    async def asyncTearDown(self):
+        await self.api.close()
+
+    async def test_fee_tier_lookup(self):
+        fee_rates = await self.api.fetch_trading_fee_rates()
+        self.assertEqual(fee_rates, [{'symbol': None, 'maker': Decimal('0.00014'), 'taker': Decimal('0.00035'),
+                                      'info': {'feeTier': 2, 'canTrade': True}}])
+        fee_rates = await self.api.fetch_trading_fee_rates('ETH/USDT')
+        self.assertEqual([(fee_rate['symbol'], fee_rate['maker']) for fee_rate in fee_rates], [('ETH/USDT', Decimal('0.00014'))])
+        schedule = await self.api.fetch_fee_schedule()
+        self.assertEqual(schedule.fee_tier, 2)
+        self.assertEqual(schedule.rate('BTC/USDT', 'taker'), Decimal('0.00035'))
+        # the tier is cached
+        self.assertEqual(len(self.accounts), 1)
@@ -0,0 +1,89 @@
+import random
+from collections import defaultdict
+from decimal import Decimal
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from utils.income_ledger import DAY, IncomeLedger
+
+START = 1600000000000 // DAY * DAY
+
+
+def incomes(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'tranId': i,
+        'incomeType': rng.choice(['REALIZED_PNL', 'FUNDING_FEE', 'COMMISSION']),
+        'symbol': rng.choice(['BTC/USDT', 'ETH/USDT']),
+        'asset': 'USDT',
+        'income': str(Decimal(rng.randint(-10000, 10000)) / 100),
+        'time': START + rng.randint(0, 5 * DAY),
+    } for i in range(count)]
+
+
+class TestIncomeLedger(TestCase):
+
+    def test_dedup(self):
+        ledger = IncomeLedger()
+        rows = incomes(10)
+        self.assertEqual(ledger.add(rows), 10)
+        self.assertEqual(ledger.add(rows[5:] + [dict(rows[0], incomeType='INSURANCE_CLEAR')]), 1)
+        self.assertEqual(len(ledger), 11)
+        self.assertEqual(ledger.last_time, max(row['time'] for row in rows))
+
+    def test_rollups_against_brute_force(self):
+        rows = incomes(300)
+        ledger = IncomeLedger()
+        ledger.add(rows[:150])
+        ledger.add(rows[150:])
+        rng = random.Random(1)
+        bounds = [None, START, START + DAY, START + 6 * DAY] + [START + rng.randint(-DAY, 6 * DAY) for _ in range(20)]
+        for _ in range(200):
+            start, end = rng.choice(bounds), rng.choice(bounds)
+            incomeType = rng.choice([None, 'FUNDING_FEE'])
+            symbol = rng.choice([None, 'ETH/USDT'])
+            selected = [row for row in rows if (start is None or row['time'] >= start) and (end is None or row['time'] < end) and
+                        (incomeType is None or row['incomeType'] == incomeType) and (symbol is None or row['symbol'] == symbol)]
+            by_type, by_symbol, by_day = defaultdict(Decimal), defaultdict(Decimal), defaultdict(Decimal)
+            for row in selected:
+                by_type[row['incomeType']] += Decimal(row['income'])
+                by_symbol[row['symbol']] += Decimal(row['income'])
+                by_day[row['time'] // DAY * DAY] += Decimal(row['income'])
+            message = (start, end, incomeType, symbol)
+            self.assertEqual(ledger.total(start, end, incomeType, symbol), sum(by_type.values(), Decimal(0)), message)
+            if incomeType is None:
+                self.assertEqual(ledger.totals_by_type(start, end, symbol), dict(by_type), message)
+            if symbol is None:
+                self.assertEqual(ledger.totals_by_symbol(start, end, incomeType), dict(by_symbol), message)
+            self.assertEqual(ledger.totals_by_day(start, end, incomeType, symbol), dict(by_day), message)
+
+
+class TestIncomeLedgerSync(IsolatedAsyncioTestCase):
+
+    class Api:
+        def __init__(self, rows):
+            self.rows = sorted(rows, key=lambda row: row['time'])
+            self.calls = []
+
+        async def fetch_incomes(self, symbol=None, since=None, limit=None, params=None):
+            self.calls.append(since)
+            # startTime is inclusive
+            return [row for row in self.rows if since is None or row['time'] >= since][:limit]
+
+    async def test_sync(self):
+        rows = incomes(25)
+        api = self.Api(rows)
+        ledger = IncomeLedger()
+        self.assertEqual(await ledger.sync(api, limit=10), 25)
+        self.assertEqual(ledger.total(), sum(Decimal(row['income']) for row in rows))
+        last_time = ledger.last_time
+        api.rows.append(dict(rows[0], tranId=100, time=START + 6 * DAY))
+        self.assertEqual(await ledger.sync(api, limit=10), 1)
+        # only asks for what is newer than the last synced row
+        self.assertEqual(api.calls[-1], last_time)
+        self.assertEqual(ledger.last_time, START + 6 * DAY)
+
+    async def test_sync_stops_on_a_full_page_of_one_millisecond(self):
+        api = self.Api([dict(row, time=START) for row in incomes(10)])
+        ledger = IncomeLedger()
+        self.assertEqual(await ledger.sync(api, limit=5), 5)
+        self.assertEqual(len(api.calls), 2)
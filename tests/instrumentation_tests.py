@@ -0,0 +1,87 @@
+import random
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from swap_api import SwapApi
+from utils.instrumentation import Histogram, Instrumentation
+
+
+class TestHistogram(TestCase):
+
+    def assertPercentiles(self, histogram, values):
+        values = sorted(values)
+        for percentile in [0, 1, 10, 50, 90, 99, 99.9, 100]:
+            exact = values[int(max(1, -(-len(values) * percentile // 100))) - 1]
+            result = histogram.percentile(percentile)
+            # the highest value of the bucket, at most 1 / 2^precision above the exact one
+            self.assertGreaterEqual(result, exact, percentile)
+            self.assertLessEqual(result, exact + exact / histogram.sub, percentile)
+
+    def test_small_values_are_exact(self):
+        histogram = Histogram(precision=4)
+        values = list(range(32)) * 3
+        for value in values:
+            histogram.record(value)
+        for percentile in [1, 50, 99, 100]:
+            self.assertEqual(histogram.percentile(percentile), sorted(values)[-(-len(values) * percentile // 100) - 1])
+
+    def test_percentiles_against_sorted_values(self):
+        rng = random.Random(0)
+        for precision in (3, 7):
+            histogram = Histogram(precision)
+            values = [int(rng.lognormvariate(8, 2)) for _ in range(5000)]
+            for value in values:
+                histogram.record(value)
+            self.assertPercentiles(histogram, values)
+            self.assertEqual((histogram.count, histogram.min, histogram.max), (len(values), min(values), max(values)))
+            self.assertEqual(histogram.mean, sum(values) / len(values))
+
+    def test_merge(self):
+        rng = random.Random(1)
+        first, second = Histogram(), Histogram()
+        values = [rng.randint(0, 10 ** 6) for _ in range(1000)]
+        for value in values[:400]:
+            first.record(value)
+        for value in values[400:]:
+            second.record(value)
+        first.merge(second)
+        self.assertPercentiles(first, values)
+        self.assertIsNone(Histogram().percentile(50))
+
+
+class TestInstrumentation(IsolatedAsyncioTestCase):
+
+    class Api(SwapApi):
+        async def fetch_order(self, id=None, symbol=None, clientOrderId=None, params=None):
+            return self.parse_order({'id': id})
+
+        async def cancel_order(self, id, symbol, clientOrderId=None, params=None):
+            raise ValueError(id)
+
+        def parse_order(self, order):
+            return order
+
+    async def test_attach(self):
+        spans = []
+        instrumentation = Instrumentation(span_callbacks=[spans.append])
+        api = self.Api()
+        instrumentation.attach(api)
+        with self.assertRaises(ValueError):
+            instrumentation.attach(api)
+        self.assertEqual(await api.fetch_order('1'), {'id': '1'})
+        with self.assertRaises(ValueError):
+            await api.cancel_order('2', 'BTC/USDT')
+
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot['method']['fetch_order']['count'], 1)
+        self.assertEqual(snapshot['method']['cancel_order']['errors'], 1)
+        self.assertEqual(snapshot['parse']['parse_order']['count'], 1)
+        self.assertEqual([(span.stage, span.name, span.parent) for span in spans], [
+            ('parse', 'parse_order', ('method', 'fetch_order')),
+            ('method', 'fetch_order', None),
+            ('method', 'cancel_order', None),
+        ])
+        self.assertIsInstance(spans[2].error, ValueError)
+
+        instrumentation.detach(api)
+        await api.fetch_order('3')
+        self.assertEqual(instrumentation.snapshot()['method']['fetch_order']['count'], 1)
@@ -0,0 +1,26 @@
+from decimal import Decimal
+from unittest import TestCase
+
+from ccxt_ext.json_stream import JsonArrayStream
+
+
+class TestJsonArrayStream(TestCase):
+
+    def feed_in_chunks(self, stream, data, size):
+        result = []
+        for i in range(0, len(data), size):
+            result += stream.feed(data[i:i + size])
+        return result
+
+    def test_elements_of_key(self):
+        data = b'{"rateLimits":[{"limit":2400}],"symbols":[{"symbol":"BTCUSDT","x":"]\\""},{"symbol":"ETHUSDT"}],"t":1}'
+        for size in range(1, 8):
+            stream = JsonArrayStream('symbols')
+            result = self.feed_in_chunks(stream, data, size)
+            self.assertEqual([e['symbol'] for e in result], ['BTCUSDT', 'ETHUSDT'])
+            self.assertTrue(stream.done)
+
+    def test_top_level_array_with_decimal(self):
+        stream = JsonArrayStream()
+        result = self.feed_in_chunks(stream, b'[{"price":"1.1","qty":0.1}, 2]', 3)
+        self.assertEqual(result, [{'price': '1.1', 'qty': Decimal('0.1')}, 2])
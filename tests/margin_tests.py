@@ -0,0 +1,93 @@
+from decimal import Decimal
+from unittest import TestCase
+
+from utils.margin import MarginCalculator
+
+# leverage brackets of BTCUSDT
+BRACKETS = [
+    {'notionalFloor': Decimal(0), 'notionalCap': Decimal(50000), 'maintMarginRatio': Decimal('0.004'),
+     'cum': Decimal(0), 'initialLeverage': 125},
+    {'notionalFloor': Decimal(50000), 'notionalCap': Decimal(250000), 'maintMarginRatio': Decimal('0.005'),
+     'cum': Decimal(50), 'initialLeverage': 100},
+    {'notionalFloor': Decimal(250000), 'notionalCap': Decimal(1000000), 'maintMarginRatio': Decimal('0.01'),
+     'cum': Decimal(1300), 'initialLeverage': 50},
+]
+
+
+class TestMarginCalculator(TestCase):
+
+    def setUp(self):
+        self.calculator = MarginCalculator(list(reversed(BRACKETS)))
+
+    def assertLiquidatedAt(self, amount, entry_price, margin, price):
+        # at the liquidation price the margin balance is the maintenance margin
+        amount, entry_price, margin = Decimal(amount), Decimal(entry_price), Decimal(margin)
+        balance = margin + amount * (price - entry_price)
+        self.assertAlmostEqual(balance, self.calculator.maintenance_margin(abs(amount) * price), places=12)
+
+    def test_brackets(self):
+        self.assertEqual(self.calculator.bracket(Decimal(-60000))['maintMarginRatio'], Decimal('0.005'))
+        self.assertEqual(self.calculator.bracket(Decimal(50000))['cum'], 50)
+        self.assertIs(self.calculator.bracket(Decimal(10 ** 7)), self.calculator.brackets[-1])
+        self.assertEqual(self.calculator.maintenance_margin(Decimal(10000)), Decimal(40))
+        self.assertEqual(self.calculator.maintenance_margin(Decimal(100000)), Decimal(450))
+        self.assertEqual(self.calculator.maintenance_margin(Decimal(300000)), Decimal(1700))
+        self.assertEqual(self.calculator.max_notional(125), Decimal(50000))
+        self.assertEqual(self.calculator.max_notional(100), Decimal(250000))
+        self.assertEqual(self.calculator.max_notional(20), Decimal(1000000))
+        self.assertEqual(self.calculator.max_leverage(Decimal(60000)), 100)
+
+    def test_liquidation_price(self):
+        price = self.calculator.liquidation_price('1', '10000', '1000')
+        self.assertEqual(price, Decimal(-9000) / Decimal('-0.996'))
+        self.assertLiquidatedAt('1', '10000', '1000', price)
+        price = self.calculator.liquidation_price('-1', '10000', '1000')
+        self.assertGreater(price, 10000)
+        self.assertLiquidatedAt('-1', '10000', '1000', price)
+        # hedge mode reports the amount of short positions as positive
+        self.assertEqual(self.calculator.liquidation_price('1', '10000', '1000', 'short'), price)
+        self.assertIsNone(self.calculator.liquidation_price('0', '10000', '1000'))
+        # a long with more margin than notional can not be liquidated
+        self.assertEqual(self.calculator.liquidation_price('1', '10000', '20000'), 0)
+
+    def test_liquidation_price_in_lower_bracket(self):
+        # opened at 60000 notional, liquidated below 50000 where the first bracket applies
+        price = self.calculator.liquidation_price('6', '10000', '12000')
+        self.assertLess(price * 6, 50000)
+        self.assertLiquidatedAt('6', '10000', '12000', price)
+
+    def test_what_if_order(self):
+        result = self.calculator.what_if_order(None, 'buy', '1', '10000', leverage=10)
+        self.assertEqual(result['position'], 1)
+        self.assertEqual(result['openPrice'], 10000)
+        self.assertEqual(result['initMargin'], 1000)
+        self.assertEqual(result['maintMargin'], 40)
+        self.assertEqual(result['liquidatePrice'], self.calculator.liquidation_price('1', '10000', '1000'))
+        self.assertFalse(result['exceedsMaxNotional'])
+
+        position = {'position': '1', 'openPrice': '10000', 'initMargin': '1000', 'leverage': 10, 'positionSide': 'both'}
+        result = self.calculator.what_if_order(position, 'buy', '1', '12000')
+        self.assertEqual((result['position'], result['openPrice'], result['initMargin']), (2, 11000, 2200))
+        result = self.calculator.what_if_order(position, 'sell', '0.25', '12000')
+        self.assertEqual((result['position'], result['openPrice'], result['initMargin']), (Decimal('0.75'), 10000, 750))
+        result = self.calculator.what_if_order(position, 'sell', '1', '12000')
+        self.assertEqual((result['position'], result['openPrice'], result['maintMargin']), (0, 0, 0))
+        self.assertIsNone(result['liquidatePrice'])
+        result = self.calculator.what_if_order(position, 'sell', '3', '12000')
+        self.assertEqual((result['position'], result['openPrice'], result['initMargin']), (-2, 12000, 2400))
+
+        result = self.calculator.what_if_order(None, 'buy', '30', '10000', leverage=100)
+        self.assertTrue(result['exceedsMaxNotional'])
+
+    def test_what_if_margin(self):
+        position = {'position': '1', 'openPrice': '10000', 'initMargin': '1000', 'positionSide': 'both'}
+        lower = self.calculator.what_if_margin(position, 'asc', '500')
+        higher = self.calculator.what_if_margin(position, 'desc', '500')
+        self.assertEqual(lower, self.calculator.liquidation_price('1', '10000', '1500'))
+        self.assertEqual(higher, self.calculator.liquidation_price('1', '10000', '500'))
+        self.assertLess(lower, higher)
+
+    def test_from_market(self):
+        calculator = MarginCalculator.from_market({'maintMarginPercent': '2.5'})
+        self.assertEqual(calculator.maintenance_margin(Decimal(1000)), Decimal(25))
+        self.assertIsNone(calculator.max_notional(10))
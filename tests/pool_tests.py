@@ -0,0 +1,52 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from ccxt_ext.ccxt_ext import tenant_key
+from utils.pool import ApiPool
+
+
+class Api:
+
+    def __init__(self, config):
+        self.markets = None
+        self.release = None
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+
+    async def fetch_balance(self, params=None):
+        if self.release is not None:
+            await self.release.wait()
+        return params
+
+    async def close(self):
+        pass
+
+
+class TestApiPool(IsolatedAsyncioTestCase):
+
+    async def test_tenants_keyed_by_digest(self):
+        pool = ApiPool(Api, size=2)
+        pool.set_markets({})
+        credentials = {'apiKey': 'key', 'secret': 'secret'}
+        self.assertEqual(await pool.call(credentials, 'fetch_balance', params={'type': 'future'}),
+                         {'type': 'future', 'apiKey': 'key', 'secret': 'secret'})
+        self.assertEqual(await pool.call(None, 'fetch_balance'), None)
+        self.assertEqual(list(pool._tenants), [tenant_key(credentials), None])
+        self.assertNotIn('key', pool._tenants)
+
+    async def test_idle_tenants_are_dropped(self):
+        pool = ApiPool(Api, max_tenants=2)
+        pool.set_markets({})
+        release = pool.instances[0].release = asyncio.Event()
+        busy = asyncio.ensure_future(pool.call({'apiKey': 'busy'}, 'fetch_balance'))
+        await asyncio.sleep(0)
+        release.set()
+        pool.instances[0].release = None
+        for api_key in ['a', 'b', 'c']:
+            await pool.call({'apiKey': api_key}, 'fetch_balance')
+        # the busy tenant is the least recently used but still has a call in flight
+        self.assertEqual(list(pool._tenants), [tenant_key({'apiKey': 'busy'}), tenant_key({'apiKey': 'c'})])
+        await busy
+        await pool.call({'apiKey': 'b'}, 'fetch_balance')
+        self.assertEqual(list(pool._tenants), [tenant_key({'apiKey': 'c'}), tenant_key({'apiKey': 'b'})])
@@ -0,0 +1,132 @@
+from decimal import Decimal
+from unittest import TestCase
+
+from utils.cache import CoalescingCache
+from utils.positions import PositionEngine
+from utils.schemas import POSITIONS_SCHEMA
+
+
+def position(symbol='BTC/USDT', amount='0.1', entry_price='10000', mark_price='10000', leverage=10,
+             margin_type='cross', init_margin='0', position_side='both'):
+    # the fields of parse_swap_position the engine reads
+    return {
+        'symbol': symbol,
+        'position': amount,
+        'openPrice': entry_price,
+        'markPrice': mark_price,
+        'leverage': leverage,
+        'marginType': margin_type,
+        'initMargin': init_margin,
+        'positionSide': position_side,
+    }
+
+
+def trade(side, amount, price, symbol='BTC/USDT', position_side='both'):
+    return {'symbol': symbol, 'side': side, 'amount': amount, 'price': price, 'positionSide': position_side}
+
+
+class TestPositionEngine(TestCase):
+
+    def test_mark_to_market(self):
+        engine = PositionEngine({'BTC/USDT': Decimal('0.004')})
+        engine.load([
+            position(),
+            position(amount='-2', entry_price='3000', mark_price='3000', symbol='ETH/USDT', leverage=5,
+                     margin_type='isolated', init_margin='1200', position_side='short'),
+        ])
+        btc = engine.position('BTC/USDT')
+        self.assertEqual(btc['unrealizedProfit'], 0)
+        self.assertEqual(btc['roe'], 0)
+        # cross positions have no margin balance of their own
+        self.assertIsNone(btc['marginRatio'])
+
+        engine.update_mark_prices({'BTC/USDT': '10500', 'ETH/USDT': Decimal('2900')})
+        btc = engine.position('BTC/USDT')
+        self.assertEqual(btc['unrealizedProfit'], Decimal('50'))
+        # initial margin is 0.1 * 10000 / 10
+        self.assertEqual(btc['roe'], Decimal('0.5'))
+        self.assertEqual(btc['markPrice'], Decimal('10500'))
+
+        eth = engine.position('ETH/USDT', 'short')
+        self.assertEqual(eth['position'], Decimal('-2'))
+        self.assertEqual(eth['unrealizedProfit'], Decimal('200'))
+        self.assertEqual(eth['roe'], Decimal('200') / Decimal('1200'))
+        self.assertIsNone(eth['marginRatio'])
+        engine.maint_margin_rates['ETH/USDT'] = Decimal('0.01')
+        engine.update_mark_price('ETH/USDT', '2900')
+        self.assertEqual(engine.position('ETH/USDT', 'short')['marginRatio'], Decimal('2') * 2900 * Decimal('0.01') / 1400)
+
+    def test_fills(self):
+        engine = PositionEngine()
+        engine.update_mark_price('BTC/USDT', '10000')
+        engine.apply_trade(trade('buy', '1', '10000'))
+        engine.apply_trade(trade('buy', '1', '11000'))
+        btc = engine.position('BTC/USDT')
+        self.assertEqual(btc['position'], 2)
+        self.assertEqual(btc['openPrice'], Decimal('10500'))
+        self.assertEqual(btc['unrealizedProfit'], Decimal('-1000'))
+
+        # partial close realizes the pnl of the closed part
+        engine.apply_trade(trade('sell', '0.5', '12000'))
+        btc = engine.position('BTC/USDT')
+        self.assertEqual(btc['position'], Decimal('1.5'))
+        self.assertEqual(btc['realizedProfit'], Decimal('750'))
+        self.assertEqual(btc['openPrice'], Decimal('10500'))
+        self.assertEqual(btc['unrealizedProfit'], Decimal('-750'))
+
+        # flip, the rest opens at the trade price
+        engine.apply_trade(trade('sell', '2', '12000'))
+        btc = engine.position('BTC/USDT')
+        self.assertEqual(btc['position'], Decimal('-0.5'))
+        self.assertEqual(btc['realizedProfit'], Decimal('3000'))
+        self.assertEqual(btc['openPrice'], Decimal('12000'))
+        engine.update_mark_price('BTC/USDT', '11000')
+        self.assertEqual(engine.position('BTC/USDT')['unrealizedProfit'], Decimal('500'))
+
+        engine.apply_trade(trade('buy', '0.5', '11000'))
+        btc = engine.position('BTC/USDT')
+        self.assertEqual(btc['position'], 0)
+        self.assertEqual(btc['openPrice'], 0)
+        self.assertEqual(btc['unrealizedProfit'], 0)
+        self.assertEqual(btc['realizedProfit'], Decimal('3500'))
+        self.assertEqual(engine.positions(), [])
+
+    def test_isolated_margin_follows_fills(self):
+        engine = PositionEngine()
+        engine.load([position(amount='1', margin_type='isolated', init_margin='1000')])
+        engine.apply_trade(trade('buy', '1', '10000'))
+        self.assertEqual(engine.position('BTC/USDT')['initMargin'], Decimal('2000'))
+        engine.apply_trade(trade('sell', '1.5', '10000'))
+        self.assertEqual(engine.position('BTC/USDT')['initMargin'], Decimal('500'))
+
+    def test_reconcile(self):
+        engine = PositionEngine()
+        engine.load([position()], tenant='a')
+        engine.load([position(amount='0.2')], tenant='b')
+        engine.apply_trade(trade('buy', '0.1', '10000'), tenant='a')
+        drifts = engine.load([position(amount='0.3')], tenant='a')
+        self.assertEqual(drifts, [(('a', 'BTC/USDT', 'both'), Decimal('0.2'), Decimal('0.3'))])
+        self.assertEqual(engine.load([position(amount='0.3')], tenant='a'), [])
+        self.assertEqual([p['position'] for p in engine.positions('a')], [Decimal('0.3')])
+        self.assertEqual([p['position'] for p in engine.positions('b', 'BTC/USDT')], [Decimal('0.2')])
+        self.assertIsNone(engine.position('BTC/USDT', tenant='c'))
+
+    def test_positions_schema(self):
+        engine = PositionEngine()
+        engine.load([position(), position(symbol='ETH/USDT', margin_type='isolated', init_margin='100')])
+        engine.apply_trade(trade('buy', '1', '300', symbol='LTC/USDT'))
+        positions = engine.positions()
+        POSITIONS_SCHEMA.validate(positions)
+        self.assertEqual([(p['marginType'], p['initMargin']) for p in positions],
+                         [('cross', Decimal('100')), ('isolated', Decimal('100')), ('cross', 0)])
+
+    def test_fills_follow_symbol_configs(self):
+        configs = CoalescingCache(60)
+        configs.put(('a', 'BTC/USDT', 'leverage'), 20)
+        configs.put(('a', 'BTC/USDT', 'marginType'), 'ISOLATED')
+        engine = PositionEngine(symbol_configs=configs)
+        engine.apply_trade(trade('buy', '1', '10000'), tenant='a')
+        btc = engine.position('BTC/USDT', tenant='a')
+        self.assertEqual((btc['marginType'], btc['leverage'], btc['initMargin']), ('isolated', 20, Decimal('500')))
+        engine.apply_trade(trade('buy', '1', '10000'), tenant='b')
+        self.assertEqual(engine.position('BTC/USDT', tenant='b')['marginType'], 'cross')
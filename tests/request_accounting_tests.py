@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+from utils.request_accounting import RequestAccounting
+
+
+class TestRequestAccounting(TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.accounting = RequestAccounting(window=60, clock=lambda: self.now)
+
+    def test_window(self):
+        self.accounting.record('a', 'GET fapiPrivate/order', 1, 200, {'X-MBX-USED-WEIGHT-1M': '10'}, 'fapi')
+        self.now += 30
+        self.accounting.record('b', 'GET fapiPrivate/openOrders', 40, 429, {'Retry-After': '5'}, 'fapi')
+        self.assertEqual(self.accounting.window_weight(), 41)
+        self.assertEqual(self.accounting.top('endpoint', 1), [('GET fapiPrivate/openOrders', 40)])
+        self.now += 31
+        self.assertEqual(self.accounting.window_weight(), 40)
+        self.assertEqual(self.accounting.window_weight('a'), 0)
+        snapshot = self.accounting.snapshot()
+        self.assertEqual((snapshot['requests'], snapshot['weight'], snapshot['rateLimited']), (2, 41, 1))
+        self.assertEqual(snapshot['lastRejection']['retryAfter'], '5')
+
+    def test_reset(self):
+        self.accounting.record('a', 'GET fapiPrivate/order', 5, 200, {'X-MBX-USED-WEIGHT': '10'}, 'fapi')
+        self.accounting.reset()
+        self.assertEqual(self.accounting.window_weight(), 0)
+        self.assertEqual(self.accounting.top(), [])
+        snapshot = self.accounting.snapshot()
+        self.assertEqual((snapshot['requests'], snapshot['weight']), (0, 0))
+        self.assertEqual((snapshot['usedWeight'], snapshot['windowWeight'], snapshot['tenants']), ({}, {}, {}))
+        self.accounting.record('a', 'GET fapiPrivate/order', 1, 200)
+        self.assertEqual(self.accounting.window_weight('a'), 1)
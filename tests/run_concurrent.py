@@ -0,0 +1,59 @@
+"""
+Run test cases at the same time, each in a thread with its own event loop
+
+The integration cases mostly wait on the exchange, so the wall-clock time of the suite comes down to the
+slowest case. Cases must not share orders or positions, see SCENARIO_SYMBOLS in tests/swap_tests.py.
+
+example:
+    python -m tests.run_concurrent tests.swap_tests
+    python -m tests.run_concurrent tests.swap_tests.TestSwapAPIs.test_position tests.swap_tests.TestSwapAPIs.test_leverage
+"""
+import argparse
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+
+def flatten(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from flatten(test)
+        else:
+            yield test
+
+
+def run_one(test):
+    result = unittest.TestResult()
+    test.run(result)
+    return result
+
+
+def main(args):
+    tests = list(flatten(unittest.defaultTestLoader.loadTestsFromNames(args.names)))
+    workers = args.workers or max(len(tests), 1)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_one, tests))
+    elapsed = time.perf_counter() - started
+
+    summary = unittest.TextTestResult(unittest.runner._WritelnDecorator(sys.stderr), True, 1)
+    for result in results:
+        summary.testsRun += result.testsRun
+        summary.failures += result.failures
+        summary.errors += result.errors
+        summary.skipped += result.skipped
+        summary.expectedFailures += result.expectedFailures
+        summary.unexpectedSuccesses += result.unexpectedSuccesses
+    summary.printErrors()
+    print(f'Ran {summary.testsRun} tests in {elapsed:.3f}s with {workers} workers', file=sys.stderr)
+    print('OK' if summary.wasSuccessful() else f'FAILED (failures={len(summary.failures)}, errors={len(summary.errors)})',
+          file=sys.stderr)
+    return 0 if summary.wasSuccessful() else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('names', nargs='+', help='test modules, classes or methods')
+    parser.add_argument('--workers', type=int, help='test cases running at once, all of them by default')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+import asyncio
+import os
+from unittest import IsolatedAsyncioTestCase
+
+from ccxt.base.errors import RequestTimeout
+
+from ccxt_ext.errors import WorkerExitedError
+from utils.sharding import ShardSupervisor
+
+
+class ShardApi:
+    """
+    An API the workers can import, answering with the pid of their process
+    """
+
+    def __init__(self, config):
+        self.markets = None
+        self.currencies = None
+
+    async def load_markets(self):
+        self.set_markets({'BTC/USDT': {'symbol': 'BTC/USDT'}})
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies
+
+    async def fetch_balance(self, params=None):
+        return os.getpid()
+
+    async def fetch_order(self, id, symbol=None, params=None):
+        await asyncio.sleep(id)
+        return id
+
+    async def cancel_order(self, id, symbol=None, params=None):
+        os._exit(3)
+
+    async def close(self):
+        pass
+
+
+class TestShardSupervisor(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.supervisor = ShardSupervisor(ShardApi, workers=2, markets_capacity=4096, books_capacity=4096,
+                                          call_timeout=5, liveness_interval=0.05)
+        await self.supervisor.start()
+
+    async def asyncTearDown(self):
+        await self.supervisor.stop()
+
+    async def test_worker_exit(self):
+        credentials = {'apiKey': 'key', 'secret': 'secret'}
+        pid = await self.supervisor.call(credentials, 'fetch_balance')
+        self.assertEqual(await self.supervisor.call(credentials, 'fetch_balance'), pid)
+        pending = asyncio.ensure_future(self.supervisor.call(credentials, 'fetch_order', 1))
+        await asyncio.sleep(0.2)
+        with self.assertRaises(WorkerExitedError):
+            await self.supervisor.call(credentials, 'cancel_order', 1)
+        # the other calls in flight on the worker fail too instead of waiting forever
+        with self.assertRaises(WorkerExitedError):
+            await pending
+        self.assertFalse(self.supervisor._futures)
+        # a new worker takes over the shard
+        self.assertNotEqual(await self.supervisor.call(credentials, 'fetch_balance'), pid)
+
+    async def test_call_timeout(self):
+        # once the worker is up
+        await self.supervisor.call(None, 'fetch_balance')
+        self.supervisor.call_timeout = 0.2
+        with self.assertRaises(RequestTimeout):
+            await self.supervisor.call(None, 'fetch_order', 0.5)
+        self.assertFalse(self.supervisor._futures)
+        self.assertEqual(await self.supervisor.call(None, 'fetch_order', 0), 0)
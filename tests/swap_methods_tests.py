@@ -3,8 +3,9 @@ import os
 from unittest import IsolatedAsyncioTestCase
 
 from examples.binance_swap import BinanceSwap
+from exchanges import load_exchange_class
 from . import schemas
-from .test_keys import TEST_API_KEYS, TEST_CLASS
+from .test_keys import TEST_API_KEYS
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -14,7 +15,7 @@ class TestSwapAPIs(IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self) -> None:
         self.test_exchange = os.getenv('EXCHANGE', 'binance')
-        exchange_class = TEST_CLASS[self.test_exchange]
+        exchange_class = load_exchange_class(self.test_exchange, 'swap')
         self.api = exchange_class(TEST_API_KEYS[self.test_exchange])
         self.test_symbol = 'BTC/USDT'
         self.fixed_client_order_id = 'bu_test_client_order_id'
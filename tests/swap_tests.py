@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import os
 import time
@@ -7,11 +6,22 @@ from functools import wraps
 from unittest import IsolatedAsyncioTestCase
 
 from examples.binance_swap import BinanceSwap
+from exchanges import load_exchange_class
+from utils.wait import wait_for_order, wait_for_orders, wait_for_position
 from . import schemas
-from .test_keys import TEST_API_KEYS, TEST_CLASS
+from .test_keys import TEST_API_KEYS
 
 logging.basicConfig(level=logging.DEBUG)
 
+# scenarios which leave orders or positions behind trade a symbol of their own, so the test cases can run
+# at the same time, see tests/run_concurrent.py
+SCENARIO_SYMBOLS = {
+    'test_common_order_operations': 'ETH/USDT',
+    'test_position': 'LTC/USDT',
+    'test_leverage': 'XRP/USDT',
+    'test_create_trade_order': 'BNB/USDT',
+}
+
 
 def log_test(func):
     @wraps(func)
@@ -28,9 +38,9 @@ class TestSwapAPIs(IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self) -> None:
         self.test_exchange = os.getenv('EXCHANGE', 'binance')
-        exchange_class = TEST_CLASS[self.test_exchange]
+        exchange_class = load_exchange_class(self.test_exchange, 'swap')
         self.api = exchange_class(TEST_API_KEYS[self.test_exchange])
-        self.test_symbol = 'BTC/USDT'
+        self.test_symbol = SCENARIO_SYMBOLS.get(self._testMethodName, 'BTC/USDT')
         self.test_side = 'buy'
         self.test_leverage = 20
 
@@ -86,7 +96,8 @@ class TestSwapAPIs(IsolatedAsyncioTestCase):
 
     @staticmethod
     def random_client_order_id():
-        return f't{int(time.time())}'
+        # unique between test cases running at the same time
+        return f't{time.time_ns()}'
 
     async def get_order_params(self, should_trade=False):
         await self.api.load_markets()
@@ -172,15 +183,23 @@ class TestSwapAPIs(IsolatedAsyncioTestCase):
             if result:
                 self.current_position = result[0]
 
+    async def wait_for_position_change(self):
+        origin = Decimal(self.current_position and self.current_position['position'] or 0)
+
+        def changed(positions):
+            return (Decimal(str(positions[0]['position'])) if positions else 0) != origin
+
+        await wait_for_position(self.api, self.test_symbol, changed)
+
     @log_test
     async def test_common_order_operations(self):
         await self.test_create_untrade_order()
-        await asyncio.sleep(1)
+        await wait_for_orders(self.api, 'fetch_open_orders', self.test_symbol, self.current_order['id'])
         await self.test_fetch_current_order()
         await self.test_fetch_open_orders(should_contain_current_order=True)
         await self.test_fetch_closed_orders(should_contain_current_order=False)
         await self.test_cancel_current_order()
-        await asyncio.sleep(1)
+        await wait_for_orders(self.api, 'fetch_closed_orders', self.test_symbol, self.current_order['id'])
         await self.test_fetch_open_orders(should_contain_current_order=False)
         await self.test_fetch_closed_orders(should_contain_current_order=True)
 
@@ -188,7 +207,8 @@ class TestSwapAPIs(IsolatedAsyncioTestCase):
     async def test_position(self):
         await self.test_fetch_current_position()
         await self.test_create_trade_order()
-        await asyncio.sleep(1)
+        await wait_for_order(self.api, self.current_order['id'], self.test_symbol, 'closed')
+        await self.wait_for_position_change()
         await self.test_fetch_current_order(update_current_order=True)
         await self.test_fetch_closed_orders(should_contain_current_order=True)
         await self.test_fetch_current_position(check_position_diff_with_current_order=True)
@@ -199,10 +219,13 @@ class TestSwapAPIs(IsolatedAsyncioTestCase):
 
         # set leverage twice to test duplicated case. The implement should NOT raise any error
         await self.api.change_leverage(self.test_symbol, self.test_leverage)
+        # the known leverage would skip the request, forget it so the second one reaches the server
+        self.api.symbol_configs.invalidate_where(lambda key: key[1] == self.test_symbol and key[2] == 'leverage')
         await self.api.change_leverage(self.test_symbol, self.test_leverage)
 
         await self.test_create_trade_order()
-        await asyncio.sleep(1)
+        await wait_for_order(self.api, self.current_order['id'], self.test_symbol, 'closed')
+        await wait_for_position(self.api, self.test_symbol, lambda positions: positions and Decimal(str(positions[0]['position'])))
         await self.test_fetch_current_position()
         self.assertEqual(int(self.current_position['leverage']), self.test_leverage)
 
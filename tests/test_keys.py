@@ -1,10 +1,3 @@
-from examples.binance_swap import BinanceSwap
-
-TEST_CLASS = {
-    'binance': BinanceSwap
-}
-
-
 TEST_API_KEYS = {
     'binance': {
         'apiKey': 'test-api-key',
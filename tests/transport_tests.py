@@ -0,0 +1,84 @@
+import asyncio
+import socket
+from unittest import IsolatedAsyncioTestCase
+
+from aiohttp import web
+
+from exchanges import load_exchange_class
+from utils.request_accounting import RequestAccounting
+
+# path: (status, body)
+RESPONSES = {
+    '/ok': (200, '{"serverTime":1}'),
+    '/banned': (418, 'banned'),
+    '/invalid': (400, '{"code":-1121,"msg":"Invalid symbol."}'),
+    '/unavailable': (503, 'service unavailable'),
+    '/broken': (200, '{"serverTime":'),
+    '/busy': (200, '[busy, retry later'),
+}
+
+
+class TestFetchErrors(IsolatedAsyncioTestCase):
+    """
+    A request fails the same way whether it is sent by ccxt, through the transport of the accounting
+    or streamed
+    """
+
+    async def asyncSetUp(self):
+        async def handle(request):
+            if request.path == '/slow':
+                await asyncio.sleep(1)
+            status, body = RESPONSES.get(request.path, (200, '[]'))
+            return web.Response(status=status, text=body, content_type='application/json')
+
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.base_url = f'http://{host}:{port}'
+        exchange_class = load_exchange_class('binance', 'swap')
+        self.plain = exchange_class({'timeout': 200})
+        self.accounted = exchange_class({'timeout': 200, 'accounting': RequestAccounting()})
+
+    async def asyncTearDown(self):
+        await self.plain.close()
+        await self.accounted.close()
+        await self.runner.cleanup()
+
+    async def outcome(self, fetch):
+        try:
+            return 'result', await fetch
+        except Exception as e:
+            return type(e), str(e)
+
+    async def stream(self, api, url):
+        return [element async for element in api.fetch_stream(url)]
+
+    async def assertSameOutcome(self, url, stream=True):
+        expected = await self.outcome(self.plain.fetch(url))
+        self.assertEqual(await self.outcome(self.accounted.fetch(url)), expected)
+        for attribute in ('last_http_response', 'last_json_response'):
+            self.assertEqual(getattr(self.accounted, attribute), getattr(self.plain, attribute), attribute)
+        if stream:
+            self.assertEqual(await self.outcome(self.stream(self.plain, url)), expected)
+        return expected
+
+    async def test_responses(self):
+        self.assertEqual(await self.assertSameOutcome(self.base_url + '/ok', stream=False), ('result', {'serverTime': 1}))
+        for path in ('/banned', '/invalid', '/unavailable'):
+            outcome = await self.assertSameOutcome(self.base_url + path)
+            self.assertNotEqual(outcome[0], 'result', path)
+        # responses which are no valid json
+        for path in ('/broken', '/busy'):
+            outcome = await self.assertSameOutcome(self.base_url + path, stream=False)
+            self.assertNotEqual(outcome[0], 'result', path)
+
+    async def test_connection_errors(self):
+        await self.assertSameOutcome(self.base_url + '/slow')
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            closed_port = s.getsockname()[1]
+        await self.assertSameOutcome(f'http://127.0.0.1:{closed_port}/ok')
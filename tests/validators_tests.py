@@ -0,0 +1,119 @@
+import time
+from decimal import Decimal
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from schema import And, Optional, Or, Schema, SchemaError
+
+from ccxt_ext.errors import InvalidResultError
+from utils.validators import ResultGuard, ValidationError, compile_schema
+from . import schemas
+
+NOW = int(time.time() * 1000)
+ORDER = {
+    'id': '1',
+    'clientOrderId': 'x',
+    'timestamp': NOW,
+    'lastTradeTimestamp': str(NOW),
+    'status': 'open',
+    'symbol': 'BTC/USDT',
+    'type': 'limit',
+    'side': 'buy',
+    'price': Decimal('10000'),
+    'average': None,
+    'amount': '0.001',
+    'filled': 0,
+    'cost': 0.0,
+    'trades': None,
+    'fee': None,
+    'info': {},
+    'positionSide': 'both',
+}
+
+
+class TestCompiledValidators(TestCase):
+
+    def assertSameVerdict(self, schema, data):
+        try:
+            schema.validate(data)
+            expected = True
+        except SchemaError:
+            expected = False
+        try:
+            compile_schema(schema)(data)
+            result = True
+        except ValidationError:
+            result = False
+        self.assertEqual(result, expected, data)
+
+    def test_order_mutations(self):
+        for key in list(ORDER) + ['extra', 5]:
+            for value in [None, 'x', 'abc', '1.5', 1, True, 1.5, Decimal(2), [], {}, NOW, str(NOW)]:
+                order = dict(ORDER)
+                order[key] = value
+                self.assertSameVerdict(schemas.ORDER_SCHEMA, order)
+                self.assertSameVerdict(schemas.ORDERS_SCHEMA, [ORDER, order])
+            self.assertSameVerdict(schemas.ORDER_SCHEMA, {k: v for k, v in ORDER.items() if k != key})
+
+    def test_type_keys_and_extra_keys(self):
+        balance = {'free': {'BTC': 1}, 'used': {'BTC': 0}, 'total': {'BTC': '1'}, 'info': {},
+                   'BTC': {'free': 1, 'used': 0, 'total': 1}}
+        for data in [balance, dict(balance, BTC=1), {k: v for k, v in balance.items() if k != 'BTC'},
+                     dict(balance, free={'BTC': 'x'})]:
+            self.assertSameVerdict(schemas.BALANCE_SCHEMA, data)
+        schema = Schema({Optional(str): int, 'a': Or('x', 'y')}, ignore_extra_keys=True)
+        for data in [{'a': 'x'}, {'a': 'z'}, {'a': 'x', 'b': '1'}, {'a': 'x', 1: 2}]:
+            self.assertSameVerdict(schema, data)
+
+    def test_or_and_lists(self):
+        for schema, values in [
+            (Schema(Or(int, And(str, len))), [1, True, '', 'a', None]),
+            (Schema([int, str]), [[1, 'a'], [None], (1,)]),
+            (Schema(And([int], lambda x: len(x) > 1)), [[1], [1, 2]]),
+            (schemas.ORDER_BOOK_SCHEMA, [{'bids': [[1, 2]], 'asks': [['1.5', Decimal(3)]]}, {'bids': [], 'asks': [[1, 2]]},
+                                         {'bids': [[1]], 'asks': [[1, 2]]}, {'bids': [[1, 2]], 'asks': [[1, 2]], 'nonce': True}]),
+        ]:
+            for value in values:
+                self.assertSameVerdict(schema, value)
+
+    def test_error_path(self):
+        with self.assertRaises(ValidationError) as context:
+            compile_schema(schemas.ORDERS_SCHEMA)([ORDER, dict(ORDER, price='abc')])
+        self.assertEqual(context.exception.path, (1, 'price'))
+
+
+class TestResultGuard(IsolatedAsyncioTestCase):
+
+    class Api:
+        async def fetch_order(self, id):
+            return dict(ORDER, id=id)
+
+        async def fetch_open_orders_by_symbols(self, symbols=None):
+            return {'BTC/USDT': [ORDER], 'ETH/USDT': [dict(ORDER, side=None)]}
+
+    async def test_guard(self):
+        api = self.Api()
+        invalid = []
+        guard = ResultGuard(on_invalid=lambda name, result, error: invalid.append((name, error.path)))
+        guard.attach(api)
+        await api.fetch_order('2')
+        await api.fetch_order(None)
+        await api.fetch_open_orders_by_symbols()
+        self.assertEqual(invalid, [('fetch_order', ('id',)), ('fetch_open_orders_by_symbols', ('ETH/USDT', 0, 'side'))])
+        guard.detach(api)
+        await api.fetch_order(None)
+        self.assertEqual(guard.checked, 3)
+
+    async def test_guard_raises(self):
+        api = self.Api()
+        ResultGuard({'fetch_order': schemas.ORDER_SCHEMA}).attach(api)
+        with self.assertRaises(InvalidResultError):
+            await api.fetch_order(None)
+
+    def test_default_schemas(self):
+        trade = {'id': '1', 'timestamp': NOW, 'symbol': 'BTC/USDT', 'order': '1', 'side': 'buy',
+                 'price': Decimal('10000'), 'amount': '0.001', 'cost': 10, 'fee': None, 'info': {}}
+        guard = ResultGuard()
+        guard.check('fetch_order_trades', [trade])
+        guard.check('fetch_my_trades', [trade])
+        with self.assertRaises(InvalidResultError):
+            guard.check('fetch_order_trades', [ORDER])
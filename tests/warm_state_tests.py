@@ -0,0 +1,95 @@
+import asyncio
+import os
+import tempfile
+from decimal import Decimal
+from unittest import IsolatedAsyncioTestCase
+
+from ccxt.base.errors import ExchangeNotAvailable
+
+from benchmarks.parser_bench import synthetic_payloads
+from exchanges import load_exchange_class
+
+
+class TestWarmState(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.exchange_class = load_exchange_class('binance', 'swap')
+        self.apis = []
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'state.json.gz')
+
+    async def asyncTearDown(self):
+        for api in self.apis:
+            await api.close()
+
+    def api(self):
+        api = self.exchange_class({})
+        self.apis.append(api)
+        return api
+
+    async def test_round_trip(self):
+        api = self.api()
+        api.set_markets([api.parse_swap_market(market) for market in synthetic_payloads(1)['markets']])
+        api.options['timeDifference'] = 42
+        tenant = api.tenant_key({'apiKey': 'key'})
+        brackets = [{'notionalFloor': Decimal(0), 'notionalCap': Decimal(50000), 'maintMarginRatio': Decimal('0.004'),
+                     'cum': Decimal(0), 'initialLeverage': 125}]
+        api.leverage_brackets.put(tenant, {'BTC/USDT': brackets})
+        api.symbol_configs.put((tenant, 'BTC/USDT', 'leverage'), 20)
+        api.save_warm_state(self.path)
+
+        restored = self.api()
+        self.assertTrue(restored.restore_warm_state(self.path, validate=False))
+        self.assertEqual(restored.symbols, api.symbols)
+        self.assertEqual(restored.markets['BTC/USDT']['precision'], api.markets['BTC/USDT']['precision'])
+        self.assertEqual(restored.options['timeDifference'], 42)
+        self.assertEqual(restored.leverage_brackets.peek(tenant), {'BTC/USDT': brackets})
+        self.assertEqual(restored.symbol_configs.peek((tenant, 'BTC/USDT', 'leverage')), 20)
+
+    async def test_expired_entries(self):
+        api = self.api()
+        api.symbol_configs.put(('tenant', 'BTC/USDT', 'leverage'), 20)
+        api.save_warm_state(self.path)
+        # the time the process was down counts to the age
+        await asyncio.sleep(0.05)
+        restored = self.api()
+        restored.symbol_configs.ttl = 0.02
+        self.assertTrue(restored.restore_warm_state(self.path, validate=False))
+        self.assertIsNone(restored.symbol_configs.peek(('tenant', 'BTC/USDT', 'leverage')))
+
+    async def restore_validated(self, fetch_markets):
+        api = self.api()
+        markets = [api.parse_swap_market(market) for market in synthetic_payloads(1)['markets']]
+        api.set_markets(markets)
+        api.save_warm_state(self.path)
+        restored = self.api()
+        restored.fetch_markets = fetch_markets
+        self.assertTrue(restored.restore_warm_state(self.path))
+        # calls made while the markets are reloaded use the restored ones instead of waiting
+        await asyncio.wait_for(restored.load_markets(), 0.5)
+        self.assertFalse(restored.markets_validation.done())
+        return restored, markets
+
+    async def test_validate(self):
+        async def fetch_markets(params={}):
+            await asyncio.sleep(1)
+            return [dict(market, active=False) for market in markets]
+
+        restored, markets = await self.restore_validated(fetch_markets)
+        self.assertTrue(restored.markets['BTC/USDT']['active'])
+        await restored.markets_validation
+        self.assertFalse(restored.markets['BTC/USDT']['active'])
+
+    async def test_validate_failure(self):
+        async def fetch_markets(params={}):
+            await asyncio.sleep(0.2)
+            raise ExchangeNotAvailable('down')
+
+        restored, markets = await self.restore_validated(fetch_markets)
+        with self.assertLogs(restored.logger, 'WARNING'):
+            await restored.markets_validation
+        self.assertEqual(restored.symbols, sorted(market['symbol'] for market in markets))
+
+    async def test_missing_state(self):
+        self.assertFalse(self.api().restore_warm_state(self.path))
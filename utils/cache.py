@@ -0,0 +1,118 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+
+
+class CoalescingCache:
+    """
+    Short-lived cache of async call results
+
+    Values expire `ttl` seconds after they were loaded and are dropped once expired, the oldest ones
+    also when there are more than `max_size`. Concurrent callers asking for the same key while it is
+    being loaded wait for the same call instead of starting their own. With a ttl of 0 nothing is kept,
+    the cache only coalesces concurrent callers.
+    """
+
+    def __init__(self, ttl=1.0, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        # key: (loaded at, value), oldest first
+        self._values = OrderedDict()
+        self._pending = {}
+
+    async def get(self, key, loader, ttl=None):
+        """
+        :param key:     hashable cache key, eg. (tenant, 'account')
+        :param loader:  coroutine function without arguments, called on a miss
+        :param ttl:     overrides the default ttl for this call, 0 means only coalesce concurrent callers
+        :return:        the cached or freshly loaded value
+        """
+        ttl = self.ttl if ttl is None else ttl
+        self._sweep()
+        entry = self._values.get(key)
+        if entry is not None and ttl > 0 and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._pending[key] = task
+            task.add_done_callback(functools.partial(self._loaded, key))
+        # the load runs in its own task, a cancelled caller only stops waiting for it
+        return await asyncio.shield(task)
+
+    def _loaded(self, key, task):
+        # also marks the exception as retrieved when nobody is waiting anymore
+        failed = task.cancelled() or task.exception() is not None
+        # a load invalidated while in flight is handed to its waiters but not cached
+        if self._pending.get(key) is task:
+            del self._pending[key]
+            if not failed:
+                self.put(key, task.result())
+
+    def peek(self, key, ttl=None):
+        """
+        :return:        the cached value if it is still fresh, otherwise None
+        """
+        ttl = self.ttl if ttl is None else ttl
+        self._sweep()
+        entry = self._values.get(key)
+        if entry is not None and ttl > 0 and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+        return None
+
+    def put(self, key, value):
+        if self.ttl <= 0:
+            return
+        self._values.pop(key, None)
+        self._values[key] = (time.monotonic(), value)
+        self._sweep()
+
+    def _sweep(self):
+        values = self._values
+        while len(values) > self.max_size:
+            values.popitem(last=False)
+        expired = time.monotonic() - self.ttl
+        while values:
+            key, (loaded, _) = next(iter(values.items()))
+            if loaded > expired:
+                break
+            del values[key]
+
+    def invalidate(self, key=None):
+        """
+        Drop one key, or everything when key is None
+        """
+        if key is None:
+            self._values.clear()
+            self._pending.clear()
+        else:
+            self._values.pop(key, None)
+            self._pending.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        for key in [key for key in self._values if predicate(key)]:
+            del self._values[key]
+        for key in [key for key in self._pending if predicate(key)]:
+            del self._pending[key]
+
+    def dump(self):
+        """
+        :return:    list of (key, age in seconds, value) of the cached values, for `load` in another process
+        """
+        now = time.monotonic()
+        return [(key, now - loaded, value) for key, (loaded, value) in self._values.items()]
+
+    def load(self, entries):
+        """
+        Restore values from `dump`, they keep their age and expire as if they had never left
+        """
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        for key, age, value in entries:
+            self._values.pop(key, None)
+            self._values[key] = (now - age, value)
+        self._values = OrderedDict(sorted(self._values.items(), key=lambda item: item[1][0]))
+        self._sweep()
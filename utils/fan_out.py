@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import namedtuple
+
+from ccxt_ext.ccxt_ext import tenant_key
+from utils.pool import ApiPool
+
+FanOutCall = namedtuple('FanOutCall', ['method', 'args', 'kwargs', 'credentials', 'key'])
+FanOutCall.__new__.__defaults__ = ((), None, None, None)
+FanOutCall.__doc__ = """
+One call of a fan-out
+
+:param method:      name of the SpotApi / SwapApi method, eg. 'fetch_open_orders'
+:param args:        positional arguments of the method
+:param kwargs:      keyword arguments of the method
+:param credentials: {'apiKey': ..., 'secret': ...} of the tenant, None for public calls
+:param key:         anything to recognize the result by, eg. (tenant, symbol)
+"""
+
+FanOutResult = namedtuple('FanOutResult', ['call', 'result', 'error', 'elapsed'])
+
+
+class FanOut:
+    """
+    Run the same kind of call across many (tenant, symbol) pairs with a global and a per-tenant
+    concurrency limit, yielding results as they complete
+
+    example:
+        fan_out = FanOut(pool, concurrency=50, tenant_concurrency=5, timeout=10)
+        calls = [FanOutCall('fetch_open_orders', (symbol,), credentials=keys, key=(tenant, symbol)) for ...]
+        async for item in fan_out.run(calls):
+            if item.error is None:
+                handle(item.call.key, item.result)
+        print(fan_out.stats)
+    """
+
+    def __init__(self, api, concurrency=32, tenant_concurrency=4, timeout=None):
+        """
+        :param api:                 ApiPool, or an API instance which takes credentials in params
+        :param concurrency:         max calls in flight in total
+        :param tenant_concurrency:  max calls in flight per tenant
+        :param timeout:             seconds, per call
+        """
+        self.api = api
+        self.concurrency = concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.timeout = timeout
+        self.stats = {}
+
+    def _invoke(self, call):
+        kwargs = dict(call.kwargs or {})
+        if isinstance(self.api, ApiPool):
+            return self.api.call(call.credentials, call.method, *call.args, **kwargs)
+        if call.credentials:
+            kwargs['params'] = dict(kwargs.get('params') or {}, **call.credentials)
+        return getattr(self.api, call.method)(*call.args, **kwargs)
+
+    async def run(self, calls):
+        """
+        :param calls:   iterable of FanOutCall
+        :return:        async iterator of FanOutResult in completion order, errors are returned, not raised
+        """
+        stats = self.stats = {
+            'calls': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'timedOut': 0,
+            'elapsed': 0.0,
+            'throughput': 0.0,
+        }
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tenant_semaphores = {}
+
+        async def run_one(call):
+            tenant = tenant_key(call.credentials)
+            tenant_semaphore = tenant_semaphores.get(tenant)
+            if tenant_semaphore is None:
+                tenant_semaphore = tenant_semaphores[tenant] = asyncio.Semaphore(self.tenant_concurrency)
+            async with tenant_semaphore, semaphore:
+                started = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(self._invoke(call), self.timeout)
+                    stats['succeeded'] += 1
+                    return FanOutResult(call, result, None, time.monotonic() - started)
+                except asyncio.TimeoutError as e:
+                    stats['timedOut'] += 1
+                    return FanOutResult(call, None, e, time.monotonic() - started)
+                except Exception as e:
+                    stats['failed'] += 1
+                    return FanOutResult(call, None, e, time.monotonic() - started)
+
+        started = time.monotonic()
+        tasks = [asyncio.ensure_future(run_one(call)) for call in calls]
+        stats['calls'] = len(tasks)
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+                stats['elapsed'] = time.monotonic() - started
+                done = stats['succeeded'] + stats['failed'] + stats['timedOut']
+                stats['throughput'] = done / stats['elapsed'] if stats['elapsed'] else 0.0
+        finally:
+            for task in tasks:
+                task.cancel()
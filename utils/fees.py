@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from utils.positions import to_decimal
+
+
+class FeeSchedule:
+    """
+    Maker / taker rates per symbol of one tenant, precomputed from a fee rate list
+    like the one returned by `fetch_trading_fee_rates` / `fetch_trading_fees`
+    """
+
+    def __init__(self, fee_rates, default=None, fee_tier=None, info=None):
+        """
+        :param fee_rates:   list of {'symbol': ..., 'maker': ..., 'taker': ...}, symbol None is the default rate
+        :param default:     {'maker': ..., 'taker': ...} for symbols not in fee_rates
+        :param fee_tier:    the fee tier level the rates come from, if the exchange has tiers
+        :param info:        raw exchange payload the rates were read from
+        """
+        self.fee_tier = fee_tier
+        self.info = info
+        self.rates = {}
+        self.default = None
+        if default is not None:
+            self.default = (to_decimal(default['maker']), to_decimal(default['taker']))
+        for fee_rate in fee_rates:
+            rate = (to_decimal(fee_rate['maker']), to_decimal(fee_rate['taker']))
+            if fee_rate.get('symbol') is None:
+                self.default = rate
+            else:
+                self.rates[fee_rate['symbol']] = rate
+
+    def _rates(self, symbol):
+        rates = self.rates.get(symbol, self.default)
+        if rates is None:
+            raise KeyError(symbol)
+        return rates
+
+    def rate(self, symbol, takerOrMaker='taker'):
+        maker, taker = self._rates(symbol)
+        return maker if takerOrMaker == 'maker' else taker
+
+    def fee_rates(self, symbols=None):
+        """
+        :return:    fee rate structures of the symbols, every known symbol by default
+        """
+        symbols = self.rates.keys() if symbols is None else symbols
+        result = []
+        for symbol in symbols:
+            maker, taker = self._rates(symbol)
+            result.append({'symbol': symbol, 'maker': maker, 'taker': taker})
+        return result
+
+    def expected_fees(self, orders):
+        """
+        Expected fee of each planned order in one pass
+
+        :param orders:  list of {'symbol': ..., 'amount': ..., 'price': ..., 'takerOrMaker': 'maker' or 'taker'},
+                        takerOrMaker defaults to 'taker'
+        :return:        list of Decimal fees in quote currency, in the order of orders
+        """
+        rates = self.rates
+        default = self.default
+        result = []
+        for order in orders:
+            maker, taker = rates.get(order['symbol']) or default or self._rates(order['symbol'])
+            rate = maker if order.get('takerOrMaker') == 'maker' else taker
+            result.append(to_decimal(order['amount']) * to_decimal(order['price']) * rate)
+        return result
+
+    def total_expected_fee(self, orders):
+        return sum(self.expected_fees(orders), Decimal(0))
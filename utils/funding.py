@@ -0,0 +1,57 @@
+import bisect
+
+
+class FundingRateStore:
+    """
+    In-memory funding rate history, indexed by symbol and funding time
+    """
+
+    # funding fee records are stamped a little after the funding time
+    TOLERANCE = 60 * 1000
+
+    def __init__(self):
+        self.times = {}
+        self.rates = {}
+
+    def add(self, symbol, funding_time, rate):
+        times = self.times.setdefault(symbol, [])
+        rates = self.rates.setdefault(symbol, [])
+        index = bisect.bisect_left(times, funding_time)
+        if index < len(times) and times[index] == funding_time:
+            rates[index] = rate
+            return
+        times.insert(index, funding_time)
+        rates.insert(index, rate)
+
+    def first_time(self, symbol):
+        times = self.times.get(symbol)
+        return times[0] if times else None
+
+    def last_time(self, symbol):
+        times = self.times.get(symbol)
+        return times[-1] if times else None
+
+    def covers(self, symbol, since):
+        first_time = self.first_time(symbol)
+        return first_time is not None and first_time <= since
+
+    def rate_at(self, symbol, time):
+        """
+        :return:    the funding rate applied at `time`, or None if it is not known
+        """
+        times = self.times.get(symbol)
+        if not times:
+            return None
+        index = bisect.bisect_right(times, time + self.TOLERANCE) - 1
+        if index < 0 or time - times[index] > self.TOLERANCE:
+            return None
+        return self.rates[symbol][index]
+
+    def history(self, symbol, since=None, until=None):
+        """
+        :return:    list of (funding time, rate) in [since, until)
+        """
+        times = self.times.get(symbol, [])
+        low = 0 if since is None else bisect.bisect_left(times, since)
+        high = len(times) if until is None else bisect.bisect_left(times, until)
+        return list(zip(times[low:high], self.rates[symbol][low:high])) if times else []
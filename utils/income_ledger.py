@@ -0,0 +1,117 @@
+import bisect
+from collections import defaultdict
+from decimal import Decimal
+
+from utils.positions import to_decimal
+
+DAY = 24 * 60 * 60 * 1000
+ZERO = Decimal(0)
+
+
+class IncomeLedger:
+    """
+    Local ledger of the incomes of one tenant, as parsed by `parse_swap_income`
+
+    Rows are synced incrementally from `fetch_incomes` and deduplicated by (tranId, incomeType).
+    Running aggregates by (UTC day, incomeType, symbol, asset) are updated for new rows only, so totals
+    over any time range are answered from whole-day buckets plus the rows of the partial days at its edges.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.times = []
+        self.rows = []
+        self.daily = defaultdict(lambda: ZERO)
+        self.last_time = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, incomes):
+        """
+        :param incomes:     list of parsed incomes, in any order, duplicates are skipped
+        :return:            number of new rows
+        """
+        added = 0
+        for income in incomes:
+            key = (income['tranId'], income['incomeType'])
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            time = int(income['time'])
+            row = (time, income['incomeType'], income['symbol'], income['asset'], to_decimal(income['income']))
+            index = bisect.bisect_right(self.times, time)
+            self.times.insert(index, time)
+            self.rows.insert(index, row)
+            self.daily[(time // DAY,) + row[1:4]] += row[4]
+            if self.last_time is None or time > self.last_time:
+                self.last_time = time
+            added += 1
+        return added
+
+    async def sync(self, api, symbol=None, limit=1000, params=None):
+        """
+        Fetch the incomes newer than the last synced one
+
+        :param api:     SwapApi instance
+        :return:        number of new rows
+        """
+        added = 0
+        while True:
+            since = self.last_time
+            incomes = await api.fetch_incomes(symbol, since=since, limit=limit, params=dict(params or {}))
+            added += self.add(incomes)
+            # startTime is inclusive, a full page of the same millisecond would never advance
+            if len(incomes) < limit or self.last_time == since:
+                return added
+
+    @staticmethod
+    def _matches(key, incomeType, symbol, asset):
+        return (incomeType is None or key[0] == incomeType) and \
+               (symbol is None or key[1] == symbol) and \
+               (asset is None or key[2] == asset)
+
+    def _aggregate(self, group, start=None, end=None, incomeType=None, symbol=None, asset=None):
+        """
+        Sum incomes in [start, end) grouped by group(day, incomeType, symbol, asset)
+        """
+        result = defaultdict(lambda: ZERO)
+        first_day = None if start is None else -(-start // DAY)
+        last_day = None if end is None else end // DAY
+        for (day, *key), amount in self.daily.items():
+            if (first_day is None or day >= first_day) and (last_day is None or day < last_day) and \
+                    self._matches(key, incomeType, symbol, asset):
+                result[group(day, *key)] += amount
+        # partial days at the edges
+        edges = []
+        if start is not None and start % DAY:
+            edges.append((start, min(first_day * DAY, end if end is not None else first_day * DAY)))
+        if end is not None and end % DAY and (start is None or last_day * DAY >= start):
+            edges.append((max(last_day * DAY, start if start is not None else last_day * DAY), end))
+        for edge_start, edge_end in edges:
+            if edge_start >= edge_end:
+                continue
+            low = bisect.bisect_left(self.times, edge_start)
+            high = bisect.bisect_left(self.times, edge_end)
+            for time, *key, amount in self.rows[low:high]:
+                if self._matches(key, incomeType, symbol, asset):
+                    result[group(time // DAY, *key)] += amount
+        return dict(result)
+
+    def total(self, start=None, end=None, incomeType=None, symbol=None, asset=None):
+        """
+        Total income in [start, end), times in milliseconds
+        """
+        return self._aggregate(lambda *key: None, start, end, incomeType, symbol, asset).get(None, ZERO)
+
+    def totals_by_type(self, start=None, end=None, symbol=None, asset=None):
+        return self._aggregate(lambda day, incomeType, *_: incomeType, start, end, None, symbol, asset)
+
+    def totals_by_symbol(self, start=None, end=None, incomeType=None, asset=None):
+        return self._aggregate(lambda day, _, symbol, *__: symbol, start, end, incomeType, None, asset)
+
+    def totals_by_day(self, start=None, end=None, incomeType=None, symbol=None, asset=None):
+        """
+        :return:    {day start timestamp in milliseconds: total}
+        """
+        return self._aggregate(lambda day, *_: day * DAY, start, end, incomeType, symbol, asset)
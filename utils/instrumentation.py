@@ -0,0 +1,286 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from spot_api import SpotApi
+from swap_api import SwapApi
+
+Span = namedtuple('Span', ['stage', 'name', 'start', 'end', 'attributes', 'error', 'parent'])
+Span.__doc__ = """
+A timed call, handed to the span callbacks when it ends
+
+:param stage:       'method', 'queue', 'sign', 'network', 'decode' or 'parse'
+:param name:        method name, or 'GET /fapi/v1/order' for the network stage
+:param start:       wall clock in nanoseconds
+:param end:         wall clock in nanoseconds
+:param error:       the exception raised, None on success
+:param parent:      the enclosing Span's (stage, name), None at the top
+"""
+
+# stage of the internal methods, every SpotApi / SwapApi method is a 'method' and every parse_* a 'parse'
+STAGES = {
+    'throttle': 'queue',
+    'sign': 'sign',
+    'fetch': 'network',
+    'fetch_stream': 'network',
+    'parse_json': 'decode',
+    'unjson': 'decode',
+}
+
+_current = contextvars.ContextVar('instrumentation_span', default=None)
+
+
+class Histogram:
+    """
+    Log-linear histogram of integers in the manner of HdrHistogram
+
+    Values below 2 * 2^precision are counted exactly, larger ones within 1 / 2^precision of their value.
+    """
+
+    def __init__(self, precision=7):
+        self.precision = precision
+        self.sub = 1 << precision
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < 2 * self.sub:
+            return value
+        shift = value.bit_length() - self.precision - 1
+        return (shift + 1) * self.sub + (value >> shift) - self.sub
+
+    def _value(self, index):
+        # highest value counted in the bucket
+        if index < 2 * self.sub:
+            return index
+        shift = index // self.sub - 1
+        return ((index - shift * self.sub + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percentile):
+        """
+        :param percentile:  0 - 100
+        :return:            the value at or below which `percentile` percent of the values are, None if empty
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+
+class Instrumentation:
+    """
+    Latency histograms, counters and span callbacks around the SpotApi / SwapApi methods and the
+    queue (rate limit), sign, network, decode and parse stages of each request
+
+    Nothing is wrapped until `attach` is called, so an API without instrumentation pays nothing.
+    Durations are in microseconds. The network stage of a regular request includes its decoding,
+    which is also reported on its own.
+
+    example:
+        instrumentation = Instrumentation(span_callbacks=[print])
+        instrumentation.attach(api)
+        await api.create_order(...)
+        print(instrumentation.snapshot()['sign'])
+    """
+
+    def __init__(self, span_callbacks=None, precision=7):
+        """
+        :param span_callbacks:  callables taking a Span, see `opentelemetry_callback`
+        :param precision:       of the histograms, see Histogram
+        """
+        self.span_callbacks = list(span_callbacks or [])
+        self.precision = precision
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, stage, name):
+        histogram = self.histograms.get((stage, name))
+        if histogram is None:
+            histogram = self.histograms[(stage, name)] = Histogram(self.precision)
+        return histogram
+
+    def count(self, counter, amount=1):
+        """
+        :param counter:     tuple, eg. ('errors', 'method', 'create_order', 'InvalidOrder')
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+
+    @staticmethod
+    def methods_of(api):
+        """
+        :return:    {attribute name: stage} of everything `attach` wraps
+        """
+        names = {}
+        for base in (SpotApi, SwapApi):
+            if isinstance(api, base):
+                names.update((name, 'method') for name in vars(base) if not name.startswith('_'))
+        for name in dir(type(api)):
+            if name.startswith('parse_'):
+                names[name] = 'parse'
+        names.update(STAGES)
+        return {name: stage for name, stage in names.items() if callable(getattr(type(api), name, None))}
+
+    def attach(self, api):
+        """
+        Wrap the methods of `api`, on this instance only
+        """
+        if '_instrumentation' in vars(api):
+            raise ValueError('api is already instrumented')
+        api._instrumentation = self
+        for name, stage in self.methods_of(api).items():
+            setattr(api, name, self._wrap(stage, name, getattr(api, name)))
+
+    def detach(self, api):
+        if vars(api).pop('_instrumentation', None) is not self:
+            return
+        for name in self.methods_of(api):
+            vars(api).pop(name, None)
+
+    def _label(self, stage, name, args, kwargs):
+        if stage == 'network':
+            url = args[0] if args else kwargs.get('url')
+            method = args[1] if len(args) > 1 else kwargs.get('method', 'GET')
+            return f'{method} {urlsplit(url).path}'
+        return name
+
+    def _begin(self, stage, label):
+        if not self.span_callbacks:
+            return None, None
+        span = (stage, label)
+        return time.time_ns(), _current.set(span)
+
+    def _end(self, stage, label, elapsed, wall, token, error):
+        self.histogram(stage, label).record(elapsed // 1000)
+        if error is not None:
+            self.count(('errors', stage, label, type(error).__name__))
+        if token is None:
+            return
+        _current.reset(token)
+        span = Span(stage, label, wall, wall + elapsed, {}, error, _current.get())
+        for callback in self.span_callbacks:
+            callback(span)
+
+    def _wrap(self, stage, name, method):
+        if inspect.isasyncgenfunction(method):
+            @functools.wraps(method)
+            async def wrapper(*args, **kwargs):
+                label = self._label(stage, name, args, kwargs)
+                wall, token = self._begin(stage, label)
+                started = time.perf_counter_ns()
+                error = None
+                try:
+                    async for item in method(*args, **kwargs):
+                        yield item
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    self._end(stage, label, time.perf_counter_ns() - started, wall, token, error)
+        elif asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(*args, **kwargs):
+                label = self._label(stage, name, args, kwargs)
+                wall, token = self._begin(stage, label)
+                started = time.perf_counter_ns()
+                error = None
+                try:
+                    return await method(*args, **kwargs)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    self._end(stage, label, time.perf_counter_ns() - started, wall, token, error)
+        else:
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                label = self._label(stage, name, args, kwargs)
+                wall, token = self._begin(stage, label)
+                started = time.perf_counter_ns()
+                error = None
+                try:
+                    return method(*args, **kwargs)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    self._end(stage, label, time.perf_counter_ns() - started, wall, token, error)
+        return wrapper
+
+    def snapshot(self, percentiles=(50, 90, 99, 99.9)):
+        """
+        :return:    {stage: {name: {'count', 'errors', 'min', 'max', 'mean', 'p50', ...}}}, durations in microseconds
+        """
+        errors = {}
+        for counter, amount in self.counters.items():
+            if counter[0] == 'errors':
+                errors[counter[1:3]] = errors.get(counter[1:3], 0) + amount
+        result = {}
+        for (stage, name), histogram in self.histograms.items():
+            stats = {
+                'count': histogram.count,
+                'errors': errors.get((stage, name), 0),
+                'min': histogram.min,
+                'max': histogram.max,
+                'mean': histogram.mean,
+            }
+            for percentile in percentiles:
+                stats[f'p{percentile:g}'] = histogram.percentile(percentile)
+            result.setdefault(stage, {})[name] = stats
+        return result
+
+
+def opentelemetry_callback(tracer):
+    """
+    Span callback recording into an OpenTelemetry tracer, eg. opentelemetry.trace.get_tracer(__name__)
+
+    Spans are reported when they end, so they are recorded flat with the parent as an attribute.
+    """
+    def callback(span):
+        attributes = dict(span.attributes, stage=span.stage)
+        if span.parent is not None:
+            attributes['parent'] = ' '.join(span.parent)
+        recorded = tracer.start_span(f'{span.stage} {span.name}', start_time=span.start, attributes=attributes)
+        if span.error is not None:
+            recorded.record_exception(span.error)
+        recorded.end(end_time=span.end)
+    return callback
@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+from utils.positions import to_decimal, PositionEngine
+
+ZERO = Decimal(0)
+
+
+class MarginCalculator:
+    """
+    Isolated margin calculations for one symbol, backed by its leverage bracket tiers
+
+    Each bracket is a dict with Decimal 'notionalFloor', 'notionalCap', 'maintMarginRatio', 'cum'
+    (maintenance amount) and int 'initialLeverage', ordered by notionalFloor.
+    """
+
+    def __init__(self, brackets):
+        self.brackets = sorted(brackets, key=lambda bracket: bracket['notionalFloor'])
+
+    @classmethod
+    def from_market(cls, market):
+        """
+        Single tier calculator from the maintMarginPercent of a market, for when brackets are not loaded
+        """
+        return cls([{
+            'notionalFloor': ZERO,
+            'notionalCap': None,
+            'maintMarginRatio': to_decimal(market['maintMarginPercent']) / 100,
+            'cum': ZERO,
+            'initialLeverage': None,
+        }])
+
+    def bracket(self, notional):
+        notional = abs(notional)
+        for bracket in self.brackets:
+            if bracket['notionalCap'] is None or notional < bracket['notionalCap']:
+                return bracket
+        return self.brackets[-1]
+
+    def maintenance_margin(self, notional):
+        bracket = self.bracket(notional)
+        return abs(notional) * bracket['maintMarginRatio'] - bracket['cum']
+
+    def max_notional(self, leverage):
+        """
+        Max position value which can be opened with the leverage
+        """
+        result = None
+        for bracket in self.brackets:
+            if bracket['initialLeverage'] is None or bracket['initialLeverage'] >= leverage:
+                result = bracket['notionalCap']
+        return result
+
+    def max_leverage(self, notional):
+        return self.bracket(notional)['initialLeverage']
+
+    def liquidation_price(self, amount, entry_price, margin, position_side=None):
+        """
+        Liquidation price of an isolated position
+
+        :param amount:          position amount, negative for short in one-way mode
+        :param entry_price:     average open price
+        :param margin:          isolated wallet balance of the position
+        :param position_side:   'long', 'short' or 'both'
+        :return:                Decimal price, None for an empty position, 0 if it can not be liquidated
+        """
+        amount = to_decimal(amount)
+        if not amount:
+            return None
+        entry_price = to_decimal(entry_price)
+        margin = to_decimal(margin)
+        side = PositionEngine.direction(position_side, amount)
+        size = abs(amount)
+        # the bracket depends on the notional at liquidation, which is close to the entry notional
+        bracket = self.bracket(size * entry_price)
+        price = (margin + bracket['cum'] - side * size * entry_price) / (size * bracket['maintMarginRatio'] - side * size)
+        bracket_at_price = self.bracket(size * price)
+        if bracket_at_price is not bracket:
+            price = (margin + bracket_at_price['cum'] - side * size * entry_price) / (
+                size * bracket_at_price['maintMarginRatio'] - side * size)
+        return max(price, ZERO)
+
+    def what_if_order(self, position, side, amount, price, leverage=None):
+        """
+        Position after a hypothetical fill
+
+        :param position:    dict with 'position', 'openPrice', 'initMargin', 'leverage' and 'positionSide',
+                            eg. from `fetch_positions`, None for a new position
+        :param side:        'buy' or 'sell'
+        :param amount:      order amount
+        :param price:       expected fill price
+        :param leverage:    leverage for a new position, defaults to the position's
+        :return:            dict with the new 'position', 'openPrice', 'initMargin', 'maintMargin',
+                            'liquidatePrice' and 'exceedsMaxNotional'
+        """
+        position = position or {}
+        position_side = position.get('positionSide')
+        current = to_decimal(position.get('position'))
+        current = abs(current) * PositionEngine.direction(position_side, current)
+        entry_price = to_decimal(position.get('openPrice'))
+        margin = to_decimal(position.get('initMargin'))
+        leverage = int(leverage or position.get('leverage') or 1)
+        amount = to_decimal(amount)
+        price = to_decimal(price)
+        delta = amount if side.lower() == 'buy' else -amount
+
+        new_amount = current + delta
+        if current == 0 or (current > 0) == (delta > 0):
+            new_entry = (abs(current) * entry_price + amount * price) / abs(new_amount)
+            margin += amount * price / leverage
+        elif new_amount == 0 or (new_amount > 0) == (current > 0):
+            new_entry = entry_price if new_amount else ZERO
+            margin = margin * abs(new_amount) / abs(current)
+        else:
+            new_entry = price
+            margin = abs(new_amount) * price / leverage
+
+        notional = abs(new_amount) * new_entry
+        max_notional = self.max_notional(leverage)
+        return {
+            'position': new_amount,
+            'openPrice': new_entry,
+            'initMargin': margin,
+            'maintMargin': self.maintenance_margin(notional) if new_amount else ZERO,
+            'liquidatePrice': self.liquidation_price(new_amount, new_entry, margin, position_side),
+            'exceedsMaxNotional': max_notional is not None and notional > max_notional,
+        }
+
+    def what_if_margin(self, position, direction, amount):
+        """
+        Liquidation price after `change_isolated_margin`
+
+        :param direction:   'asc' to add margin or 'desc' to reduce it
+        """
+        amount = to_decimal(amount)
+        margin = to_decimal(position.get('initMargin'))
+        margin = margin + amount if direction.lower() == 'asc' else margin - amount
+        return self.liquidation_price(position.get('position'), position.get('openPrice'), margin,
+                                      position.get('positionSide'))
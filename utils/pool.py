@@ -0,0 +1,125 @@
+import asyncio
+import collections
+import itertools
+
+from ccxt_ext.ccxt_ext import tenant_key
+from utils.rate_limit import TokenBucket
+
+
+class _TenantLimits:
+
+    def __init__(self, concurrency, rate):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate)
+        # calls waiting or in flight, the limits of a tenant are only dropped when there are none
+        self.calls = 0
+
+
+class ApiPool:
+    """
+    Pool of warm, tenant agnostic API instances of one exchange class
+
+    The instances never hold user keys. Credentials of the tenant are passed with each call and go
+    into the `params` of the API method, see CCXTExtension.split_credentials.
+    Calls of a tenant are limited to `tenant_concurrency` in flight and `tenant_rate` per second.
+    Tenants are keyed by the digest of their api key, the limits of at most `max_tenants` of them are kept
+    and the least recently used idle ones are dropped first.
+
+    example:
+        pool = ApiPool(BinanceSwap, size=2)
+        orders = await pool.call({'apiKey': ..., 'secret': ...}, 'fetch_open_orders', 'BTC/USDT')
+    """
+
+    def __init__(self, exchange_class, config=None, size=1, tenant_concurrency=4, tenant_rate=10, max_tenants=10000):
+        self.exchange_class = exchange_class
+        self.config = config or {}
+        self.size = size
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_rate = tenant_rate
+        self.max_tenants = max_tenants
+        self.instances = []
+        self._next = None
+        # tenant: _TenantLimits, least recently used first
+        self._tenants = collections.OrderedDict()
+        self._warm_up = None
+
+    async def warm_up(self):
+        """
+        Create the instances and load markets once for all of them
+        """
+        if self._warm_up is None:
+            self._warm_up = asyncio.ensure_future(self._create_instances())
+        await asyncio.shield(self._warm_up)
+
+    async def _create_instances(self):
+        first = self.exchange_class(dict(self.config))
+        try:
+            await first.load_markets()
+        except BaseException:
+            await first.close()
+            self._warm_up = None
+            raise
+        self.instances.append(first)
+        self.set_markets(first.markets, first.currencies)
+
+    def set_markets(self, markets, currencies=None):
+        """
+        Fill the pool with instances using markets loaded elsewhere, eg. in another process
+        """
+        while len(self.instances) < self.size:
+            self.instances.append(self.exchange_class(dict(self.config)))
+        for instance in self.instances:
+            if instance.markets is not markets:
+                instance.set_markets(markets, currencies)
+        self._next = itertools.cycle(self.instances)
+        if self._warm_up is None:
+            self._warm_up = asyncio.get_event_loop().create_future()
+            self._warm_up.set_result(None)
+
+    def instance(self):
+        return next(self._next)
+
+    def _limits(self, tenant):
+        limits = self._tenants.get(tenant)
+        if limits is None:
+            limits = self._tenants[tenant] = _TenantLimits(self.tenant_concurrency, self.tenant_rate)
+            self._evict()
+        else:
+            self._tenants.move_to_end(tenant)
+        return limits
+
+    def _evict(self):
+        excess = len(self._tenants) - self.max_tenants
+        if excess <= 0:
+            return
+        idle = []
+        for tenant, limits in self._tenants.items():
+            if len(idle) >= excess:
+                break
+            if not limits.calls:
+                idle.append(tenant)
+        for tenant in idle:
+            del self._tenants[tenant]
+
+    async def call(self, credentials, method, *args, **kwargs):
+        """
+        :param credentials:     {'apiKey': ..., 'secret': ...} of the tenant, None for public calls
+        :param method:          name of the SpotApi / SwapApi method
+        :return:                result of the method
+        """
+        await self.warm_up()
+        limits = self._limits(tenant_key(credentials))
+        if credentials:
+            kwargs['params'] = dict(kwargs.get('params') or {}, **credentials)
+        limits.calls += 1
+        try:
+            async with limits.semaphore:
+                await limits.bucket.acquire()
+                return await getattr(self.instance(), method)(*args, **kwargs)
+        finally:
+            limits.calls -= 1
+
+    async def close(self):
+        await asyncio.gather(*[instance.close() for instance in self.instances])
+        self.instances = []
+        self._warm_up = None
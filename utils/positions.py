@@ -0,0 +1,230 @@
+from decimal import Decimal
+
+ZERO = Decimal(0)
+
+
+def to_decimal(value, default=ZERO):
+    if value is None or value == '':
+        return default
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class PositionEngine:
+    """
+    Local mark-to-market of swap positions
+
+    Positions are loaded once from `fetch_positions`, kept up to date with fills from `fetch_my_trades`
+    or the user stream, and revalued from streamed mark prices. REST is only needed to reconcile.
+
+    State is kept column-wise, one row per (tenant, symbol, positionSide), and rows are grouped by symbol
+    so that one mark price update revalues every position of the symbol in a single pass. Values stay
+    Decimal like everywhere else in the API, so instead of a numpy pass the cost and initial margin of a
+    row are precomputed on fills, leaving a tick a few multiplications per row.
+    """
+
+    def __init__(self, maint_margin_rates=None, symbol_configs=None):
+        """
+        :param maint_margin_rates:  {symbol: maintenance margin rate}, eg. from the markets' maintMarginPercent / 100
+        :param symbol_configs:      the `symbol_configs` of the API, leverage and margin type of positions opened
+                                    by fills, tenants must then be given as `tenant_key`
+        """
+        self.maint_margin_rates = maint_margin_rates or {}
+        self.symbol_configs = symbol_configs
+        self.rows = {}
+        self.rows_by_symbol = {}
+        self.mark_prices = {}
+        # columns
+        self.keys = []
+        self.amount = []
+        self.entry_price = []
+        self.leverage = []
+        self.isolated_margin = []
+        self.realized_pnl = []
+        # amount * entry price and the initial margin, they only change with fills
+        self.cost = []
+        self.initial_margin = []
+        self.unrealized_pnl = []
+        self.margin_ratio = []
+        self.roe = []
+
+    @staticmethod
+    def direction(position_side, amount):
+        if position_side == 'long':
+            return 1
+        if position_side == 'short':
+            return -1
+        return -1 if amount < 0 else 1
+
+    def _row(self, tenant, symbol, position_side):
+        key = (tenant, symbol, position_side or 'both')
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            self.rows[key] = row
+            self.rows_by_symbol.setdefault(symbol, []).append(row)
+            self.keys.append(key)
+            self.amount.append(ZERO)
+            self.entry_price.append(ZERO)
+            self.leverage.append(None)
+            self.isolated_margin.append(None)
+            self.realized_pnl.append(ZERO)
+            self.cost.append(ZERO)
+            self.initial_margin.append(None)
+            self.unrealized_pnl.append(ZERO)
+            self.margin_ratio.append(None)
+            self.roe.append(None)
+        return row
+
+    def _refresh(self, row):
+        amount = self.amount[row]
+        self.cost[row] = amount * self.entry_price[row]
+        initial_margin = self.isolated_margin[row]
+        if initial_margin is None and self.leverage[row]:
+            initial_margin = abs(self.cost[row]) / self.leverage[row]
+        self.initial_margin[row] = initial_margin
+
+    def _configure(self, row):
+        # a position opened by a fill takes the leverage and margin type set for the symbol
+        if self.symbol_configs is None:
+            return
+        tenant, symbol, _ = self.keys[row]
+        leverage = self.symbol_configs.peek((tenant, symbol, 'leverage'))
+        if leverage is not None:
+            self.leverage[row] = leverage
+        margin_type = self.symbol_configs.peek((tenant, symbol, 'marginType'))
+        if margin_type is not None:
+            self.isolated_margin[row] = ZERO if margin_type == 'ISOLATED' else None
+
+    def load(self, positions, tenant=None):
+        """
+        Load or reconcile positions parsed by `parse_swap_position`
+
+        :return:    list of (key, local amount, exchange amount) for rows which had drifted
+        """
+        drifts = []
+        symbols = set()
+        for position in positions:
+            key = (tenant, position['symbol'], position.get('positionSide') or 'both')
+            known = key in self.rows
+            row = self._row(*key)
+            amount = to_decimal(position.get('position'))
+            # hedge mode reports short positions as negative amounts
+            amount = abs(amount) * self.direction(position.get('positionSide'), amount)
+            if known and self.amount[row] != amount:
+                drifts.append((self.keys[row], self.amount[row], amount))
+            self.amount[row] = amount
+            self.entry_price[row] = to_decimal(position.get('openPrice'))
+            self.leverage[row] = position.get('leverage')
+            if position.get('marginType') == 'isolated':
+                self.isolated_margin[row] = to_decimal(position.get('initMargin'))
+            else:
+                self.isolated_margin[row] = None
+            self._refresh(row)
+            mark_price = position.get('markPrice')
+            if mark_price is not None and position['symbol'] not in self.mark_prices:
+                self.mark_prices[position['symbol']] = to_decimal(mark_price)
+            symbols.add(position['symbol'])
+        for symbol in symbols:
+            self.revalue(symbol)
+        return drifts
+
+    def apply_trade(self, trade, tenant=None):
+        """
+        Apply a fill parsed by `parse_swap_trade`
+        """
+        symbol = trade['symbol']
+        row = self._row(tenant, symbol, trade.get('positionSide'))
+        side = trade['side'].lower()
+        quantity = to_decimal(trade['amount'])
+        delta = quantity if side == 'buy' else -quantity
+        price = to_decimal(trade['price'])
+        amount = self.amount[row]
+        entry_price = self.entry_price[row]
+        if amount == 0:
+            self._configure(row)
+        if amount == 0 or (amount > 0) == (delta > 0):
+            # opening or adding, average the entry price
+            new_amount = amount + delta
+            self.entry_price[row] = (abs(amount) * entry_price + quantity * price) / abs(new_amount)
+            if self.isolated_margin[row] is not None and self.leverage[row]:
+                self.isolated_margin[row] += quantity * price / self.leverage[row]
+        else:
+            closed = min(abs(delta), abs(amount))
+            sign = 1 if amount > 0 else -1
+            self.realized_pnl[row] += closed * (price - entry_price) * sign
+            new_amount = amount + delta
+            if new_amount == 0:
+                self.entry_price[row] = ZERO
+            if self.isolated_margin[row] is not None:
+                self.isolated_margin[row] = self.isolated_margin[row] * abs(new_amount) / abs(amount)
+            if new_amount != 0 and (new_amount > 0) != (amount > 0):
+                # flipped, the rest opens at the trade price
+                self.entry_price[row] = price
+                if self.isolated_margin[row] is not None and self.leverage[row]:
+                    self.isolated_margin[row] = abs(new_amount) * price / self.leverage[row]
+        self.amount[row] = new_amount
+        self._refresh(row)
+        self.revalue(symbol)
+
+    def update_mark_price(self, symbol, mark_price):
+        self.mark_prices[symbol] = to_decimal(mark_price)
+        self.revalue(symbol)
+
+    def update_mark_prices(self, mark_prices):
+        """
+        :param mark_prices:     {symbol: mark price}, eg. one tick of the mark price stream
+        """
+        for symbol, mark_price in mark_prices.items():
+            self.update_mark_price(symbol, mark_price)
+
+    def revalue(self, symbol):
+        mark_price = self.mark_prices.get(symbol)
+        rows = self.rows_by_symbol.get(symbol)
+        if mark_price is None or not rows:
+            return
+        maint_rate = self.maint_margin_rates.get(symbol)
+        amount = self.amount
+        cost = self.cost
+        initial_margin = self.initial_margin
+        isolated_margin = self.isolated_margin
+        unrealized_pnl = self.unrealized_pnl
+        margin_ratio = self.margin_ratio
+        roe = self.roe
+        for row in rows:
+            pnl = amount[row] * mark_price - cost[row]
+            unrealized_pnl[row] = pnl
+            roe[row] = pnl / initial_margin[row] if initial_margin[row] else None
+            isolated = isolated_margin[row]
+            margin_balance = isolated + pnl if isolated is not None else None
+            if maint_rate is not None and margin_balance:
+                margin_ratio[row] = abs(amount[row]) * mark_price * maint_rate / margin_balance
+            else:
+                margin_ratio[row] = None
+
+    def position(self, symbol, position_side=None, tenant=None):
+        row = self.rows.get((tenant, symbol, position_side or 'both'))
+        if row is None:
+            return None
+        return self._to_position(row)
+
+    def positions(self, tenant=None, symbol=None):
+        rows = self.rows_by_symbol.get(symbol, []) if symbol is not None else range(len(self.keys))
+        return [self._to_position(row) for row in rows if self.keys[row][0] == tenant and self.amount[row]]
+
+    def _to_position(self, row):
+        tenant, symbol, position_side = self.keys[row]
+        return {
+            'symbol': symbol,
+            'position': self.amount[row],
+            'openPrice': self.entry_price[row],
+            'markPrice': self.mark_prices.get(symbol),
+            'unrealizedProfit': self.unrealized_pnl[row],
+            'realizedProfit': self.realized_pnl[row],
+            'leverage': self.leverage[row],
+            'marginType': 'isolated' if self.isolated_margin[row] is not None else 'cross',
+            'initMargin': self.initial_margin[row] if self.initial_margin[row] is not None else ZERO,
+            'marginRatio': self.margin_ratio[row],
+            'roe': self.roe[row],
+            'positionSide': position_side,
+            'info': None,
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import Counter, deque
+
+# headers in which binance reports the weight used by the ip
+USED_WEIGHT_HEADERS = ('X-MBX-USED-WEIGHT-1M', 'X-MBX-USED-WEIGHT')
+RATE_LIMITED = 429
+BANNED = 418
+
+
+class RequestAccounting:
+    """
+    Requests and weight by tenant and endpoint, rate limit rejections and the used weight reported by
+    the exchange, shared by the API instances given it as 'accounting' in their config
+
+    Tenants are the digests of CCXTExtension.tenant_key, endpoints are 'GET fapiPrivate/order'.
+
+    example:
+        accounting = RequestAccounting()
+        pool = ApiPool(BinanceSwap, {'accounting': accounting})
+        accounting.start_snapshots(60, lambda snapshot: logging.info(snapshot))
+        ...
+        for tenant, weight in accounting.top('tenant'):
+            ...
+    """
+
+    def __init__(self, window=60, max_rejections=1000, clock=time.time):
+        """
+        :param window:          seconds of the moving window of `window_weight` and `top`,
+                                binance weight limits are per minute
+        :param max_rejections:  429 / 418 responses kept for `rejections`
+        """
+        self.window = window
+        self.clock = clock
+        self.started = clock()
+        self.totals = {}
+        self.statuses = Counter()
+        self.rejections = deque(maxlen=max_rejections)
+        self.used_weight = {}
+        self._recent = deque()
+        self._window_tenants = Counter()
+        self._window_endpoints = Counter()
+        self._snapshots = None
+
+    def record(self, tenant, endpoint, weight, status, headers=None, host=None):
+        """
+        :param status:  http status, None if the request got no response
+        :param headers: response headers, for the used weight
+        """
+        now = self.clock()
+        totals = self.totals.get((tenant, endpoint))
+        if totals is None:
+            totals = self.totals[(tenant, endpoint)] = {'requests': 0, 'weight': 0, 'errors': 0, 'rejected': 0}
+        totals['requests'] += 1
+        totals['weight'] += weight
+        if status is None or status >= 400:
+            totals['errors'] += 1
+        if status in (RATE_LIMITED, BANNED):
+            totals['rejected'] += 1
+            self.rejections.append({'time': now, 'status': status, 'tenant': tenant, 'endpoint': endpoint,
+                                    'retryAfter': headers and headers.get('Retry-After')})
+        self.statuses[status] += 1
+        for header in USED_WEIGHT_HEADERS:
+            value = headers and headers.get(header)
+            if value is not None:
+                self.used_weight[host] = {'time': now, 'weight': int(value)}
+                break
+        self._recent.append((now, tenant, endpoint, weight))
+        self._window_tenants[tenant] += weight
+        self._window_endpoints[endpoint] += weight
+        self._expire(now)
+
+    def _expire(self, now):
+        limit = now - self.window
+        recent = self._recent
+        while recent and recent[0][0] < limit:
+            _, tenant, endpoint, weight = recent.popleft()
+            self._window_tenants[tenant] -= weight
+            if not self._window_tenants[tenant]:
+                del self._window_tenants[tenant]
+            self._window_endpoints[endpoint] -= weight
+            if not self._window_endpoints[endpoint]:
+                del self._window_endpoints[endpoint]
+
+    def window_weight(self, tenant=None):
+        """
+        :return:    weight sent in the last `window` seconds, by the tenant or in total
+        """
+        self._expire(self.clock())
+        if tenant is not None:
+            return self._window_tenants.get(tenant, 0)
+        return sum(self._window_tenants.values())
+
+    def top(self, by='tenant', n=10):
+        """
+        :param by:  'tenant' or 'endpoint'
+        :return:    list of (tenant or endpoint, weight in the last `window` seconds), heaviest first
+        """
+        self._expire(self.clock())
+        counter = self._window_tenants if by == 'tenant' else self._window_endpoints
+        return counter.most_common(n)
+
+    def snapshot(self):
+        now = self.clock()
+        self._expire(now)
+        tenants = {}
+        for (tenant, endpoint), totals in self.totals.items():
+            summary = tenants.get(tenant)
+            if summary is None:
+                summary = tenants[tenant] = {'requests': 0, 'weight': 0, 'errors': 0, 'rejected': 0, 'endpoints': {}}
+            for key, value in totals.items():
+                summary[key] += value
+            summary['endpoints'][endpoint] = dict(totals)
+        return {
+            'time': now,
+            'since': self.started,
+            'requests': sum(self.statuses.values()),
+            'weight': sum(totals['weight'] for totals in self.totals.values()),
+            'statuses': dict(self.statuses),
+            'rateLimited': self.statuses.get(RATE_LIMITED, 0),
+            'banned': self.statuses.get(BANNED, 0),
+            'lastRejection': self.rejections[-1] if self.rejections else None,
+            'usedWeight': {host: dict(value) for host, value in self.used_weight.items()},
+            'windowWeight': dict(self._window_tenants),
+            'tenants': tenants,
+        }
+
+    def reset(self):
+        """
+        Forget everything recorded so far, the moving window and the used weight included
+        """
+        self.started = self.clock()
+        self.totals = {}
+        self.statuses = Counter()
+        self.rejections.clear()
+        self.used_weight = {}
+        self._recent.clear()
+        self._window_tenants = Counter()
+        self._window_endpoints = Counter()
+
+    def start_snapshots(self, interval, callback):
+        """
+        Hand a snapshot to `callback` every `interval` seconds until `stop_snapshots`
+        """
+        self.stop_snapshots()
+
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                callback(self.snapshot())
+
+        self._snapshots = asyncio.ensure_future(run())
+        return self._snapshots
+
+    def stop_snapshots(self):
+        if self._snapshots is not None:
+            self._snapshots.cancel()
+            self._snapshots = None
@@ -0,0 +1,279 @@
+import asyncio
+import itertools
+import multiprocessing
+import pickle
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+
+from ccxt.base.errors import RequestTimeout
+
+from ccxt_ext.ccxt_ext import tenant_key
+from ccxt_ext.errors import WorkerExitedError
+from utils.pool import ApiPool
+
+
+class SharedSnapshot:
+    """
+    A picklable value published into shared memory by one writer and read by many processes
+
+    Layout: 8 bytes sequence number, 8 bytes payload length, payload. The sequence number is odd while
+    a write is in progress, so readers retry instead of reading a torn value.
+    """
+
+    HEADER = struct.Struct('<QQ')
+
+    def __init__(self, name=None, capacity=None):
+        """
+        :param name:        attach to an existing snapshot, or create a new one when None
+        :param capacity:    bytes, required when creating
+        """
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=self.HEADER.size + capacity)
+            self.HEADER.pack_into(self.memory.buf, 0, 0, 0)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self._sequence = None
+        self._value = None
+
+    def publish(self, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.HEADER.size + len(payload) > self.memory.size:
+            raise ValueError(f'snapshot of {len(payload)} bytes exceeds the shared memory of {self.memory.size} bytes')
+        buffer = self.memory.buf
+        sequence, _ = self.HEADER.unpack_from(buffer, 0)
+        self.HEADER.pack_into(buffer, 0, sequence + 1, 0)
+        buffer[self.HEADER.size:self.HEADER.size + len(payload)] = payload
+        self.HEADER.pack_into(buffer, 0, sequence + 2, len(payload))
+
+    def read(self):
+        """
+        :return:    the latest published value, None if nothing was published yet.
+                    Unpickled again only when it changed.
+        """
+        buffer = self.memory.buf
+        while True:
+            sequence, length = self.HEADER.unpack_from(buffer, 0)
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            if sequence == self._sequence:
+                return self._value
+            if sequence == 0:
+                return None
+            payload = bytes(buffer[self.HEADER.size:self.HEADER.size + length])
+            if self.HEADER.unpack_from(buffer, 0)[0] != sequence:
+                continue
+            self._value = pickle.loads(payload)
+            self._sequence = sequence
+            return self._value
+
+    def close(self):
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+def _worker_main(exchange_class, config, pool_options, markets_name, books_name, book_max_age, requests, responses):
+    asyncio.run(_worker(exchange_class, config, pool_options, markets_name, books_name, book_max_age, requests, responses))
+
+
+async def _worker(exchange_class, config, pool_options, markets_name, books_name, book_max_age, requests, responses):
+    markets = SharedSnapshot(markets_name)
+    books = SharedSnapshot(books_name)
+    pool = ApiPool(exchange_class, config, **pool_options)
+    # markets come from shared memory instead of every worker loading them
+    snapshot = markets.read()
+    pool.set_markets(snapshot['markets'], snapshot['currencies'])
+    loop = asyncio.get_event_loop()
+    tasks = set()
+
+    async def handle(request_id, credentials, method, args, kwargs):
+        try:
+            if method == 'fetch_order_book':
+                book = (books.read() or {}).get(args[0] if args else kwargs.get('symbol'))
+                if book is not None and book.get('timestamp') and time.time() * 1000 - book['timestamp'] <= book_max_age:
+                    responses.put((request_id, book, None))
+                    return
+            result = await pool.call(credentials, method, *args, **kwargs)
+            responses.put((request_id, result, None))
+        except Exception as e:
+            responses.put((request_id, None, e))
+
+    try:
+        while True:
+            request = await loop.run_in_executor(None, requests.get)
+            if request is None:
+                break
+            task = asyncio.ensure_future(handle(*request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+    finally:
+        await pool.close()
+        markets.close()
+        books.close()
+
+
+class ShardSupervisor:
+    """
+    Shards tenants across worker processes, each running its own event loop and ApiPool
+
+    Markets are loaded once by the supervisor and published into shared memory, and so are the order
+    books given to `publish_order_books`. Calls of a tenant are always routed to the same worker.
+    A worker which exits is replaced, the calls it had in flight fail with WorkerExitedError since
+    they may or may not have reached the exchange.
+
+    example:
+        supervisor = ShardSupervisor(BinanceSwap, workers=4)
+        await supervisor.start()
+        order = await supervisor.call({'apiKey': ..., 'secret': ...}, 'fetch_order', id, 'BTC/USDT')
+        await supervisor.stop()
+    """
+
+    def __init__(self, exchange_class, workers=None, config=None, pool_options=None,
+                 markets_capacity=16 * 1024 * 1024, books_capacity=16 * 1024 * 1024, book_max_age=1000,
+                 call_timeout=60, liveness_interval=1.0):
+        """
+        :param exchange_class:      class of the API, must be importable by the workers
+        :param workers:             number of processes, the cpu count by default
+        :param pool_options:        keyword arguments of each worker's ApiPool
+        :param book_max_age:        ms a published order book is served instead of fetching it
+        :param call_timeout:        seconds a call waits for its worker before raising RequestTimeout
+        :param liveness_interval:   seconds between two checks of the worker processes
+        """
+        self.exchange_class = exchange_class
+        self.workers = workers or multiprocessing.cpu_count()
+        self.config = config or {}
+        self.pool_options = pool_options or {}
+        self.book_max_age = book_max_age
+        self.call_timeout = call_timeout
+        self.liveness_interval = liveness_interval
+        self.markets = SharedSnapshot(capacity=markets_capacity)
+        self.books = SharedSnapshot(capacity=books_capacity)
+        self.processes = []
+        self.requests = []
+        self.responses = None
+        # request id: (future, index of the worker)
+        self._futures = {}
+        self._ids = itertools.count()
+        self._context = None
+        self._reader = None
+        self._watcher = None
+
+    async def start(self):
+        api = self.exchange_class(dict(self.config))
+        try:
+            await api.load_markets()
+            self.markets.publish({'markets': api.markets, 'currencies': api.currencies})
+        finally:
+            await api.close()
+
+        self._context = multiprocessing.get_context('spawn')
+        self.responses = self._context.Queue()
+        for _ in range(self.workers):
+            requests, process = self._spawn()
+            self.requests.append(requests)
+            self.processes.append(process)
+        self._reader = asyncio.ensure_future(self._read_responses())
+        self._watcher = asyncio.ensure_future(self._watch_workers())
+
+    def _spawn(self):
+        requests = self._context.Queue()
+        process = self._context.Process(target=_worker_main, daemon=True, args=(
+            self.exchange_class, self.config, self.pool_options, self.markets.name, self.books.name,
+            self.book_max_age, requests, self.responses))
+        process.start()
+        return requests, process
+
+    async def _watch_workers(self):
+        while True:
+            await asyncio.sleep(self.liveness_interval)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    self._replace_worker(index)
+
+    def _replace_worker(self, index):
+        error = WorkerExitedError(f'shard worker {index} exited with code {self.processes[index].exitcode}')
+        for request_id, (future, worker) in list(self._futures.items()):
+            if worker == index:
+                del self._futures[request_id]
+                if not future.done():
+                    future.set_exception(error)
+        # requests nobody reads anymore are dropped
+        self.requests[index].cancel_join_thread()
+        self.requests[index].close()
+        self.requests[index], self.processes[index] = self._spawn()
+
+    async def _read_responses(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            response = await loop.run_in_executor(None, self.responses.get)
+            if response is None:
+                return
+            request_id, result, error = response
+            future, _ = self._futures.pop(request_id, (None, None))
+            if future is None or future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def worker_of(self, tenant):
+        # crc32 is stable across processes and restarts, unlike hash()
+        return zlib.crc32(str(tenant).encode()) % self.workers
+
+    async def call(self, credentials, method, *args, **kwargs):
+        """
+        :param credentials:     {'apiKey': ..., 'secret': ...} of the tenant, None for public calls
+        :param method:          name of the SpotApi / SwapApi method
+        """
+        index = self.worker_of(tenant_key(credentials))
+        request_id = next(self._ids)
+        future = asyncio.get_event_loop().create_future()
+        self._futures[request_id] = (future, index)
+        self.requests[index].put((request_id, credentials, method, args, kwargs))
+        try:
+            return await asyncio.wait_for(future, self.call_timeout)
+        except asyncio.TimeoutError:
+            if not future.cancelled():
+                raise
+            raise RequestTimeout(f'{method} got no response from shard worker {index} within {self.call_timeout}s') from None
+        finally:
+            self._futures.pop(request_id, None)
+
+    def publish_markets(self, markets, currencies=None):
+        """
+        Publish reloaded markets, workers created after this pick them up
+        """
+        self.markets.publish({'markets': markets, 'currencies': currencies})
+
+    def publish_order_books(self, order_books):
+        """
+        :param order_books:     {symbol: order book structure with 'timestamp'}
+        """
+        self.books.publish(order_books)
+
+    async def stop(self):
+        self._watcher.cancel()
+        for requests in self.requests:
+            requests.put(None)
+        loop = asyncio.get_event_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join)
+        self.responses.put(None)
+        await self._reader
+        for future, _ in self._futures.values():
+            if not future.done():
+                future.cancel()
+        self._futures.clear()
+        self.processes = []
+        self.requests = []
+        for snapshot in (self.markets, self.books):
+            snapshot.close()
+            snapshot.unlink()
@@ -0,0 +1,411 @@
+import functools
+import itertools
+
+from schema import And, Hook, Literal, Or, Schema, SchemaError, Use
+from schema import COMPARABLE, CALLABLE, VALIDATOR, TYPE, DICT, ITERABLE
+
+from ccxt_ext.errors import InvalidResultError
+from utils import schemas as result_schemas
+
+# API methods and the schemas of utils/schemas.py their results are checked against
+RESULT_SCHEMAS = {
+    'fetch_markets': 'MARKETS_SCHEMA',
+    'fetch_order_book': 'ORDER_BOOK_SCHEMA',
+    'fetch_order': 'ORDER_SCHEMA',
+    'fetch_orders': 'ORDERS_SCHEMA',
+    'fetch_open_orders': 'ORDERS_SCHEMA',
+    'fetch_open_orders_by_symbols': 'ORDERS_SCHEMA',
+    'fetch_closed_orders': 'ORDERS_SCHEMA',
+    'fetch_order_trades': 'TRADES_SCHEMA',
+    'fetch_my_trades': 'TRADES_SCHEMA',
+    'fetch_balance': 'BALANCE_SCHEMA',
+    'fetch_trading_fees': 'FEE_RATES_SCHEMA',
+    'fetch_trading_fee_rates': 'FEE_RATES_SCHEMA',
+    'fetch_positions': 'POSITIONS_SCHEMA',
+    'fetch_position_side': 'POSITION_SIDE_SCHEMA',
+    'fetch_funding_records': 'FUNDING_FEEs_SCHEMA',
+}
+
+_MISSING = object()
+# id of a schema: (schema, validator)
+_compiled = {}
+
+
+class ValidationError(ValueError):
+    """
+    Raised by compiled validators, `path` is the keys and indexes leading to the invalid value
+    """
+
+    def __init__(self, message, path=()):
+        super().__init__(message)
+        self.message = message
+        self.path = path
+
+    def at(self, key):
+        return ValidationError(self.message, (key,) + self.path)
+
+    def __str__(self):
+        if not self.path:
+            return self.message
+        return ''.join(f'[{key!r}]' for key in self.path) + ': ' + self.message
+
+
+def _flavor(s):
+    # same as schema._priority
+    if type(s) in (list, tuple, set, frozenset):
+        return ITERABLE
+    if type(s) is dict:
+        return DICT
+    if issubclass(type(s), type):
+        return TYPE
+    if isinstance(s, Literal):
+        return COMPARABLE
+    if hasattr(s, 'validate'):
+        return VALIDATOR
+    if callable(s):
+        return CALLABLE
+    return COMPARABLE
+
+
+def _key_schema(key):
+    # schema of a dict key without its Optional marker
+    key = key._schema if isinstance(key, Schema) else key
+    return key.schema if isinstance(key, Literal) else key
+
+
+def _matches(validator, value):
+    try:
+        validator(value)
+    except ValidationError:
+        return False
+    return True
+
+
+class _Compiler:
+    """
+    Generates the source of one python function per dict, list and Or of a schema, the rest is inlined
+    """
+
+    def __init__(self):
+        self.functions = []
+        self.namespace = {'ValidationError': ValidationError, 'SchemaError': SchemaError, 'MISSING': _MISSING,
+                          'matches': _matches}
+        self.names = {}
+        self.counter = itertools.count()
+
+    def constant(self, value):
+        name = f'c{next(self.counter)}'
+        self.namespace[name] = value
+        return name
+
+    def function(self, s, ignore):
+        """
+        :return:    name of the generated function validating `s`, it returns the value, converted by any Use
+        """
+        key = (id(s), ignore)
+        name = self.names.get(key)
+        if name is not None:
+            return name
+        name = self.names[key] = f'v{next(self.counter)}'
+        # keeps `s` alive, so its id is not reused by another node
+        self.namespace[f'{name}_schema'] = s
+        flavor = _flavor(s)
+        if flavor == DICT:
+            body = self.dict_body(s, ignore)
+        elif flavor == ITERABLE:
+            body = self.list_body(s, ignore)
+        elif isinstance(s, Or):
+            body = self.or_body(s._args, s._ignore_extra_keys)
+        else:
+            body = self.check(s, 'v', ignore, '    ') + ['    return v\n']
+        self.functions.append(f'def {name}(v):\n' + ''.join(body))
+        return name
+
+    def fallback(self, s, var, ignore, indent):
+        # anything without a specialized form is validated by the schema library
+        validator = self.constant(Schema(s, ignore_extra_keys=ignore))
+        return [
+            f'{indent}try:\n',
+            f'{indent}    {var} = {validator}.validate({var})\n',
+            f'{indent}except SchemaError as e:\n',
+            f'{indent}    raise ValidationError(str(e)) from None\n',
+        ]
+
+    def type_test(self, types, var):
+        """
+        :return:    expression of `var` being an instance of one of `types`, bools are no ints as in schema
+        """
+        names = self.constant(tuple(types)) if len(types) > 1 else self.constant(types[0])
+        if int not in types:
+            return f'isinstance({var}, {names})'
+        others = [t for t in types if t is not int]
+        if any(issubclass(bool, t) for t in others):
+            return f'isinstance({var}, {names})'
+        return f'(isinstance({var}, {names}) and type({var}) is not bool)'
+
+    def check(self, s, var, ignore, indent):
+        """
+        :return:    lines validating `var` in place, Use converts it
+        """
+        if isinstance(s, Literal):
+            s = s.schema
+        flavor = _flavor(s)
+        if flavor == TYPE:
+            if s is object:
+                return []
+            return [f'{indent}if not {self.type_test([s], var)}:\n',
+                    f'{indent}    raise ValidationError(repr({var}) + {" should be instance of " + repr(s.__name__)!r})\n']
+        if flavor == COMPARABLE:
+            test = f'{var} is not None' if s is None else f'not ({self.constant(s)} == {var})'
+            return [f'{indent}if {test}:\n',
+                    f'{indent}    raise ValidationError({repr(s) + " does not match "!r} + repr({var}))\n']
+        if flavor == CALLABLE:
+            function = self.constant(s)
+            label = getattr(s, '__name__', repr(s))
+            return [
+                f'{indent}try:\n',
+                f'{indent}    ok = {function}({var})\n',
+                f'{indent}except Exception as e:\n',
+                f'{indent}    raise ValidationError({label!r} + "(" + repr({var}) + ") raised " + repr(e)) from None\n',
+                f'{indent}if not ok:\n',
+                f'{indent}    raise ValidationError({label!r} + "(" + repr({var}) + ") should evaluate to True")\n',
+            ]
+        if flavor in (DICT, ITERABLE):
+            if flavor == DICT and any(isinstance(key, Hook) for key in s):
+                return self.fallback(s, var, ignore, indent)
+            return [f'{indent}{self.function(s, ignore)}({var})\n']
+        if isinstance(s, Use):
+            function = self.constant(s._callable)
+            label = getattr(s._callable, '__name__', repr(s._callable))
+            return [
+                f'{indent}try:\n',
+                f'{indent}    {var} = {function}({var})\n',
+                f'{indent}except Exception as e:\n',
+                f'{indent}    raise ValidationError({label!r} + "(" + repr({var}) + ") raised " + repr(e)) from None\n',
+            ]
+        if isinstance(s, Or):
+            return [f'{indent}{var} = {self.function(s, ignore)}({var})\n']
+        if isinstance(s, And):
+            lines = []
+            for arg in s._args:
+                lines += self.check(arg, var, s._ignore_extra_keys, indent)
+            return lines
+        if isinstance(s, Schema) and not isinstance(s, Hook):
+            return self.check(s._schema, var, s._ignore_extra_keys, indent)
+        return self.fallback(s, var, ignore, indent)
+
+    def or_body(self, args, ignore):
+        """
+        Alternatives in order, the first valid one wins. Consecutive type alternatives become one isinstance.
+        """
+        lines = []
+        types = []
+
+        def flush():
+            if types:
+                lines.extend([f'    if {self.type_test(types, "v")}:\n', '        return v\n'])
+                types.clear()
+
+        for arg in args:
+            arg = arg.schema if isinstance(arg, Literal) else arg
+            if _flavor(arg) == TYPE:
+                types.append(arg)
+                continue
+            flush()
+            if arg is None:
+                lines.extend(['    if v is None:\n', '        return v\n'])
+            else:
+                lines.extend([
+                    '    try:\n',
+                    f'        return {self.function(arg, ignore)}(v)\n',
+                    '    except ValidationError:\n',
+                    '        pass\n',
+                ])
+        flush()
+        label = self.constant(Or(*args))
+        return lines + [f'    raise ValidationError(repr(v) + " did not validate " + repr({label}))\n']
+
+    def list_body(self, s, ignore):
+        lines = [f'    if not isinstance(v, {self.constant(type(s))}):\n',
+                 f'        raise ValidationError(repr(v) + {" should be instance of " + repr(type(s).__name__)!r})\n']
+        if not s:
+            return lines + ['    if v:\n', '        raise ValidationError(repr(v) + " should be empty")\n', '    return v\n']
+        if len(s) == 1:
+            element = self.check(s[0], 'x', ignore, '            ')
+        else:
+            element = [f'            {self.function(Or(*s, ignore_extra_keys=ignore), ignore)}(x)\n']
+        if element:
+            lines += [
+                '    for i, x in enumerate(v):\n',
+                '        try:\n',
+                *element,
+                '        except ValidationError as e:\n',
+                '            raise e.at(i) from None\n',
+            ]
+        return lines + ['    return v\n']
+
+    def dict_body(self, s, ignore):
+        skeys = sorted(s, key=Schema._dict_key_priority)
+        literals = {}
+        others = []
+        for key in skeys:
+            schema = _key_schema(key)
+            if _flavor(schema) == COMPARABLE:
+                # the first one of equal keys wins, as in schema
+                literals.setdefault(schema, key)
+            else:
+                others.append(key)
+        lines = ['    if not isinstance(v, dict):\n',
+                 '        raise ValidationError(repr(v) + " should be instance of \'dict\'")\n']
+        count = bool(others) or not ignore
+        if count:
+            lines.append('    n = 0\n')
+        for value, key in literals.items():
+            literal = repr(value) if type(value) in (str, int) else self.constant(value)
+            required = not Schema._is_optional_type(key)
+            check = self.check(s[key], 'x', ignore, '        ' if required else '            ')
+            if not (required or count or check):
+                continue
+            lines.append(f'    x = v.get({literal}, MISSING)\n')
+            if required:
+                lines += ['    if x is MISSING:\n', f'        raise ValidationError("Missing key: " + repr({literal}))\n']
+            if not required:
+                lines.append('    if x is not MISSING:\n')
+            indent = '    ' if required else '        '
+            if count:
+                lines.append(f'{indent}n += 1\n')
+            if check:
+                lines += [f'{indent}try:\n', *check, f'{indent}except ValidationError as e:\n',
+                          f'{indent}    raise e.at({literal}) from None\n']
+        if not count:
+            return lines + ['    return v\n']
+
+        known = self.constant(frozenset(literals))
+        required = {index: key for index, key in enumerate(others) if not Schema._is_optional_type(key)}
+        lines += [f'    covered{index} = False\n' for index in required]
+        if not others:
+            lines += ['    if len(v) != n:\n',
+                      f'        raise ValidationError("Wrong keys " + repr([k for k in v if k not in {known}]))\n']
+            return lines + ['    return v\n']
+        lines += ['    if len(v) != n:\n', '        for k, x in v.items():\n',
+                  f'            if k in {known}:\n', '                continue\n']
+        for index, key in enumerate(others):
+            schema = _key_schema(key)
+            if _flavor(schema) == TYPE:
+                test = 'True' if schema is object else self.type_test([schema], 'k')
+            else:
+                test = f'matches({self.function(schema, False)}, k)'
+            lines.append(f'            if {test}:\n')
+            check = self.check(s[key], 'x', ignore, '                    ')
+            if check:
+                lines += ['                try:\n', *check, '                except ValidationError as e:\n',
+                          '                    raise e.at(k) from None\n']
+            if index in required:
+                lines.append(f'                covered{index} = True\n')
+            lines.append('                continue\n')
+        if not ignore:
+            lines.append('            raise ValidationError("Wrong key " + repr(k))\n')
+        for index, key in required.items():
+            lines += [f'    if not covered{index}:\n',
+                      f'        raise ValidationError("Missing key: " + {repr(_key_schema(key))!r})\n']
+        return lines + ['    return v\n']
+
+
+def compile_schema(schema):
+    """
+    Generate a python function validating data the way `schema.validate` does, many times faster
+
+    The function returns the data it was given, conversions of Use only apply within an And.
+    Its source is in its `source` attribute.
+
+    :param schema:  schema.Schema, or anything Schema takes
+    :raise ValidationError: from the function, for invalid data
+    """
+    compiled = _compiled.get(id(schema))
+    if compiled is not None:
+        return compiled[1]
+    compiler = _Compiler()
+    name = compiler.function(schema, getattr(schema, '_ignore_extra_keys', False))
+    source = '\n'.join(compiler.functions)
+    exec(compile(source, f'<validator {name}>', 'exec'), compiler.namespace)
+    validator = compiler.namespace[name]
+    validator.source = source
+    # the schema is kept so its id is not reused
+    _compiled[id(schema)] = (schema, validator)
+    return validator
+
+
+def default_schemas():
+    """
+    :return:    {method name: schema} of RESULT_SCHEMAS from utils/schemas.py
+    """
+    return {name: getattr(result_schemas, schema) for name, schema in RESULT_SCHEMAS.items()}
+
+
+class ResultGuard:
+    """
+    Validates the results of the fetch_* methods of an API instance with compiled validators
+
+    Nothing is wrapped until `attach` is called. Results grouped by symbol, eg. of
+    fetch_open_orders_by_symbols, are validated symbol by symbol.
+
+    example:
+        guard = ResultGuard(on_invalid=lambda name, result, error: logging.error(f'{name}: {error}'))
+        guard.attach(api)
+    """
+
+    def __init__(self, schemas=None, on_invalid=None):
+        """
+        :param schemas:     {method name: schema}, the ones of utils/schemas.py by default, see RESULT_SCHEMAS
+        :param on_invalid:  callable taking (method name, result, ValidationError), raises InvalidResultError when None
+        """
+        schemas = default_schemas() if schemas is None else schemas
+        self.validators = {name: compile_schema(schema) for name, schema in schemas.items()}
+        self.grouped = {name for name, schema in schemas.items()
+                        if _flavor(schema._schema if isinstance(schema, Schema) else schema) == ITERABLE}
+        self.on_invalid = on_invalid
+        self.checked = 0
+        self.invalid = 0
+
+    def check(self, name, result):
+        validator = self.validators[name]
+        self.checked += 1
+        try:
+            if name in self.grouped and isinstance(result, dict):
+                for symbol, value in result.items():
+                    try:
+                        validator(value)
+                    except ValidationError as e:
+                        raise e.at(symbol) from None
+            else:
+                validator(result)
+        except ValidationError as e:
+            self.invalid += 1
+            if self.on_invalid is None:
+                raise InvalidResultError(f'{name} returned an invalid result: {e}') from None
+            self.on_invalid(name, result, e)
+
+    def attach(self, api):
+        """
+        Wrap the methods of `api` which have a validator, on this instance only
+        """
+        if '_result_guard' in vars(api):
+            raise ValueError('api is already guarded')
+        api._result_guard = self
+        for name in self.validators:
+            if callable(getattr(type(api), name, None)):
+                setattr(api, name, self._wrap(name, getattr(api, name)))
+
+    def detach(self, api):
+        if vars(api).pop('_result_guard', None) is not self:
+            return
+        for name in self.validators:
+            vars(api).pop(name, None)
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            result = await method(*args, **kwargs)
+            self.check(name, result)
+            return result
+        return wrapper
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from ccxt.base.errors import OrderNotFound
+
+
+class WaitTimeout(asyncio.TimeoutError):
+    """
+    The condition of `wait_until` did not hold in time, `last` is the last fetched value
+    """
+
+    def __init__(self, message, last=None):
+        super().__init__(message)
+        self.last = last
+
+
+async def wait_until(fetch, predicate, timeout=10.0, delay=0.05, max_delay=1.0, backoff=2.0):
+    """
+    Call `fetch` until `predicate` holds for its result, instead of sleeping a fixed time and hoping it does
+
+    The first retry comes after `delay` seconds, each next one `backoff` times later, at most `max_delay`.
+
+    :param fetch:       coroutine function without arguments
+    :param predicate:   function of the fetched value
+    :return:            the first fetched value the predicate holds for
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        value = await fetch()
+        if predicate(value):
+            return value
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise WaitTimeout(f'condition not met within {timeout}s', value)
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * backoff, max_delay)
+
+
+async def wait_for_order(api, id, symbol, statuses, params=None, **kwargs):
+    """
+    Wait until the order is visible with one of `statuses`, eg. 'open' after creating it or
+    ('canceled', 'closed') after canceling it
+
+    :param kwargs:  timeout, delay, max_delay, backoff of `wait_until`
+    :return:        the order structure
+    """
+    statuses = {statuses} if isinstance(statuses, str) else set(statuses)
+
+    async def fetch():
+        try:
+            return await api.fetch_order(id, symbol, params=params)
+        except OrderNotFound:
+            # not visible to queries yet
+            return None
+
+    return await wait_until(fetch, lambda order: order is not None and order['status'] in statuses, **kwargs)
+
+
+async def wait_for_orders(api, fetch_method, symbol, id, present=True, limit=10, params=None, **kwargs):
+    """
+    Wait until the order is, or is no longer, in the list of a fetch_open_orders / fetch_closed_orders call
+
+    :param fetch_method:    'fetch_open_orders' or 'fetch_closed_orders'
+    :return:                the list of orders
+    """
+    fetch = getattr(api, fetch_method)
+    return await wait_until(lambda: fetch(symbol, limit=limit, params=params),
+                            lambda orders: any(order['id'] == id for order in orders) == present, **kwargs)
+
+
+async def wait_for_position(api, symbol, predicate, params=None, **kwargs):
+    """
+    Wait until the positions of the symbol satisfy `predicate`, eg. after an order changed them
+
+    :param predicate:   function of the list of positions
+    :return:            the list of positions
+    """
+    return await wait_until(lambda: api.fetch_positions(symbol, params=params), predicate, **kwargs)